@@ -7,9 +7,9 @@ import logging
 import sys
 import os
 import os.path
-from time import gmtime, strftime
+from time import gmtime, strftime, time
 
-from flask import Flask, jsonify
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from mpmath import mp
 
@@ -18,6 +18,7 @@ from kaos.api.errors import APIError
 
 def create_app(config="settings.cfg"):
     """Create and setup the KAOS app."""
+    startup_time = time()
 
     # App configuration
     app = Flask(__name__)
@@ -55,15 +56,24 @@ def create_app(config="settings.cfg"):
     console_handler.setFormatter(logging.getLogger().handlers[0].formatter)
     logging.getLogger().addHandler(console_handler)
 
+    configure_transforms(app)
+
     # Database setup
     from kaos.models import DB
     DB.init_app(app)
     DB.create_all(app=app)
 
+    from kaos.models.schema import upgrade_schema
+    upgrade_schema(DB.get_engine(app))
+
     # Cache setup
     from kaos.models.models import CACHE
     CACHE.init_app(app)
 
+    # Background ingestion setup
+    from kaos.models.jobs import INGEST_JOBS
+    INGEST_JOBS.init_app(app)
+
     # Blueprint and view registration
     from kaos import api
     app.register_blueprint(api.history_bp)
@@ -72,6 +82,11 @@ def create_app(config="settings.cfg"):
     app.register_blueprint(api.upload_bp)
     app.register_blueprint(api.opportunity_bp)
 
+    # Command line commands
+    from kaos import cli
+    app.cli.add_command(cli.ingest_command)
+    app.cli.add_command(cli.archive_command)
+
     # pylint: disable=unused-variable,missing-docstring
     @app.route('/')
     def index():
@@ -91,11 +106,56 @@ def create_app(config="settings.cfg"):
         return error.to_response()
     # pylint: enable=unused-variable,missing-docstring
 
-    logging.info('======= KAOS START =======')
+    log_first_request_latency(app)
+
+    logging.info('======= KAOS START ======= (%.3f s)', time() - startup_time)
 
     return app
 
 
+def configure_transforms(app):
+    """Configure the coordinate transforms for offline operation and warm them up.
+
+    Args:
+        app (Flask): The KAOS app, see the ECI_TRANSFORM, IERS_FILE and IERS_AUTO_DOWNLOAD configs.
+    """
+    from kaos.algorithm.coord_conversion import (configure_iers, set_eci_transform,
+                                                 warm_up_transforms)
+
+    # The ECEF to ECI conversions use the analytic Earth rotation model unless the astropy
+    # reference transforms are configured
+    set_eci_transform(app.config.get('ECI_TRANSFORM', 'numpy'))
+
+    # The IERS tables are loaded from local files, production hosts have no network access
+    configure_iers(app.config.get('IERS_FILE'), app.config.get('IERS_AUTO_DOWNLOAD', False))
+    logging.info('Coordinate transforms warmed up in %.3f s', warm_up_transforms())
+
+
+def log_first_request_latency(app):
+    """Log the latency of the first request of the app, which pays for any lazy initialization.
+
+    Args:
+        app (Flask): The KAOS app.
+    """
+    first_request = {'pending': True}
+
+    # pylint: disable=unused-variable
+    @app.before_request
+    def start_request_timer():
+        """Record the start time of the request."""
+        g.request_start_time = time()
+
+    @app.after_request
+    def log_request_latency(response):
+        """Log the latency of the first request."""
+        if first_request['pending'] and 'request_start_time' in g:
+            first_request['pending'] = False
+            logging.info('First request %s took %.3f s', request.path,
+                         time() - g.request_start_time)
+        return response
+    # pylint: enable=unused-variable
+
+
 def application_exit():
     """KAOS exit handler."""
     logging.info("======= KAOS SHUTDOWN =======")
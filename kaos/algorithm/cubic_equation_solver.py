@@ -106,3 +106,103 @@ def findG(a, b, c, d):
 # Helper function to return float value of h.
 def findH(g, f):
     return ((g ** 2.0) / 4.0 + (f ** 3.0) / 27.0)
+
+
+# Terms smaller than this fraction of the polynomial over its interval are dropped
+_DEGENERATE_RATIO = 1e-12
+
+
+# pylint: disable=invalid-name,too-many-locals
+def solve_in_interval(coefficients, lower, upper):
+    """Finds the real roots of many cubic polynomials inside an interval of every polynomial.
+
+    Every row (a, b, c, d) of the coefficients is the polynomial ax^3 + bx^2 + cx + d. Rows whose
+    cubic term is negligible over their interval are solved as quadratic or linear polynomials, and
+    the roots of the closed form solution are refined with a Newton step.
+
+    The coefficients are best expressed in a variable local to the interval (e.g. the time since
+    its start), absolute UNIX times leave few significant digits to the cubic term.
+
+    Args:
+        coefficients (array like): (N, 4) coefficients (a, b, c, d) of the N polynomials
+        lower (array like): (N,) lower bounds of the intervals, or a single bound for all the rows
+        upper (array like): (N,) upper bounds of the intervals, or a single bound for all the rows
+
+    Returns:
+        An (N, 3) array of the roots of every polynomial in its interval [lower, upper], in
+        increasing order and padded with NaN. Repeated roots are returned as many times as the
+        closed form finds them. Rows whose coefficients are all zero have no roots.
+    """
+    coefficients = np.asarray(coefficients, dtype=np.float64).reshape((-1, 4))
+    lower, upper = [np.broadcast_to(np.asarray(bound, dtype=np.float64), coefficients.shape[:1])
+                    for bound in (lower, upper)]
+    a, b, c, d = np.transpose(coefficients)
+
+    # The size of every term over the interval decides which terms are negligible
+    x_max = np.maximum(np.maximum(np.abs(lower), np.abs(upper)), 1.0)
+    terms = np.abs(coefficients) * x_max[:, np.newaxis] ** np.arange(3, -1, -1)
+    negligible = terms <= _DEGENERATE_RATIO * terms.sum(axis=1)[:, np.newaxis]
+    cubic = ~negligible[:, 0]
+    quadratic = negligible[:, 0] & ~negligible[:, 1]
+    linear = negligible[:, 0] & negligible[:, 1] & ~negligible[:, 2]
+
+    roots = np.full((len(coefficients), 3), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        roots[cubic] = _cubic_roots(a[cubic], b[cubic], c[cubic], d[cubic])
+        roots[quadratic, :2] = _quadratic_roots(b[quadratic], c[quadratic], d[quadratic])
+        roots[linear, 0] = -d[linear] / c[linear]
+
+        # A Newton step on the full polynomial corrects the closed forms and dropped terms
+        value = ((a[:, np.newaxis] * roots + b[:, np.newaxis]) * roots +
+                 c[:, np.newaxis]) * roots + d[:, np.newaxis]
+        slope = (3 * a[:, np.newaxis] * roots + 2 * b[:, np.newaxis]) * roots + c[:, np.newaxis]
+        step = np.where(slope != 0, value / slope, 0)
+        roots = np.where(np.isfinite(step), roots - step, roots)
+
+        roots[~((roots >= lower[:, np.newaxis]) & (roots <= upper[:, np.newaxis]))] = np.nan
+    return np.sort(roots, axis=1)
+
+
+def _cubic_roots(a, b, c, d):
+    """The real roots of cubic polynomials, see solve_in_interval.
+
+    Returns:
+        An (N, 3) array of the real roots, padded with NaN.
+    """
+    # Depressed cubic t^3 + pt + q = 0 with x = t - b / 3a
+    shift = b / (3 * a)
+    p = (3 * a * c - b ** 2) / (3 * a ** 2)
+    q = (2 * b ** 3 - 9 * a * b * c + 27 * a ** 2 * d) / (27 * a ** 3)
+    discriminant = (q / 2) ** 2 + (p / 3) ** 3
+
+    roots = np.full((len(a), 3), np.nan)
+
+    # One real root and two complex roots, a discriminant within rounding of zero is a double root
+    one = discriminant > _DEGENERATE_RATIO * ((q / 2) ** 2 + np.abs(p / 3) ** 3)
+    sqrt_discriminant = np.sqrt(discriminant[one])
+    roots[one, 0] = (np.cbrt(-q[one] / 2 + sqrt_discriminant) +
+                     np.cbrt(-q[one] / 2 - sqrt_discriminant))
+
+    # Three real roots, with the trigonometric solution
+    three = ~one
+    radius = np.sqrt(-p[three] / 3)
+    cosine = np.where(radius > 0, -q[three] / (2 * radius ** 3), 0)
+    angle = np.arccos(np.clip(cosine, -1, 1)) / 3
+    roots[three] = (2 * radius[:, np.newaxis] *
+                    np.cos(angle[:, np.newaxis] - 2 * np.pi * np.arange(3) / 3))
+
+    return roots - shift[:, np.newaxis]
+
+
+def _quadratic_roots(a, b, c):
+    """The real roots of quadratic polynomials ax^2 + bx + c, without cancellation.
+
+    Returns:
+        An (N, 2) array of the real roots, padded with NaN.
+    """
+    discriminant = b ** 2 - 4 * a * c
+    root = -0.5 * (b + np.copysign(np.sqrt(discriminant), b))
+    roots = np.stack([root / a, c / root], axis=-1)
+    roots[discriminant < 0] = np.nan
+    return roots
+# pylint: enable=invalid-name,too-many-locals
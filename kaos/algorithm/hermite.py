@@ -0,0 +1,37 @@
+"""Cubic Hermite interpolation of satellite states from positions and velocities."""
+
+import numpy as np
+
+
+def hermite_interp(times, positions, velocities, new_times):
+    """Interpolate positions and velocities with the cubic Hermite polynomial of the two samples
+    around every time, which matches both the positions and the velocities of the samples.
+
+    Args:
+        times (array): A sorted 1-D array of at least two distinct sample times.
+        positions (array): An (N, 3) array of the positions of the samples.
+        velocities (array): An (N, 3) array of the velocities of the samples, the time derivatives
+                            of the positions.
+        new_times (array): The times to interpolate for, within the range of the samples.
+
+    Returns:
+        A tuple (positions, velocities) of (M, 3) arrays, where row i is the interpolated state at
+        new_times[i].
+    """
+    new_times = np.asarray(new_times, dtype=np.float64)
+    indices = np.clip(np.searchsorted(times, new_times, side='right') - 1, 0, len(times) - 2)
+    steps = (times[indices + 1] - times[indices])[:, np.newaxis]
+    fractions = (new_times - times[indices])[:, np.newaxis] / steps
+    start_positions, end_positions = positions[indices], positions[indices + 1]
+    start_velocities, end_velocities = velocities[indices] * steps, velocities[indices + 1] * steps
+
+    # Hermite basis polynomials and their derivatives with respect to the fraction
+    squares, cubes = fractions ** 2, fractions ** 3
+    new_positions = ((2 * cubes - 3 * squares + 1) * start_positions +
+                     (cubes - 2 * squares + fractions) * start_velocities +
+                     (3 * squares - 2 * cubes) * end_positions +
+                     (cubes - squares) * end_velocities)
+    new_velocities = ((6 * squares - 6 * fractions) * (start_positions - end_positions) +
+                      (3 * squares - 4 * fractions + 1) * start_velocities +
+                      (3 * squares - 2 * fractions) * end_velocities) / steps
+    return new_positions, new_velocities
@@ -4,12 +4,16 @@ import numpy as np
 from scipy import interpolate
 
 from kaos.models import OrbitSegment, OrbitRecord, Satellite
+from .hermite import hermite_interp
 from ..errors import InterpolationError
 
 
 class Interpolator:
     """Utility class to interpolate satellite position and velocity at arbitrary times,
     based on existing datapoints.
+
+    Segments that were decimated at ingest are always interpolated with Hermite interpolation,
+    which their error bound is computed for, see kaos.models.decimation.
     """
     def __init__(self, platform_id):
         # check that the platform_id refers to a known satellite
@@ -46,7 +50,7 @@ class Interpolator:
     def linear_interp(platform_id, timestamp):
         """Use linear interpolation to estimate the position and velocity of a satellite
         at a given time. For greater accuracy, use vector_interp() with kind="quadratic" or
-        "cubic".
+        "cubic". Segments decimated at ingest are interpolated with Hermite interpolation.
 
         Args:
             platform_id: The UID of the satellite.
@@ -75,8 +79,12 @@ class Interpolator:
         velocities = np.array([np.array(rec.velocity) for rec in orbit_records])
 
         # do the interpolation
-        pos = Interpolator.vector_interp(times, positions, [timestamp], kind="linear")[0]
-        vel = Interpolator.vector_interp(times, velocities, [timestamp], kind="linear")[0]
+        if segment.decimation_tolerance is not None:
+            pos, vel = [vectors[0] for vectors in
+                        hermite_interp(times, positions, velocities, [timestamp])]
+        else:
+            pos = Interpolator.vector_interp(times, positions, [timestamp], kind="linear")[0]
+            vel = Interpolator.vector_interp(times, velocities, [timestamp], kind="linear")[0]
 
         return tuple(pos), tuple(vel)
 
@@ -87,7 +95,8 @@ class Interpolator:
             timestamp: The time for which to get the estimated position and velocity, in Unix
                 epoch seconds.
             kind: The type of interpolation to do. This defaults to "linear." Alternatives
-                include "quadratic", "cubic", etc. See scipy.interpolate.
+                include "quadratic", "cubic", etc. See scipy.interpolate. Segments decimated at
+                ingest are always interpolated with Hermite interpolation.
 
         Return:
             A tuple (pos, vel). Each of pos, vel is a 3-tuple representing the vector
@@ -129,6 +138,13 @@ class Interpolator:
                 [np.array(rec.velocity) for rec in records])
 
         # interpolate the position and velocity
+        if segment.decimation_tolerance is not None:
+            position, velocity = [vectors[0] for vectors in
+                                  hermite_interp(self.segment_times[segment_id],
+                                                 self.segment_positions[segment_id],
+                                                 self.segment_velocities[segment_id], [timestamp])]
+            return tuple(position), tuple(velocity)
+
         position = Interpolator.vector_interp(self.segment_times[segment_id],
                                               self.segment_positions[segment_id],
                                               [timestamp], kind=kind)[0]
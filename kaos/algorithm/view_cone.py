@@ -2,15 +2,53 @@
 
 from __future__ import division
 
+import threading
+
 import mpmath as mp
-from numpy import cross, asarray
+import numpy as np
 
-from .coord_conversion import geod_to_geoc_lat, geod_to_eci_geoc_lon
+from .coord_conversion import geod_to_geoc_lat_array, geod_to_eci_geoc_lon_array
 from ..utils import time_intervals
 from ..constants import ANGULAR_VELOCITY_EARTH, EARTH_A_AXIS, EARTH_B_AXIS, THETA_NAUGHT
 from ..tuples import TimeInterval
 from ..errors import ViewConeError
 
+# The viewing cone of a site turns with the earth, so the tangent times repeat every sidereal day
+SIDEREAL_DAY = 2 * np.pi / ANGULAR_VELOCITY_EARTH
+
+
+class ViewConeStats(object):
+    """Counts the POI reductions and the ones that the viewing cone could not reduce.
+
+    A POI that raises a ViewConeError falls back to the full, unreduced POI in the visibility
+    finder, so the ratio of fallbacks to reductions is kept for monitoring.
+    """
+
+    def __init__(self):
+        self.reductions = 0
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+    def count(self, fallback=False):
+        """Counts a reduction of a list of POIs.
+
+        Args:
+            fallback (bool): Whether the viewing cone failed to reduce the POIs.
+        """
+        with self.lock:
+            self.reductions += 1
+            self.fallbacks += int(fallback)
+
+    def to_dict(self):
+        """The counters as a JSON serializable dictionary."""
+        with self.lock:
+            return {'reductions': self.reductions, 'fallbacks': self.fallbacks}
+
+
+# pylint: disable=invalid-name
+VIEW_CONE_STATS = ViewConeStats()
+# pylint: enable=invalid-name
+
 
 def reduce_poi(site_lat_lon, sat_position_velocity_pairs, q_max, poi):
     """Performs a series of viewing cone calculations and shrinks the input POI
@@ -38,53 +76,219 @@ def reduce_poi(site_lat_lon, sat_position_velocity_pairs, q_max, poi):
     if poi.start > poi.end:
         raise ValueError("poi.start is after poi.end")
 
-    # Get geocentric lat/lon (in the ECI frame) at the beginning of poi
-    site_geoc_lat = geod_to_geoc_lat(site_lat_lon[0])
-    site_lon = geod_to_eci_geoc_lon(site_lat_lon[1], poi.start)
+    positions, velocities = _sample_arrays(sat_position_velocity_pairs)
+    return _counted_reduce_pois([site_lat_lon], positions[np.newaxis], velocities[np.newaxis],
+                                [q_max], [poi])[0][0]
 
-    # Maximum m
-    expected_final_m = mp.ceil((poi.end - poi.start) / (24 * 60 * 60))
 
-    # Find the intervals to cover the input POI
-    interval_list = []
-    m = 0
-    while m < expected_final_m:
-        try:
-            roots = []
-            for sat_pos, sat_vel in sat_position_velocity_pairs:
-                roots.append(_view_cone_calc(site_geoc_lat, site_lon, sat_pos, sat_vel, q_max, m))
-
-            # Finding roots that result in the largest interval
-            roots = asarray(roots)
-            t_1, t_2 = max(roots[:, 0]), min(roots[:, 1])
-            t_3, t_4 = min(roots[:, 2]), max(roots[:, 3])
-
-            # Construct intervals based on calculated roots
-            if t_3 < t_1:
-                interval_list.append(TimeInterval(poi.start + t_3, poi.start + t_1))
-            else:
-                interval_list.append(TimeInterval(poi.start + m * 24 * 60 * 60, poi.start + t_1))
-                interval_list.append(TimeInterval(poi.start + t_3, poi.start +
-                                                  (m + 1) * 24 * 60 * 60))
-
-            if t_2 < t_4:
-                interval_list.append(TimeInterval(poi.start + t_2, poi.start + t_4))
-            else:
-                interval_list.append(TimeInterval(poi.start + m * 24 * 60 * 60, poi.start + t_4))
-                interval_list.append(TimeInterval(poi.start + t_2, poi.start +
-                                                  (m + 1) * 24 * 60 * 60))
-
-            if t_2 > t_4 and t_3 > t_1:
-                # It's unexpected that two roots wrap around (i.e. both if conditions to be false)
-                raise ViewConeError("Internal Viewing cone error")
-            m += 1
-
-        except ValueError:
-            # The case were the formulas have less than 4 roots
+def reduce_poi_list(site_lat_lon, sat_position_velocity_pairs, q_max_list, poi_list):
+    """Performs the viewing cone calculations of consecutive POIs in a single pass, see reduce_poi.
+
+    The tangent times of every POI, every day of the POIs and every sample are computed as array
+    operations, which gives the same intervals as calling reduce_poi on every POI with the samples
+    at its start and end.
+
+    Args:
+        site_lat_lon (tuple): site's Geodetic Latitude and longitude (lat, lon)
+        sat_position_velocity_pairs (list of (position Vector3D, velocity Vector3D)): the satellite
+            position and velocity at the start of every POI and at the end of the last one, in the
+            ECI frame.
+        q_max_list (list of float): maximum orbital radius during every POI
+        poi_list (list of TimeInterval): consecutive periods of interest, usually of one day each
+
+    Returns:
+        list of TimeIntervals that the orbit is inside viewing cone, for all the POIs in order
+
+    Raises:
+        ValueError: on unexpected input
+        ViewConeError: on inconclusive result from Viewing cone
+    """
+    return reduce_poi_sites([site_lat_lon], sat_position_velocity_pairs, q_max_list, poi_list)[0]
+
+
+def reduce_poi_sites(site_lat_lon_list, sat_position_velocity_pairs, q_max_list, poi_list):
+    """Performs the viewing cone calculations of several sites in a single pass, see
+    reduce_poi_list.
+
+    The orbit of the satellite is shared by all the sites, so the sites of an area cost little more
+    than a single one.
+
+    Args:
+        site_lat_lon_list (list of tuple): Geodetic Latitude and longitude (lat, lon) of every site
+        sat_position_velocity_pairs (list of (position Vector3D, velocity Vector3D)): the satellite
+            position and velocity at the start of every POI and at the end of the last one, in the
+            ECI frame.
+        q_max_list (list of float): maximum orbital radius during every POI
+        poi_list (list of TimeInterval): consecutive periods of interest, usually of one day each
+
+    Returns:
+        A list of the reduced POIs of every site, in the order of the sites, see reduce_poi_list.
+
+    Raises:
+        ValueError: on unexpected input
+        ViewConeError: on inconclusive result from Viewing cone for any of the sites
+    """
+    if any(poi.start > poi.end for poi in poi_list):
+        raise ValueError("poi.start is after poi.end")
+    if len(sat_position_velocity_pairs) != len(poi_list) + 1:
+        raise ValueError("Expected a sample at the start of every POI and at the end of the last")
+    if not poi_list or not site_lat_lon_list:
+        return [[] for _ in site_lat_lon_list]
+
+    positions, velocities = _sample_arrays(sat_position_velocity_pairs)
+    positions = np.stack([positions[:-1], positions[1:]], axis=1)
+    velocities = np.stack([velocities[:-1], velocities[1:]], axis=1)
+    return [[interval for intervals in site_reduced_pois for interval in intervals]
+            for site_reduced_pois in _counted_reduce_pois(site_lat_lon_list, positions, velocities,
+                                                          q_max_list, poi_list)]
+
+
+def _sample_arrays(sat_position_velocity_pairs):
+    """Converts position and velocity samples to float arrays.
+
+    Args:
+        sat_position_velocity_pairs (list): (position, velocity) pairs
+
+    Returns:
+        A tuple (positions, velocities) of (P, 3) arrays.
+    """
+    samples = np.asarray(sat_position_velocity_pairs, dtype=np.float64).reshape((-1, 2, 3))
+    return samples[:, 0], samples[:, 1]
+
+
+def _counted_reduce_pois(site_lat_lon_list, positions, velocities, q_max_list, poi_list):
+    """Calls _reduce_pois and counts the call and its ViewConeErrors in VIEW_CONE_STATS."""
+    try:
+        reduced_pois = _reduce_pois(site_lat_lon_list, positions, velocities, q_max_list, poi_list)
+    except ViewConeError:
+        VIEW_CONE_STATS.count(fallback=True)
+        raise
+    VIEW_CONE_STATS.count()
+    return reduced_pois
+
+
+# pylint: disable=too-many-locals
+def _reduce_pois(site_lat_lon_list, positions, velocities, q_max_list, poi_list):
+    """Computes the reduced intervals of every site and POI from the satellite samples of the POI.
+
+    Args:
+        site_lat_lon_list (list of tuple): Geodetic Latitude and longitude (lat, lon) of the S sites
+        positions (array): (W, P, 3) array of the ECI positions of the P samples of every POI
+        velocities (array): (W, P, 3) array of the ECI velocities of the samples
+        q_max_list (list of float): maximum orbital radius during every POI
+        poi_list (list of TimeInterval): the W periods of interest
+
+    Returns:
+        A list of S lists of W lists of TimeIntervals that the orbit is inside viewing cone
+
+    Raises:
+        ViewConeError: on inconclusive result from Viewing cone
+    """
+    # Get geocentric lat/lon (in the ECI frame) at the beginning of every poi
+    site_geoc_lats, site_lons = _site_coordinates(site_lat_lon_list, poi_list)
+
+    # Number of days covering every POI
+    days = [int(np.ceil(float(poi.end - poi.start) / SIDEREAL_DAY)) for poi in poi_list]
+
+    roots, four_roots = _view_cone_times(site_geoc_lats, site_lons, positions, velocities,
+                                         np.asarray(q_max_list, dtype=np.float64), max(days))
+
+    reduced_pois = [[] for _ in site_lat_lon_list]
+    for poi_idx, poi in enumerate(poi_list):
+        poi_roots = roots[:, poi_idx, :days[poi_idx]]
+        if np.isnan(poi_roots).any():
+            # The viewing cone is undefined, e.g. for an orbit radius below the radius of the site
             raise ViewConeError("Unsupported viewing cone and orbit configuration.")
 
-    # Adjusting the intervals to fit inside the input POI and return
-    return time_intervals.trim_poi_segments(interval_list, poi)
+        # Adjusting the intervals to fit inside the input POI
+        for site_idx, site_reduced_pois in enumerate(reduced_pois):
+            site_reduced_pois.append(time_intervals.trim_poi_segments(
+                _poi_intervals(poi.start, poi_roots[site_idx], four_roots[site_idx, poi_idx].all()),
+                poi))
+    return reduced_pois
+# pylint: enable=too-many-locals
+
+
+def _site_coordinates(site_lat_lon_list, poi_list):
+    """Converts the coordinates of the sites to geocentric coordinates in the ECI frame.
+
+    Args:
+        site_lat_lon_list (list of tuple): Geodetic Latitude and longitude (lat, lon) of the S sites
+        poi_list (list of TimeInterval): the W periods of interest
+
+    Returns:
+        A tuple (lats, lons) of the (S,) geocentric latitudes of the sites and the (S, W) geocentric
+        longitudes of the sites in the ECI frame at the start of every POI, in degrees.
+    """
+    site_lat_lons = np.asarray(site_lat_lon_list, dtype=np.float64).reshape((-1, 2))
+    poi_starts = np.array([float(poi.start) for poi in poi_list])
+    return (geod_to_geoc_lat_array(site_lat_lons[:, 0]),
+            geod_to_eci_geoc_lon_array(site_lat_lons[:, 1, np.newaxis], poi_starts))
+
+
+def _poi_intervals(poi_start, poi_roots, four_roots):
+    """Constructs the intervals of every day of a POI from the tangent times of its samples.
+
+    Args:
+        poi_start (float): the start of the POI
+        poi_roots (array): (days, P, 4) array of the tangent times of the P samples, see
+            _view_cone_times
+        four_roots (bool): whether the 4 tangent times are real for all the samples
+
+    Returns:
+        list of TimeIntervals that the orbit is inside viewing cone during the days of the POI
+    """
+    interval_list = []
+    if four_roots:
+        # Finding roots that result in the largest interval, for every day: t_1, t_2, t_3, t_4
+        largest_roots = np.stack([poi_roots[..., 0].max(axis=1), poi_roots[..., 1].min(axis=1),
+                                  poi_roots[..., 2].min(axis=1), poi_roots[..., 3].max(axis=1)],
+                                 axis=-1)
+        for day, day_roots in enumerate(largest_roots):
+            interval_list.extend(_day_intervals(poi_start, day, *day_roots))
+        return interval_list
+
+    # With two or no intersections of the orbit and the viewing cone for some samples, the roots of
+    # different samples do not pair up, so the intervals of the samples are merged instead
+    for sample_roots in np.swapaxes(poi_roots, 0, 1):
+        for day, day_roots in enumerate(sample_roots):
+            interval_list.extend(_day_intervals(poi_start, day, *day_roots))
+    return time_intervals.union_intervals(interval_list)
+
+
+# pylint: disable=too-many-arguments
+def _day_intervals(poi_start, day, t_1, t_2, t_3, t_4):
+    """Constructs the intervals of a day from its tangent times.
+
+    Args:
+        poi_start (float): the start of the POI
+        day (int): interval offsets (number of days after initial condition)
+        t_1, t_2, t_3, t_4 (float): the tangent times that result in the largest intervals, in
+            seconds after the start of the POI
+
+    Returns:
+        list of TimeIntervals that the orbit is inside viewing cone during the day
+
+    Raises:
+        ViewConeError: if two of the intervals wrap around the day
+    """
+    day_start, day_end = poi_start + day * SIDEREAL_DAY, poi_start + (day + 1) * SIDEREAL_DAY
+
+    interval_list = []
+    for first, last in [(t_3, t_1), (t_2, t_4)]:
+        if first < last:
+            interval_list.append(TimeInterval(poi_start + first, poi_start + last))
+        elif first > last:
+            # The interval wraps around the day
+            interval_list.append(TimeInterval(day_start, poi_start + last))
+            interval_list.append(TimeInterval(poi_start + first, day_end))
+        # Equal roots are a single tangent point, the orbit never enters the viewing cone
+
+    if t_2 > t_4 and t_3 > t_1:
+        # It's unexpected that two roots wrap around (i.e. both if conditions to be false)
+        raise ViewConeError("Internal Viewing cone error")
+    return interval_list
+# pylint: enable=too-many-arguments
 
 
 def earth_radius_at_geocetric_lat(geoc_lat):
@@ -100,63 +304,67 @@ def earth_radius_at_geocetric_lat(geoc_lat):
                                                  EARTH_B_AXIS ** 2 * mp.cos(geoc_lat) ** 2)
 
 
-def _view_cone_calc(lat_geoc, lon_geoc, sat_pos, sat_vel, q_max, m):
-    """Semi-private: Performs the viewing cone visibility calculation for the day defined by m.
+# pylint: disable=too-many-arguments,too-many-locals
+def _view_cone_times(lat_geoc, lon_geoc, sat_pos, sat_vel, q_max, days):
+    """Semi-private: Performs the viewing cone visibility calculation for every POI, sample and day.
     Note: This function is based on a paper titled "rapid satellite-to-site visibility determination
     based on self-adaptive interpolation technique"  with some variation to account for interaction
     of viewing cone with the satellite orbit.
 
     Args:
-        lat_geoc (float): site location in degrees at the start of POI
-        lon_geoc (float): site location in degrees at the start of POI
-        sat_pos (Vector3D): position of satellite (at the same time as sat_vel)
-        sat_vel (Vector3D): velocity of satellite (at the same time as sat_pos)
-        q_max (float): maximum orbital radius
-        m (int): interval offsets (number of days after initial condition)
+        lat_geoc (array): (S,) latitudes of the sites in degrees
+        lon_geoc (array): (S, W) longitudes of the sites in degrees at the start of every POI
+        sat_pos (array): (W, P, 3) positions of the satellite (at the same times as sat_vel)
+        sat_vel (array): (W, P, 3) velocities of the satellite (at the same times as sat_pos)
+        q_max (array): (W,) maximum orbital radius during every POI
+        days (int): number of days after initial condition to compute
 
     Returns:
-        Returns 4 numbers representing times at which the orbit is tangent to the viewing cone,
-
-    Raises:
-        ValueError: if any of the 4 formulas has a complex answer. This happens when the orbit and
-        viewing cone do not intersect or only intersect twice.
-
-    Note: With more analysis it should be possible to find a correct interval even in the case
-        where there are only two intersections but this is beyond the current scope of the project.
+        A tuple (times, four_roots). times is a (S, W, days, P, 4) array of the times, in seconds
+        after the start of the POI, at which the orbit is tangent to the viewing cone of every site
+        during every day. four_roots is a (S, W, P) array of whether the 4 formulas have real
+        answers for a site and sample.
+
+        When a formula has a complex answer, the orbit is on one side of that boundary of the
+        viewing cone all day. Its arcsine is then clipped to +/- pi/2, which puts the two roots of
+        the boundary together so that the other boundary alone bounds the interval (two
+        intersections), the interval covers the whole day (the orbit is always inside the viewing
+        cone), or the roots of both boundaries are the same tangent point (never inside).
     """
-    lat_geoc = (lat_geoc * mp.pi) / 180
-    lon_geoc = (lon_geoc * mp.pi) / 180
+    lat_geoc = np.deg2rad(lat_geoc)[:, np.newaxis, np.newaxis]
+    lon_geoc = np.deg2rad(lon_geoc)[..., np.newaxis]
 
-    # P vector (also referred  to as orbital angular momentum in the paper) calculations
-    p_unit_x, p_unit_y, p_unit_z = cross(sat_pos, sat_vel) / (mp.norm(sat_pos) * mp.norm(sat_vel))
+    # P vector (also referred  to as orbital angular momentum in the paper) calculations, the same
+    # for all the sites
+    p_vector = np.cross(sat_pos, sat_vel) / (np.linalg.norm(sat_pos, axis=-1) *
+                                             np.linalg.norm(sat_vel, axis=-1))[..., np.newaxis]
+    p_unit_x, p_unit_y, p_unit_z = p_vector[..., 0], p_vector[..., 1], p_vector[..., 2]
 
     # Following are equations from Viewing cone section of referenced paper
-    r_site_magnitude = earth_radius_at_geocetric_lat(lat_geoc)
-    gamma1 = THETA_NAUGHT + mp.asin((r_site_magnitude * mp.sin((mp.pi / 2) + THETA_NAUGHT)) / q_max)
-    gamma2 = mp.pi - gamma1
-
-    # Note: atan2 instead of atan to get the correct quadrant.
-    arctan_term = mp.atan2(p_unit_x, p_unit_y)
-    arcsin_term_gamma, arcsin_term_gamma2 = [(mp.asin((mp.cos(gamma) - p_unit_z * mp.sin(lat_geoc))
-                                             / (mp.sqrt((p_unit_x ** 2) + (p_unit_y ** 2)) *
-                                              mp.cos(lat_geoc)))) for gamma in [gamma1, gamma2]]
-
-    angle_1 = (arcsin_term_gamma - lon_geoc - arctan_term + 2 * mp.pi * m)
-    angle_2 = (mp.pi - arcsin_term_gamma - lon_geoc - arctan_term + 2 * mp.pi * m)
-    angle_3 = (arcsin_term_gamma2 - lon_geoc - arctan_term + 2 * mp.pi * m)
-    angle_4 = (mp.pi - arcsin_term_gamma2 - lon_geoc - arctan_term + 2 * mp.pi * m)
-    angles = [angle_1, angle_2, angle_3, angle_4]
-
-    # Check for complex answers
-    if any([not isinstance(angle, mp.mpf) for angle in angles]):
-        raise ValueError()
-
-    # Map all angles to 0 to 2*pi
-    for idx in range(len(angles)):
-        while angles[idx] < 0:
-            angles[idx] += 2 * mp.pi
-        while angles[idx] > 2 * mp.pi:
-            angles[idx] -= 2 * mp.pi
-
-    # Calculate the corresponding time for each angle and return
-    return [mp.nint((1 / ANGULAR_VELOCITY_EARTH) * angle) for angle in angles]
+    r_site_magnitude = np.array([float(earth_radius_at_geocetric_lat(lat))
+                                 for lat in lat_geoc.flat])[:, np.newaxis]
+    gamma1 = THETA_NAUGHT + np.arcsin((r_site_magnitude * np.sin((np.pi / 2) + THETA_NAUGHT)) /
+                                      q_max)[..., np.newaxis]
+    gamma2 = np.pi - gamma1
+
+    # Note: atan2 instead of atan to get the correct quadrant
+    arctan_term = np.arctan2(p_unit_x, p_unit_y)
+    sin_terms = [(np.cos(gamma) - p_unit_z * np.sin(lat_geoc)) /
+                 (np.sqrt((p_unit_x ** 2) + (p_unit_y ** 2)) * np.cos(lat_geoc))
+                 for gamma in [gamma1, gamma2]]
+    with np.errstate(invalid='ignore'):
+        four_roots = np.logical_and(*[np.abs(sin_term) <= 1 for sin_term in sin_terms])
+    arcsin_term_gamma, arcsin_term_gamma2 = [np.arcsin(np.clip(sin_term, -1, 1))
+                                             for sin_term in sin_terms]
+
+    angles = np.stack([arcsin_term_gamma, np.pi - arcsin_term_gamma,
+                       arcsin_term_gamma2, np.pi - arcsin_term_gamma2],
+                      axis=-1) - (lon_geoc + arctan_term)[..., np.newaxis]
+
+    # Map all angles to 0 to 2*pi, then to the day defined by m
+    angles = np.mod(angles, 2 * np.pi)[:, :, np.newaxis]
+    day_angles = 2 * np.pi * np.arange(days)[:, np.newaxis, np.newaxis]
+
+    # Calculate the corresponding time for each angle
+    return np.rint((angles + day_angles) / ANGULAR_VELOCITY_EARTH), four_roots
+# pylint: enable=too-many-arguments,too-many-locals
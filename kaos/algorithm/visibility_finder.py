@@ -11,8 +11,8 @@ from __future__ import division
 import numpy as np
 import mpmath as mp
 
-from .cubic_equation_solver import solve
-from .coord_conversion import lla_to_ecef
+from .cubic_equation_solver import solve, solve_in_interval
+from .coord_conversion import lla_to_ecef, lla_to_ecef_array
 from .interpolator import Interpolator
 from ..tuples import TimeInterval
 from ..errors import VisibilityFinderError
@@ -258,6 +258,18 @@ class VisibilityFinder(object):
         roots = solve(*self.find_approx_coeffs(time_interval))
         return roots
 
+    def next_search_time(self, posix_time):
+        """Finds a time from which the search for the start of an access may continue.
+
+        Args:
+            posix_time (float): The time the search reached, the site is not visible at that time.
+
+        Returns:
+            The time from which to continue the search, the site is not visible before it. This
+            finder continues from posix_time.
+        """
+        return posix_time
+
     def determine_visibility(self, error=0.001, tolerance_ratio=0.1, max_iter=100):
         """Using the self adapting interpolation algorithm described in the cited paper, this
         function returns the subintervals for which the satellites have visibility.
@@ -310,6 +322,11 @@ class VisibilityFinder(object):
             access_start = None
 
         while subinterval_end < end_time:
+            if access_start is None:
+                subinterval_start = self.next_search_time(subinterval_start)
+                if subinterval_start >= end_time:
+                    break
+
             new_time_step_1 = prev_time_step
             # Hack loop since python does not support do-while
             iter_num = 0
@@ -403,3 +420,140 @@ class VisibilityFinder(object):
             sat_accesses.append(TimeInterval(access_start, end_time))
 
         return sat_accesses
+
+
+class AreaVisibilityFinder(VisibilityFinder):
+    """An adaptive visibility finder used to determine the visibility intervals of an area, in which
+    a satellite sees all the vertices of the area.
+
+    A single adaptive search runs on the minimum of the visibility functions of the vertices, which
+    are evaluated together, instead of searching every vertex and intersecting their intervals.
+    """
+
+    # The search skips this fraction of the time a vertex needs to reach the horizon, which allows
+    # for changes of the speed of the satellite
+    SKIP_SAFETY = 0.9
+    # Skips shorter than this (s) are left to the adaptive search
+    MIN_SKIP = 60.0
+    # The number of evaluation times whose vertex geometry is kept, the adaptive search evaluates
+    # the same times several times
+    CACHE_SIZE = 64
+
+    def __init__(self, satellite_id, sites, interval):
+        """Args:
+            satellite_id (integer): Satellite ID in the database
+            sites (list): The lat/lon tuples of the vertices of the area
+            interval (tuple:float): The search window as a start_time, end_time tuple
+        """
+        sites = np.asarray(sites, dtype=np.float64).reshape((-1, 2))
+        super(AreaVisibilityFinder, self).__init__(satellite_id, sites[0], interval)
+        self.sites_ecef = lla_to_ecef_array(sites[:, 0], sites[:, 1])
+        self.site_normals = self.sites_ecef / np.linalg.norm(self.sites_ecef, axis=1)[:, np.newaxis]
+        self.geometry_cache = {}
+
+    def vertex_geometry(self, posix_time):
+        """Calculate the visibility functions of all the vertices, their derivatives and the
+        distances of the vertices to the satellite.
+
+        Args:
+            posix_time (float): The time to evaluate the visibility functions at
+
+        Returns:
+            A tuple (visibilities, derivatives, distances, speed) of (N,) arrays for the N vertices
+            and the speed of the satellite.
+        """
+        posix_time = float(posix_time)
+        geometry = self.geometry_cache.get(posix_time)
+        if geometry is not None:
+            return geometry
+
+        sat_pos, sat_vel = [np.asarray(vector, dtype=np.float64) for vector in
+                            self.sat_irp.interpolate(posix_time)]
+        pos_diff = sat_pos - self.sites_ecef
+        distances = np.linalg.norm(pos_diff, axis=1)
+        normal_pos = np.einsum('ij,ij->i', pos_diff, self.site_normals)
+
+        visibilities = normal_pos / distances
+        derivatives = (self.site_normals.dot(sat_vel) / distances -
+                       pos_diff.dot(sat_vel) * normal_pos / distances ** 3)
+        geometry = (visibilities, derivatives, distances, np.linalg.norm(sat_vel))
+
+        if len(self.geometry_cache) >= self.CACHE_SIZE:
+            self.geometry_cache.clear()
+        self.geometry_cache[posix_time] = geometry
+        return geometry
+
+    def visibility(self, posix_time):
+        """Calculate the minimum of the visibility functions of the vertices at a given time.
+
+        Args:
+            posix_time (float): The time to evaluate the visibility function at
+
+        Returns:
+            The value of the visibility function evaluated at the provided time.
+        """
+        return mp.mpf(self.vertex_geometry(posix_time)[0].min())
+
+    def visibility_first_derivative(self, posix_time):
+        """Calculate the derivative of the minimum of the visibility functions of the vertices,
+        the derivative of the vertex with the minimum visibility.
+
+        Args:
+            posix_time (float): The UNIX time to evaluate the derivative visibility function at.
+
+        Returns:
+            The value of the derivative of the visibility function at the provided time.
+        """
+        visibilities, derivatives = self.vertex_geometry(posix_time)[:2]
+        return mp.mpf(derivatives[visibilities.argmin()])
+
+    def find_visibility(self, time_interval):
+        """Finds the roots of the Hermite approximation to the visibility function in a sub
+        interval, see VisibilityFinder.find_visibility.
+
+        The cubic is expressed in the time since the start of the sub interval, which keeps the
+        precision that absolute UNIX times lose.
+
+        Args:
+            time_interval (tuple): The subinterval over which the visibility period is to be
+            calculated.
+
+        Returns:
+            The roots in the sub interval.
+        """
+        start_time, end_time = time_interval
+        time_step = float(end_time - start_time)
+        visibility_start, visibility_end = [float(self.visibility(time)) for time in time_interval]
+        visibility_first_start, visibility_first_end = [
+            float(self.visibility_first_derivative(time)) for time in time_interval]
+
+        coeffs = [((2 * (visibility_start - visibility_end) / time_step +
+                    visibility_first_start + visibility_first_end) / time_step ** 2),
+                  ((3 * (visibility_end - visibility_start) / time_step -
+                    2 * visibility_first_start - visibility_first_end) / time_step),
+                  visibility_first_start,
+                  visibility_start]
+
+        roots = solve_in_interval([coeffs], 0, time_step)[0]
+        return [start_time + root for root in roots[~np.isnan(roots)]]
+
+    def next_search_time(self, posix_time):
+        """Skips the time in which a vertex is too far below the horizon to become visible, the
+        area is not visible while any of its vertices is not.
+
+        The zenith angle of a vertex changes by at most the speed of the satellite divided by its
+        distance to the vertex per second, and that distance shrinks by at most the speed of the
+        satellite per second. A vertex at a distance d below the horizon by an elevation e stays
+        below it for at least d / v (1 - exp(-e)) seconds at a speed v.
+
+        Args:
+            posix_time (float): The time the search reached, the area is not visible at that time.
+
+        Returns:
+            The time from which to continue the search, the area is not visible before it.
+        """
+        visibilities, _, distances, speed = self.vertex_geometry(posix_time)
+        elevations = np.arcsin(np.clip(visibilities, -1, 0))
+        skip = self.SKIP_SAFETY * (distances / speed * (1 - np.exp(elevations))).max()
+
+        return posix_time + skip if skip >= self.MIN_SKIP else posix_time
@@ -4,16 +4,23 @@ Author: Team KMC-70.
 """
 import json
 import os
+import shutil
+import tempfile
 from flask import Flask, Blueprint, request, render_template, jsonify
 from werkzeug.utils import secure_filename
 from kaos.models import ResponseHistory
-from kaos.models.parser import parse_ephemeris_file
-from .errors import InputError
+from kaos.models.ingest import ingest_ephemeris_path
+from kaos.models.jobs import INGEST_JOBS
+from kaos.models.compression import is_ephemeris_filename
+from kaos.models.parser import store_ephemeris_stream
+from .errors import InputError, NotFoundError
 
 
 app = Flask(__name__)
 app.config['UPLOAD_DIRECTORY'] = "ephemeris"
 
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2')
+
 
 # pylint: disable=invalid-name
 upload_bp = Blueprint('upload', __name__, url_prefix='/upload')
@@ -21,8 +28,13 @@ upload_bp = Blueprint('upload', __name__, url_prefix='/upload')
 
 
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() == 'e'
+    """Check whether the file is a plain or compressed ephemeris file."""
+    return is_ephemeris_filename(filename)
+
+
+def allowed_archive(filename):
+    """Check whether the file is an archive type supported by the bulk upload."""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
 
 
 @upload_bp.route('')
@@ -34,8 +46,10 @@ def render_upload():
 def upload_file():
     """ Upload ephemeris files via POST requests.
 
+    The file is ingested in the background, its progress can be polled at /upload/jobs/<job_id>.
+
     Returns:
-        On success: HTTP 200 if filename successfully
+        On success: HTTP 202 with the ID of the ingestion job.
         On error:   HTTP error code associated with error.
     """
     if request.method == 'POST':
@@ -53,7 +67,98 @@ def upload_file():
             file.save(local_filename)
 
             # add the ephemeris data to the DB
-            sat_id = parse_ephemeris_file(local_filename)
-            if sat_id < 0:
-                raise InputError("contents", "malformed ephemeris file")
+            job = INGEST_JOBS.submit(local_filename)
+            response = jsonify({'response': 'Accepted', 'status_code': 202, 'job_id': job.job_id})
+            response.status_code = 202
+            return response
     return jsonify({'response': 'OK', 'status_code': 200})
+
+
+@upload_bp.route('/stream/<filename>', methods=['PUT'])
+def upload_stream(filename):
+    """Upload an ephemeris file as the raw body of a PUT request and ingest it while it is read.
+
+    The file is neither saved to disk nor held in memory, its segments are stored as the request
+    body is received. Compressed files are decompressed as they are received.
+
+    With the query parameter incremental=true, segments that overlap the end of the stored data
+    update it instead of being rejected, see store_ephemeris. With the query parameter
+    decimate=<metres>, the rows that the stored rows reproduce within that position error are
+    dropped, see kaos.models.decimation.
+
+    Args:
+        filename (str): The name of the ephemeris file, the satellite is named after it.
+
+    Returns:
+        On success: HTTP 200 with a summary (segments, rows, seconds, errors) of the file.
+        On error:   HTTP error code associated with error.
+    """
+    if not allowed_file(filename):
+        raise InputError("filename", "not an ephemeris file")
+
+    decimation_tolerance = request.args.get('decimate', type=float)
+    if 'decimate' in request.args and (decimation_tolerance is None or decimation_tolerance < 0):
+        raise InputError("decimate", "not a non negative number of metres")
+
+    try:
+        summary = store_ephemeris_stream(secure_filename(filename), request.stream,
+                                         incremental=request.args.get('incremental') == 'true',
+                                         decimation_tolerance=decimation_tolerance)
+    except ValueError as error:
+        raise InputError("contents", str(error))
+
+    response = summary._asdict()
+    response.update({'response': 'OK', 'status_code': 200})
+    return jsonify(response)
+
+
+@upload_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    """Report the progress of the background ingestion of an uploaded file.
+
+    Args:
+        job_id (int): The ID returned by the upload.
+
+    Returns:
+        The job state (queued, running, done or failed), the parsed rows, the written segments and
+        rows, the elapsed seconds, the throughput and the errors of the job.
+    """
+    job = INGEST_JOBS.get(job_id)
+    if job is None:
+        raise NotFoundError("job_id", job_id)
+
+    return jsonify(job.to_dict())
+
+
+@upload_bp.route('/bulk', methods=['POST'])
+def upload_archive():
+    """Upload an archive of ephemeris files via POST requests and ingest all of them.
+
+    Each file of the archive is stored in its own transaction, a file that fails to be ingested
+    does not prevent the others from being stored.
+
+    Returns:
+        On success: HTTP 200 with a summary (segments, rows, seconds, errors) for each file.
+        On error:   HTTP error code associated with error.
+    """
+    if 'file' not in request.files:
+        raise InputError("file", "file is missing from POST request")
+    file = request.files['file']
+
+    if file.filename == '':
+        raise InputError("filename", "empty filename")
+    if not allowed_archive(file.filename):
+        raise InputError("filename", "unsupported archive type")
+
+    archive_directory = tempfile.mkdtemp()
+    try:
+        archive_filename = os.path.join(archive_directory, secure_filename(file.filename))
+        file.save(archive_filename)
+        summaries = ingest_ephemeris_path(archive_filename)
+    except ValueError as error:
+        raise InputError("contents", str(error))
+    finally:
+        shutil.rmtree(archive_directory)
+
+    return jsonify({'response': 'OK', 'status_code': 200,
+                    'files': [summary._asdict() for summary in summaries]})
@@ -4,6 +4,7 @@ Author: Team KMC-70.
 """
 
 import json
+import logging
 
 from flask import Blueprint, request, jsonify
 import numpy as np
@@ -13,11 +14,11 @@ from .validators import validate_request_schema
 from .errors import InputError
 from ..errors import ViewConeError
 from ..utils.time_conversion import utc_to_unix
-from ..utils.time_intervals import calculate_common_intervals, fuse_neighbor_intervals
-from ..models import DB, Satellite, ResponseHistory
+from ..utils.time_intervals import IntervalSet, coverage_statistics, coverage_timeline
+from ..models import DB, Satellite, ResponseHistory, OrbitSummary
 from ..algorithm.interpolator import Interpolator
 from ..algorithm.coord_conversion import lla_to_eci, lla_to_ecef, ecef_to_eci
-from ..algorithm.view_cone import reduce_poi
+from ..algorithm.view_cone import VIEW_CONE_STATS, reduce_poi_sites
 from ..algorithm.visibility_finder import VisibilityFinder
 from ..tuples import TimeInterval
 
@@ -88,18 +89,20 @@ def request_parse_platform_id(validated_request):
     return satellites
 
 
-def get_point_visibility_helper(satellite, site, poi):
-    """Calculates the visibility periods associated with a single site, satellite and POI
-    combination.
+def reduce_site_pois(satellite, sites, poi):
+    """Reduces the POI of several sites to the windows in which a satellite may see them, with the
+    viewing cone.
+
+    The satellite is sampled once for all the sites.
 
     Args:
         satellite (obj:Satellite): A Satellite model object used to calculate the visibility.
-        site (tuple):              The lon/lat coordinates for the site whose visibility will be
-                                   calculated.
+        sites (list):              The lat/lon coordinates of the sites.
         poi (obj:TimeInterval):    The period of interest for calculating visibility.
 
     Returns:
-        A list of visibility periods/access times in the POI.
+        A list of the reduced POIs of every site, each an IntervalSet. Every site gets the full POI
+        if the viewing cone fails.
     """
     start_time, end_time = poi
     # Due to limitations of the accuracy of the view cone calculations the POI must be split into in
@@ -122,24 +125,74 @@ def get_point_visibility_helper(satellite, site, poi):
                                              np.transpose(np.asarray(sat_ecef_velocities)),
                                              sampling_time_list)
 
-    # Run viewing cone
+    # The orbit of every day is bounded by the summaries of that day, the maximum altitude of the
+    # satellite is only used for data ingested before the summaries were introduced
+    q_max_list = [q_max or satellite.maximum_altitude
+                  for q_max in OrbitSummary.maximum_radii(satellite.platform_id, poi_list)]
+
+    # Run viewing cone, for all the days and sites at once
     try:
-        reduced_poi_list = [reduced_poi for idx, this_poi in enumerate(poi_list) for reduced_poi in
-                            reduce_poi(site, sat_position_velocity_pairs[idx:idx + 2],
-                                       satellite.maximum_altitude, this_poi)]
+        return [IntervalSet.from_intervals(reduced_poi_list).fuse() for reduced_poi_list in
+                reduce_poi_sites(sites, sat_position_velocity_pairs, q_max_list, poi_list)]
 
-        reduced_poi_list = fuse_neighbor_intervals(reduced_poi_list)
+    except ViewConeError as error:
+        logging.warning('Viewing cone of platform %d and sites %s failed (%s), searching the full '
+                        'POI', satellite.platform_id, sites, error)
+        return [IntervalSet([start_time], [end_time]) for _ in sites]
 
-    except ViewConeError:
-        reduced_poi_list = [TimeInterval(start_time, end_time)]
 
-    # Now that the POI has been reduced manageable chunks, the visibility can be computed
+def find_visibility(satellite, site, reduced_pois):
+    """Calculates the visibility periods of a site in the reduced POIs of the site.
+
+    Args:
+        satellite (obj:Satellite):      A Satellite model object used to calculate the visibility.
+        site (tuple):                   The lat/lon coordinates of the site.
+        reduced_pois (obj:IntervalSet): The times in which the satellite may see the site.
+
+    Returns:
+        An IntervalSet of the visibility periods/access times in the reduced POIs.
+    """
     visibility_periods = []
-    for reduced_poi in reduced_poi_list:
+    for reduced_poi in reduced_pois:
         visibility_finder = VisibilityFinder(satellite.platform_id, site, reduced_poi)
         visibility_periods.extend(visibility_finder.determine_visibility())
 
-    return visibility_periods
+    return IntervalSet.from_intervals(visibility_periods)
+
+
+def get_point_visibility_helper(satellite, site, poi):
+    """Calculates the visibility periods associated with a single site, satellite and POI
+    combination.
+
+    Args:
+        satellite (obj:Satellite): A Satellite model object used to calculate the visibility.
+        site (tuple):              The lon/lat coordinates for the site whose visibility will be
+                                   calculated.
+        poi (obj:TimeInterval):    The period of interest for calculating visibility.
+
+    Returns:
+        An IntervalSet of the visibility periods/access times in the POI.
+    """
+    return find_visibility(satellite, site, reduce_site_pois(satellite, [site], poi)[0])
+
+
+def get_area_visibility_helper(satellite, area, poi):
+    """Calculates the visibility periods of an area, in which a satellite sees all its vertices.
+
+    Args:
+        satellite (obj:Satellite): A Satellite model object used to calculate the visibility.
+        area (list):               The lat/lon coordinates of the vertices of the area.
+        poi (obj:TimeInterval):    The period of interest for calculating visibility.
+
+    Returns:
+        An IntervalSet of the visibility periods/access times of the area in the POI.
+    """
+    # The area is only visible when all the vertices are, so the vertices are only searched in the
+    # windows that their viewing cones have in common
+    common_pois = IntervalSet.coverage(reduce_site_pois(satellite, area, poi), len(area))
+
+    return IntervalSet.coverage([find_visibility(satellite, vertex, common_pois)
+                                 for vertex in area], len(area))
 
 
 @opportunity_bp.route('/search', methods=['POST'])
@@ -155,12 +208,8 @@ def get_area_visibility():
 
     satellite_area_visibility = {}
     for satellite in satellites:
-        target_visibility = {}
-        for target in request.json['TargetArea']:
-            target_visibility[target[0]] = get_point_visibility_helper(satellite, target, poi)
-
         satellite_area_visibility[satellite] = \
-            calculate_common_intervals(target_visibility.values())
+            get_area_visibility_helper(satellite, request.json['TargetArea'], poi)
 
     # Prepare the response
     response_history = ResponseHistory(response="{}")
@@ -170,8 +219,8 @@ def get_area_visibility():
     response = {
         'id': response_history.uid,
         'Opportunities': [{'PlatformID': satellite.platform_id,
-                           'start_time': float(access.start),
-                           'end_time': float(access.end)}
+                           'start_time': access.start,
+                           'end_time': access.end}
                           for satellite, accesses in satellite_area_visibility.items()
                           for access in accesses]
     }
@@ -211,8 +260,8 @@ def get_satellite_visibility():
     response = {
         'id': response_history.uid,
         'Opportunities': [{'PlatformID': satellite,
-                           'start_time': float(access.start),
-                           'end_time': float(access.end)}
+                           'start_time': access.start,
+                           'end_time': access.end}
                           for satellite, accesses in visibility_periods.items()
                           for access in accesses]
     }
@@ -223,3 +272,50 @@ def get_satellite_visibility():
     DB.session.commit()
 
     return jsonify(response)
+
+
+@visibility_bp.route('/coverage', methods=['POST'])
+@validate_request_schema(SEARCH_QUERY_VALIDATOR)
+def get_site_coverage():
+    """Count how many satellites see a site at every time of the POI, and summarize the revisit
+    gaps of the site.
+
+    Requires:
+        A user request that contains a JSON payload which follows the SEARCH_SCHEMA.
+    """
+    # Input data processing and conversion
+    poi = TimeInterval(*request_parse_poi(request))
+    satellites = request_parse_platform_id(request)
+    target = request.json['Target']
+
+    visibility_periods = [get_point_visibility_helper(satellite, target, poi)
+                          for satellite in satellites]
+    times, counts = coverage_timeline(visibility_periods, poi)
+
+    # Prepare the response
+    response_history = ResponseHistory(response="{}")
+    response_history.save()
+    DB.session.commit()
+
+    response = {
+        'id': response_history.uid,
+        'PlatformID': [satellite.platform_id for satellite in satellites],
+        'Timeline': {'times': times.tolist(), 'counts': counts.tolist()},
+        'Statistics': coverage_statistics(visibility_periods, poi),
+    }
+
+    # Save the result for future use
+    response_history.response = json.dumps(response)
+    response_history.save()
+    DB.session.commit()
+
+    return jsonify(response)
+
+
+@visibility_bp.route('/stats', methods=['GET'])
+def get_view_cone_stats():
+    """Return how many POIs the viewing cone reduced, and how many it failed to reduce.
+
+    A failed reduction falls back to searching the full POI, which is much slower.
+    """
+    return jsonify(VIEW_CONE_STATS.to_dict())
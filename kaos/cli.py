@@ -0,0 +1,65 @@
+"""Command line commands for KAOS, available through `flask <command>`."""
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from kaos.models.archive import apply_retention
+from kaos.models.ingest import ingest_ephemeris_path
+
+
+@click.command('ingest')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--processes', type=int, default=None,
+              help='Number of processes used to read the files. Defaults to the number of CPUs.')
+@click.option('--defer-indexes', is_flag=True,
+              help='Drop the OrbitRecord indexes during the load and rebuild them once at the '
+                   'end instead of maintaining them row by row.')
+@click.option('--incremental', is_flag=True,
+              help='Only load the samples past the data already stored for each segment and '
+                   'replace the stored samples that newer files supersede.')
+@click.option('--decimate', type=click.FloatRange(min=0), default=None, metavar='METRES',
+              help='Drop the samples that Hermite interpolation of the stored samples reproduces '
+                   'within this position error.')
+@with_appcontext
+def ingest_command(path, processes, defer_indexes, incremental, decimate):
+    """Ingest all the ephemeris files in a directory or an archive."""
+    summaries = ingest_ephemeris_path(path, processes, defer_indexes, incremental, decimate)
+
+    for summary in summaries:
+        if summary.unchanged:
+            click.echo('{}: unchanged, skipped'.format(summary.filename))
+            continue
+
+        click.echo('{}: platform {}, {} segments, {} rows in {:.3f}s, {} unchanged segments '
+                   'skipped'.format(summary.filename, summary.platform_id, summary.segments,
+                                    summary.rows, summary.seconds, summary.skipped))
+        for segment_start, segment_end, source_rows, stored_rows in summary.compression:
+            click.echo('    segment {} to {}: stored {} of {} rows, compression ratio '
+                       '{:.2f}'.format(segment_start, segment_end, stored_rows, source_rows,
+                                       float(source_rows) / stored_rows))
+        for error in summary.errors:
+            click.echo('    error: {}'.format(error))
+
+    click.echo('Ingested {} rows from {} files, skipped {} unchanged files'.format(
+        sum(summary.rows for summary in summaries), len(summaries),
+        sum(summary.unchanged for summary in summaries)))
+
+
+@click.command('archive')
+@click.option('--retention-days', type=click.FloatRange(min=0), default=None,
+              help='Number of days the samples of a segment are kept in the OrbitRecord table '
+                   'after the segment ends. Defaults to the RETENTION_DAYS setting.')
+@click.option('--platform-id', type=int, default=None,
+              help='Only archive the segments of this satellite.')
+@with_appcontext
+def archive_command(retention_days, platform_id):
+    """Move the samples of old segments to the compact archive, where they stay queryable."""
+    if retention_days is None:
+        retention_days = current_app.config.get('RETENTION_DAYS')
+    if retention_days is None:
+        raise click.UsageError('No retention, give --retention-days or set RETENTION_DAYS')
+
+    segments, rows = apply_retention(retention_days, platform_id=platform_id)
+    click.echo('Archived {} rows of {} segments older than {} days'.format(rows, segments,
+                                                                          retention_days))
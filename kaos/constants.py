@@ -13,6 +13,7 @@ ELLIPSOID_E = 8.1819190842622e-2
 ANGULAR_VELOCITY_EARTH = 7.2921159e-5  # rad/sec
 EARTH_A_AXIS = 6378137.0  # Earth's semi major axis(meters)
 EARTH_B_AXIS = 6356752.3142  # Earth's semi minor axis (meters)
+EARTH_MU = 3.986004418e14  # Earth's standard gravitational parameter (m^3/s^2)
 SECONDS_PER_DAY = 23 * 60 * 60 + 56 * 60 + mp.mpf('4.0989')
 THETA_NAUGHT = 0  # visibility threshold (Rad)
 J2000 = 946728000  # Jan 1st 2000 @ noon in POSIX
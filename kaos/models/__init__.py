@@ -3,4 +3,5 @@
 Author: KMC-70
 """
 
-from .models import DB, Satellite, ResponseHistory, OrbitSegment, OrbitRecord
+from .models import (DB, Satellite, ResponseHistory, OrbitSegment, OrbitSummary, OrbitRecord,
+                     OrbitArchive, IngestedFile)
@@ -0,0 +1,108 @@
+"""Retention of ephemeris records: archival of old segments out of the OrbitRecord table.
+
+The OrbitRecord table and its indexes grow with every file ingested, while queries mostly look at
+recent time windows. Segments that end before a retention cutoff are moved to the compact
+OrbitArchive table, one compressed array per segment, and their records are deleted from the
+OrbitRecord table. The segments and their orbit summaries stay where they are, so archived time
+windows are still found by segment lookups and their records are unpacked on demand, see
+OrbitRecord.get_by_segments.
+"""
+
+import logging
+import time
+
+from kaos.utils.time_conversion import SECONDS_PER_UTC_DAY
+
+from .loader import insert_orbit_records, segment_ephemeris
+from .models import DB, OrbitArchive, OrbitRecord, OrbitSegment
+
+
+def _archive_segment(segment_id, platform_id):
+    """Move the records of a segment to the archive in their own transaction.
+
+    Args:
+        segment_id (int): The unique ID of the segment.
+        platform_id (int): The unique ID of the satellite that owns the segment.
+
+    Returns:
+        The number of archived records.
+    """
+    try:
+        ephemeris = segment_ephemeris(segment_id)
+        if ephemeris.size:
+            OrbitArchive(segment_id=segment_id, platform_id=platform_id, rows=len(ephemeris),
+                         ephemeris=OrbitArchive.pack(ephemeris)).save()
+            OrbitRecord.query.filter(OrbitRecord.segment_id == segment_id) \
+                             .delete(synchronize_session=False)
+        DB.session.commit()
+    except Exception:
+        DB.session.rollback()
+        raise
+    return len(ephemeris)
+
+
+def archive_segments(before_time, platform_id=None):
+    """Archive the records of the segments that end before a time.
+
+    Every segment is archived in its own transaction, so that archiving a long history does not
+    hold locks on the OrbitRecord table until the end.
+
+    Args:
+        before_time (float): The retention cutoff in UNIX time, segments that end before it are
+                             archived.
+        platform_id (int, optional): Only archive the segments of this satellite. Defaults to all
+                                     the satellites.
+
+    Returns:
+        A tuple (segments, rows) of the number of archived segments and records.
+    """
+    query = (DB.session.query(OrbitSegment.segment_id, OrbitSegment.platform_id)
+             .outerjoin(OrbitArchive, OrbitArchive.segment_id == OrbitSegment.segment_id)
+             .filter(OrbitSegment.end_time < before_time, OrbitArchive.segment_id.is_(None))
+             .order_by(OrbitSegment.start_time))
+    if platform_id is not None:
+        query = query.filter(OrbitSegment.platform_id == platform_id)
+
+    archived_rows = [_archive_segment(segment_id, segment_platform_id)
+                     for segment_id, segment_platform_id in query.all()]
+    segments, rows = sum(1 for count in archived_rows if count), sum(archived_rows)
+
+    logging.info('Archived %d orbit records of %d segments ending before %s', rows, segments,
+                 before_time)
+    return segments, rows
+
+
+def apply_retention(retention_days, now=None, platform_id=None):
+    """Archive the segments that ended more than a number of days ago, see archive_segments.
+
+    Args:
+        retention_days (float): The number of days the records of a segment are kept in the
+                                OrbitRecord table after the segment ends.
+        now (float, optional): The current time in UNIX time. Defaults to the system time.
+        platform_id (int, optional): See archive_segments.
+
+    Returns:
+        See archive_segments.
+    """
+    now = time.time() if now is None else now
+    return archive_segments(now - retention_days * SECONDS_PER_UTC_DAY, platform_id)
+
+
+def restore_segment(segment_id):
+    """Move the records of an archived segment back to the OrbitRecord table, in the transaction of
+    the current session.
+
+    Args:
+        segment_id (int): The unique ID of the segment.
+
+    Returns:
+        The number of restored records, 0 if the segment is not archived.
+    """
+    archive = OrbitArchive.query.get(segment_id)
+    if archive is None:
+        return 0
+
+    rows = insert_orbit_records(archive.platform_id, segment_id, archive.unpack())
+    DB.session.delete(archive)
+    DB.session.flush()
+    return rows
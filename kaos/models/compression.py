@@ -0,0 +1,202 @@
+"""Transparent decompression of gzip, bzip2 and xz compressed ephemeris files.
+
+Compressed files and uploads are decompressed as a stream while they are parsed, the decompressed
+file is never held in memory or written to disk. xz support needs the lzma module, which is only
+available from the backports.lzma package on Python 2.
+"""
+
+import bz2
+import zlib
+from collections import OrderedDict
+
+# pylint: disable=import-error
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+# pylint: enable=import-error
+
+EPHEMERIS_EXTENSION = '.e'
+
+# Number of compressed bytes decompressed at once
+COMPRESSED_READ_SIZE = 1 << 16
+
+DECOMPRESSORS = OrderedDict([
+    # Accept gzip headers only, see zlib.decompressobj
+    ('.gz', lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+    ('.bz2', bz2.BZ2Decompressor),
+])
+if lzma is not None:
+    DECOMPRESSORS['.xz'] = lzma.LZMADecompressor
+
+# Errors raised by the decompressors on corrupt data
+DECOMPRESSION_ERRORS = (zlib.error, IOError, EOFError) + ((lzma.LZMAError,) if lzma else ())
+
+EPHEMERIS_EXTENSIONS = (EPHEMERIS_EXTENSION,) + tuple(EPHEMERIS_EXTENSION + extension
+                                                      for extension in DECOMPRESSORS)
+
+
+class DecompressingStream(object):
+    """Read only file like object that decompresses another stream as it is read.
+
+    Concatenated compressed streams, as produced by appending to a gzip file, are decompressed one
+    after the other.
+    """
+
+    def __init__(self, stream, decompressor_factory):
+        """Args:
+            stream (file): The compressed stream, opened in binary mode.
+            decompressor_factory (fn): Creates a decompressor with a decompress method and an
+                                       unused_data attribute, like zlib.decompressobj.
+        """
+        self.stream = stream
+        self.decompressor_factory = decompressor_factory
+        self.decompressor = decompressor_factory()
+        self.buffer = ''
+        self.exhausted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the compressed stream."""
+        self.stream.close()
+
+    def _decompress(self, data):
+        """Decompress a block of compressed data, starting a new decompressor on every new stream.
+
+        Args:
+            data (str): Compressed data.
+
+        Returns:
+            The decompressed data.
+        """
+        output = []
+        while data:
+            output.append(self.decompressor.decompress(data))
+            data = self.decompressor.unused_data
+            if data:
+                self.decompressor = self.decompressor_factory()
+        return ''.join(output)
+
+    def _at_end_of_stream(self):
+        """Check whether the current decompressor has reached the end of its compressed stream."""
+        eof = getattr(self.decompressor, 'eof', None)
+        if eof is not None:
+            return eof
+
+        # The Python 2 zlib and bz2 decompressors have no eof flag. Past the end of the stream, zlib
+        # keeps extra data as unused_data and bz2 raises EOFError.
+        try:
+            self.decompressor.decompress(b'\0')
+        except EOFError:
+            return True
+        except DECOMPRESSION_ERRORS:
+            return False
+        return bool(self.decompressor.unused_data)
+
+    def _fill(self):
+        """Decompress the next block of the compressed stream into the buffer.
+
+        Returns:
+            False if the compressed stream is exhausted, True otherwise.
+
+        Raises:
+            ValueError: If the compressed stream is corrupt or truncated.
+        """
+        if self.exhausted:
+            return False
+
+        data = self.stream.read(COMPRESSED_READ_SIZE)
+        if not data:
+            self.exhausted = True
+            if not self._at_end_of_stream():
+                raise ValueError("Truncated compressed data")
+            return False
+
+        try:
+            self.buffer += self._decompress(data)
+        except DECOMPRESSION_ERRORS as error:
+            raise ValueError("Corrupt compressed data: {}".format(error))
+        return True
+
+    def read(self, size=-1):
+        """Read up to size decompressed characters, everything that is left if size is negative."""
+        while (size < 0 or len(self.buffer) < size) and self._fill():
+            pass
+
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self):
+        """Read the next decompressed line, including its line terminator."""
+        end = self.buffer.find('\n')
+        while end < 0 and self._fill():
+            end = self.buffer.find('\n')
+
+        return self.read(end + 1 if end >= 0 else -1)
+
+
+def compression_extension(filename):
+    """Find the compression extension of an ephemeris filename.
+
+    Args:
+        filename (str): The name of the ephemeris file.
+
+    Returns:
+        The extension of the compression, such as '.gz', None if the file is not compressed.
+
+    Raises:
+        ValueError: If the file is xz compressed and the lzma module is not available.
+    """
+    for extension in DECOMPRESSORS:
+        if filename.lower().endswith(EPHEMERIS_EXTENSION + extension):
+            return extension
+
+    if filename.lower().endswith(EPHEMERIS_EXTENSION + '.xz'):
+        raise ValueError("xz compressed ephemeris files need the backports.lzma package")
+    return None
+
+
+def is_ephemeris_filename(filename):
+    """Check whether a file is a plain or compressed ephemeris file that can be ingested."""
+    return filename.lower().endswith(EPHEMERIS_EXTENSIONS)
+
+
+def decompressing_stream(filename, stream):
+    """Wrap a stream of an ephemeris file so that it is decompressed as it is read.
+
+    Args:
+        filename (str): The name of the ephemeris file, the compression is given by its extension.
+        stream (file): The stream of the file, in binary mode if the file is compressed.
+
+    Returns:
+        A file like object of the decompressed file, the stream itself if the file is not
+        compressed.
+    """
+    extension = compression_extension(filename)
+    if extension is None:
+        return stream
+    return DecompressingStream(stream, DECOMPRESSORS[extension])
+
+
+def open_ephemeris_file(filename):
+    """Open a plain or compressed ephemeris file for reading.
+
+    Args:
+        filename (str): The path of the ephemeris file.
+
+    Returns:
+        A file like object of the decompressed file.
+    """
+    if compression_extension(filename) is None:
+        return open(filename, "rU")
+    return decompressing_stream(filename, open(filename, "rb"))
@@ -0,0 +1,86 @@
+"""Decimation of ephemeris rows with a bound on the position error of the dropped rows.
+
+Ephemeris files carry a row every minute or so, even on smooth stretches of the orbit that far fewer
+rows reproduce to metre level accuracy with cubic Hermite interpolation of the positions and
+velocities, see kaos.algorithm.hermite. Rows are dropped greedily: from every kept row, the next
+kept row is the furthest one for which the Hermite interpolation between the two reproduces the
+position of every row in between within the tolerance.
+
+The bound holds at the times of the dropped rows. Segments stored with decimation record their
+tolerance and are always interpolated with Hermite interpolation, see OrbitSegment.
+"""
+
+import numpy as np
+
+from kaos.algorithm.hermite import hermite_interp
+
+
+def _reproduces(ephemeris, first, last, tolerance):
+    """Check whether the Hermite interpolation between two rows reproduces the rows in between.
+
+    Args:
+        ephemeris (array): An (N, 7) array of consecutive ephemeris rows.
+        first (int): The index of the first row.
+        last (int): The index of the last row, after the first.
+        tolerance (float): The largest allowed distance between an interpolated and a stored
+                           position, in metres.
+
+    Returns:
+        True if every row strictly between the two is reproduced within the tolerance.
+    """
+    if last - first < 2:
+        return True
+
+    ends, between = ephemeris[[first, last]], ephemeris[first + 1:last]
+    positions, _ = hermite_interp(ends[:, 0], ends[:, 1:4], ends[:, 4:7], between[:, 0])
+    return bool(np.linalg.norm(positions - between[:, 1:4], axis=1).max() <= tolerance)
+
+
+def decimation_indices(ephemeris, tolerance):
+    """Find the rows kept by the decimation of consecutive ephemeris rows.
+
+    The span from every kept row is doubled while it reproduces the rows it skips, then bisected
+    between the longest span that does and the shortest one that does not. Only spans that were
+    checked are used, so the bound holds even where the error does not grow with the span.
+
+    Args:
+        ephemeris (array): A non empty (N, 7) array of consecutive ephemeris rows of a segment.
+        tolerance (float): The largest allowed position error of a dropped row, in metres.
+
+    Returns:
+        A sorted list of the indices of the kept rows, always including the first and the last.
+    """
+    last_row = len(ephemeris) - 1
+    kept = [0]
+    while kept[-1] < last_row:
+        first = kept[-1]
+        good, bad, span = first + 1, None, 2
+        while bad is None and good < last_row:
+            candidate = min(first + span, last_row)
+            if _reproduces(ephemeris, first, candidate, tolerance):
+                good = candidate
+            else:
+                bad = candidate
+            span *= 2
+
+        while bad is not None and bad - good > 1:
+            middle = (good + bad) // 2
+            if _reproduces(ephemeris, first, middle, tolerance):
+                good = middle
+            else:
+                bad = middle
+        kept.append(good)
+    return kept
+
+
+def decimate_ephemeris(ephemeris, tolerance):
+    """Drop the ephemeris rows that Hermite interpolation of the kept rows reproduces.
+
+    Args:
+        ephemeris (array): A non empty (N, 7) array of consecutive ephemeris rows of a segment.
+        tolerance (float): The largest allowed position error of a dropped row, in metres.
+
+    Returns:
+        An (M, 7) array of the kept rows, M <= N.
+    """
+    return ephemeris[decimation_indices(ephemeris, tolerance)]
@@ -0,0 +1,80 @@
+"""Content hashes of ephemeris files and segments.
+
+Ingested files and segments record the SHA-256 of their contents, so that data that was already
+loaded is recognized and skipped without comparing it to the DB row by row. A file is hashed on its
+raw bytes, before it is decompressed or parsed. A segment is hashed on its decoded rows, so that the
+same segment found in differently formatted or compressed files is still recognized.
+"""
+
+import hashlib
+
+import numpy as np
+
+# Number of bytes hashed at once
+HASH_READ_SIZE = 1 << 20
+
+
+def new_content_hash():
+    """Create an empty content hash, see hashlib.sha256."""
+    return hashlib.sha256()
+
+
+def file_content_hash(filename):
+    """Hash the raw bytes of a file.
+
+    Args:
+        filename (str): The path of the file.
+
+    Returns:
+        The hexadecimal SHA-256 digest of the file.
+    """
+    content_hash = new_content_hash()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def update_segment_hash(content_hash, ephemeris):
+    """Add ephemeris rows to the content hash of a segment.
+
+    Args:
+        content_hash (obj:hashlib.sha256): The content hash of the segment.
+        ephemeris (array): An (N, 7) float64 array of consecutive rows of the segment.
+
+    Returns:
+        The updated content hash.
+    """
+    content_hash.update(np.ascontiguousarray(ephemeris, dtype=np.float64).tobytes())
+    return content_hash
+
+
+class HashingStream(object):
+    """Read only file like object that hashes the bytes read from another stream."""
+
+    def __init__(self, stream):
+        """Args:
+            stream (file): The stream to read and hash.
+        """
+        self.stream = stream
+        self.content_hash = new_content_hash()
+
+    def read(self, size=-1):
+        """Read and hash up to size bytes, everything that is left if size is negative."""
+        data = self.stream.read(size)
+        self.content_hash.update(data)
+        return data
+
+    def readline(self):
+        """Read and hash the next line."""
+        data = self.stream.readline()
+        self.content_hash.update(data)
+        return data
+
+    def close(self):
+        """Close the hashed stream."""
+        self.stream.close()
+
+    def hexdigest(self):
+        """The hexadecimal SHA-256 digest of the bytes read so far."""
+        return self.content_hash.hexdigest()
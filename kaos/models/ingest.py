@@ -0,0 +1,194 @@
+"""Bulk ingestion of many ephemeris files at once.
+
+Reading, decoding and formatting the rows of ephemeris files for COPY is CPU bound and independent
+from one file to the next, so it is done concurrently in a process pool. Each file is then stored by
+the calling process in its own transaction as soon as it has been read.
+
+Storing is not parallel: files are written one at a time on a single connection, so that files of
+the same satellite are checked for overlaps against each other in a deterministic order. With COPY
+the remaining per file cost in the calling process is dominated by the DB itself, so the total
+ingest time stops scaling with the number of processes once the DB write time is reached.
+"""
+
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from kaos.tuples import IngestSummary
+from kaos.models.compression import is_ephemeris_filename
+from kaos.models.hashing import file_content_hash
+from kaos.models.loader import deferred_index_maintenance, format_copy_rows
+from kaos.models.parser import (read_ephemeris_file, split_ephemeris_segments, store_ephemeris,
+                               unchanged_file_summary)
+
+
+def _timed_read_ephemeris_file(filename):
+    """Process pool worker that reads an ephemeris file and prepares its rows for COPY.
+
+    Args:
+        filename (str): The path of the ephemeris file.
+
+    Returns:
+        A tuple (read_time, parsed, copy_rows) where parsed is the output of read_ephemeris_file and
+        copy_rows are the rows of every segment formatted by format_copy_rows, see
+        store_ephemeris.
+    """
+    read_start = time.time()
+    parsed = read_ephemeris_file(filename)
+    start_time, segment_boundaries, ephemeris = parsed
+    copy_rows = [format_copy_rows(segment) for segment
+                 in split_ephemeris_segments(ephemeris, segment_boundaries, start_time)]
+    return time.time() - read_start, parsed, copy_rows
+
+
+def _try_file_content_hash(filename):
+    """Hash a file, see file_content_hash.
+
+    Returns:
+        The hexadecimal SHA-256 digest of the file, None if the file cannot be read. The error is
+        then reported when the file is read.
+    """
+    try:
+        return file_content_hash(filename)
+    except EnvironmentError:
+        return None
+
+
+# pylint: disable=too-many-locals
+def ingest_ephemeris_files(filenames, processes=None, defer_indexes=False, incremental=False,
+                           decimation_tolerance=None):
+    """Read and store a list of ephemeris files.
+
+    Files whose contents were already ingested are skipped without being read.
+
+    Args:
+        filenames (list): The paths of the ephemeris files.
+        processes (int, optional): The number of worker processes used to read the files. Defaults
+                                   to the number of CPUs.
+        defer_indexes (bool, optional): Whether to drop the OrbitRecord indexes during the load and
+                                        rebuild them once after the last file instead of
+                                        maintaining them row by row. See
+                                        deferred_index_maintenance. Defaults to False.
+        incremental (bool, optional): Whether files update the end of the stored segments they
+                                      overlap, see store_ephemeris. Defaults to False.
+        decimation_tolerance (float, optional): The position error bound in metres of the rows
+                                                dropped from every segment, see store_ephemeris.
+                                                Defaults to storing every row.
+
+    Returns:
+        A list of IngestSummary, one for every file in the same order as filenames. A file that
+        could not be read or stored has no data in the DB and the reason is reported in its
+        summary errors.
+    """
+    summaries = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending_files = []
+        for filename in filenames:
+            content_hash = _try_file_content_hash(filename)
+            unchanged = content_hash and unchanged_file_summary(filename, content_hash)
+            pending_read = (None if unchanged else
+                            executor.submit(_timed_read_ephemeris_file, filename))
+            pending_files.append((filename, content_hash, unchanged, pending_read))
+
+        # Files are stored in order, so that files of the same satellite are always stored the same
+        # way, while the remaining files are still being read by the pool
+        with deferred_index_maintenance(defer_indexes):
+            for filename, content_hash, unchanged, pending_read in pending_files:
+                if unchanged:
+                    summaries.append(unchanged)
+                    continue
+
+                read_time = 0
+                # pylint: disable=broad-except
+                try:
+                    read_time, parsed, copy_rows = pending_read.result()
+                    summary = store_ephemeris(filename, *parsed, content_hash=content_hash,
+                                              copy_rows=copy_rows, incremental=incremental,
+                                              decimation_tolerance=decimation_tolerance)
+                    summaries.append(summary._replace(seconds=read_time + summary.seconds))
+                except Exception as error:
+                    summaries.append(IngestSummary(filename, None, 0, 0, read_time,
+                                                   [str(error) or repr(error)], 0, False, []))
+                # pylint: enable=broad-except
+
+    return summaries
+# pylint: enable=too-many-locals
+
+
+def find_ephemeris_files(directory):
+    """Find all the plain and compressed ephemeris files under a directory.
+
+    Args:
+        directory (str): The directory to search.
+
+    Returns:
+        A sorted list of the paths of the ephemeris files.
+    """
+    return sorted(os.path.join(root, filename)
+                  for root, _, filenames in os.walk(directory)
+                  for filename in filenames
+                  if is_ephemeris_filename(filename))
+
+
+def _extract_archive(path, directory):
+    """Extract the regular files of a zip or tar archive into a directory.
+
+    Args:
+        path (str): The path of the archive.
+        directory (str): The directory to extract the archive into.
+
+    Raises:
+        ValueError: If the path is not a supported archive.
+    """
+    if zipfile.is_zipfile(path):
+        # zipfile already strips absolute and parent directory components from member names
+        with zipfile.ZipFile(path) as archive:
+            archive.extractall(directory)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            members = [member for member in archive.getmembers()
+                       if member.isfile() and not os.path.isabs(member.name)
+                       and os.pardir not in member.name.split('/')]
+            archive.extractall(directory, members)
+    else:
+        raise ValueError("Not a directory or a supported archive: {}".format(path))
+
+
+def ingest_ephemeris_path(path, processes=None, defer_indexes=False, incremental=False,
+                          decimation_tolerance=None):
+    """Ingest all the ephemeris files in a directory or an archive.
+
+    Args:
+        path (str): A directory, a zip archive or a (compressed) tar archive of ephemeris files.
+        processes (int, optional): The number of worker processes used to read the files. Defaults
+                                   to the number of CPUs.
+        defer_indexes (bool, optional): See ingest_ephemeris_files. Defaults to False.
+        incremental (bool, optional): See ingest_ephemeris_files. Defaults to False.
+        decimation_tolerance (float, optional): See ingest_ephemeris_files. Defaults to storing
+                                                every row.
+
+    Returns:
+        A list of IngestSummary, one for every ephemeris file found.
+
+    Raises:
+        ValueError: If the path is neither a directory nor a supported archive.
+    """
+    if os.path.isdir(path):
+        return ingest_ephemeris_files(find_ephemeris_files(path), processes, defer_indexes,
+                                      incremental, decimation_tolerance)
+
+    extract_directory = tempfile.mkdtemp()
+    try:
+        _extract_archive(path, extract_directory)
+        summaries = ingest_ephemeris_files(find_ephemeris_files(extract_directory), processes,
+                                           defer_indexes, incremental, decimation_tolerance)
+    finally:
+        shutil.rmtree(extract_directory)
+
+    # Report the files relative to the archive rather than the temporary directory
+    return [summary._replace(filename=os.path.relpath(summary.filename, extract_directory))
+            for summary in summaries]
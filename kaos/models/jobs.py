@@ -0,0 +1,196 @@
+"""Background ingestion jobs for uploaded ephemeris files.
+
+Uploads only queue a job and return its ID, the file is parsed and stored by a pool of worker
+threads so that the request workers stay free to serve visibility queries. Jobs are kept in memory
+by the process that received the upload.
+"""
+
+from __future__ import division
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from kaos.models.hashing import file_content_hash
+from kaos.models.parser import read_ephemeris_file, store_ephemeris, unchanged_file_summary
+
+
+class IngestJob(object):  # pylint: disable=too-many-instance-attributes
+    """Progress of the ingestion of a single ephemeris file.
+
+    A job goes through the following states:
+        queued:     Waiting for a free worker
+        running:    The file is being parsed and stored
+        done:       The file was ingested, segments that overlap existing data are reported in the
+                    errors. A file whose contents were already ingested is done without being read.
+        failed:     The file could not be ingested and nothing was stored
+    """
+
+    def __init__(self, job_id, filename):
+        """Args:
+            job_id (int): The unique ID of the job.
+            filename (str): The path of the ephemeris file to ingest.
+        """
+        self.job_id = job_id
+        self.filename = filename
+        self.state = 'queued'
+        self.platform_id = None
+        self.parsed_rows = 0
+        self.written_segments = 0
+        self.written_rows = 0
+        self.skipped_segments = 0
+        self.unchanged = False
+        self.errors = []
+        self.start_time = None
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def progress(self, written_segments, written_rows):
+        """Record the number of segments and rows stored so far."""
+        with self.lock:
+            self.written_segments = written_segments
+            self.written_rows = written_rows
+
+    def run(self, app):
+        """Parse and store the ephemeris file of the job.
+
+        Args:
+            app (obj:Flask): The application whose DB the file is stored in.
+        """
+        with self.lock:
+            self.state = 'running'
+            self.start_time = time.time()
+
+        # pylint: disable=broad-except
+        try:
+            with app.app_context():
+                content_hash = file_content_hash(self.filename)
+                summary = unchanged_file_summary(self.filename, content_hash)
+                if summary is None:
+                    parsed = read_ephemeris_file(self.filename)
+                    with self.lock:
+                        self.parsed_rows = len(parsed[2])
+
+                    summary = store_ephemeris(self.filename, *parsed, progress=self.progress,
+                                              content_hash=content_hash)
+
+            with self.lock:
+                self.state = 'done'
+                self.platform_id = summary.platform_id
+                self.skipped_segments = summary.skipped
+                self.unchanged = summary.unchanged
+                self.errors = summary.errors
+        except Exception as error:
+            logging.exception('Ingestion job %s failed', self.job_id)
+            with self.lock:
+                self.state = 'failed'
+                self.written_segments = 0
+                self.written_rows = 0
+                self.errors = [str(error) or repr(error)]
+        # pylint: enable=broad-except
+
+        with self.lock:
+            self.end_time = time.time()
+
+    def is_finished(self):
+        """Check whether the job is done or failed."""
+        return self.state in ('done', 'failed')
+
+    def to_dict(self):
+        """Produces a dictionary representation of the job progress.
+
+        Returns:
+            A dictionary with the job ID, state, filename, platform ID, parsed rows, written
+            segments and rows, skipped segments, whether the file was unchanged, elapsed seconds,
+            throughput in written rows per second and errors.
+        """
+        with self.lock:
+            if self.start_time is None:
+                seconds = 0
+            else:
+                seconds = (self.end_time or time.time()) - self.start_time
+
+            return {
+                'job_id': self.job_id,
+                'state': self.state,
+                'filename': self.filename,
+                'platform_id': self.platform_id,
+                'parsed_rows': self.parsed_rows,
+                'written_segments': self.written_segments,
+                'written_rows': self.written_rows,
+                'skipped_segments': self.skipped_segments,
+                'unchanged': self.unchanged,
+                'seconds': seconds,
+                'rows_per_second': self.written_rows / seconds if seconds else 0,
+                'errors': list(self.errors),
+            }
+
+
+class IngestJobQueue(object):
+    """Queue of ingestion jobs processed by a pool of worker threads.
+
+    Follows the Flask extension pattern, the queue is created once and bound to the application with
+    init_app.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.max_finished_jobs = 0
+        self.jobs = OrderedDict()
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the queue to an application and start its workers.
+
+        The number of workers and the number of finished jobs kept for polling are set by the
+        INGEST_WORKERS and INGEST_JOB_HISTORY config values.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=app.config.get('INGEST_WORKERS', 1))
+        self.max_finished_jobs = app.config.get('INGEST_JOB_HISTORY', 1000)
+
+    def submit(self, filename):
+        """Queue the ingestion of an ephemeris file.
+
+        Args:
+            filename (str): The path of the ephemeris file to ingest.
+
+        Returns:
+            The queued IngestJob.
+        """
+        with self.lock:
+            job = IngestJob(next(self.job_ids), filename)
+            self.jobs[job.job_id] = job
+            self._forget_finished_jobs()
+
+        self.executor.submit(job.run, self.app)
+        return job
+
+    def get(self, job_id):
+        """Find a job by its ID.
+
+        Args:
+            job_id (int): The unique ID of the job.
+
+        Returns:
+            The IngestJob, or None if no such job exists or it has been forgotten.
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _forget_finished_jobs(self):
+        """Drop the oldest finished jobs beyond the configured history size."""
+        finished_jobs = [job_id for job_id, job in self.jobs.items() if job.is_finished()]
+        for job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+
+INGEST_JOBS = IngestJobQueue()
@@ -0,0 +1,171 @@
+"""Bulk loading of parsed ephemeris data into the DB.
+
+Ephemeris files hold tens of thousands of samples, so OrbitRecords are never created as ORM objects
+during ingestion. Rows are streamed with PostgreSQL's COPY FROM STDIN, or inserted with a single
+executemany on other engines, inside the transaction of the current session, and read back as
+arrays with segment_ephemeris. The segments of a file are written with
+kaos.models.writer.SegmentWriter.
+"""
+
+import io
+from contextlib import contextmanager
+
+import numpy as np
+
+from .models import DB, OrbitRecord
+
+ORBIT_RECORD_COLUMNS = ('platform_id', 'segment_id', 'time', 'position', 'velocity')
+
+
+def format_copy_rows(ephemeris):
+    """Format ephemeris rows as the time, position and velocity columns of COPY FROM STDIN rows.
+
+    Formatting the rows is the costly part of a COPY, so it can be done ahead of time, e.g. by the
+    processes that read the files, and passed to insert_orbit_records.
+
+    Args:
+        ephemeris (array): An (N, 7) array of ephemeris rows in UNIX time.
+
+    Returns:
+        The rows as tab separated text, one line per row.
+    """
+    # repr gives the shortest string that round trips to the same float
+    row_format = '{!r}\t{{{!r},{!r},{!r}}}\t{{{!r},{!r},{!r}}}\n'
+    return ''.join(row_format.format(*row) for row in ephemeris.tolist())
+
+
+def _copy_orbit_records(connection, platform_id, segment_id, ephemeris, copy_rows=None):
+    """Stream the ephemeris rows into the OrbitRecord table using COPY FROM STDIN.
+
+    Args:
+        connection (obj:Connection): The SQLAlchemy connection of the current session.
+        platform_id (int): The unique ID of the satellite that owns the rows.
+        segment_id (int): The unique ID of the segment that the rows fall within.
+        ephemeris (array): An (N, 7) array of ephemeris rows in UNIX time.
+        copy_rows (str, optional): The rows formatted by format_copy_rows. Defaults to formatting
+                                   them here.
+    """
+    if copy_rows is None:
+        copy_rows = format_copy_rows(ephemeris)
+
+    # Prefix every line with the IDs in one pass rather than formatting them row by row
+    prefix = '{}\t{}\t'.format(platform_id, segment_id)
+    copy_data = prefix + copy_rows[:-1].replace('\n', '\n' + prefix) + '\n'
+
+    copy_statement = 'COPY "{}" ({}) FROM STDIN'.format(OrbitRecord.__tablename__,
+                                                        ', '.join(ORBIT_RECORD_COLUMNS))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(copy_statement, io.BytesIO(copy_data.encode('ascii')))
+    finally:
+        cursor.close()
+
+
+def _executemany_orbit_records(connection, platform_id, segment_id, ephemeris):
+    """Insert the ephemeris rows into the OrbitRecord table with a single executemany.
+
+    Args:
+        connection (obj:Connection): The SQLAlchemy connection of the current session.
+        platform_id (int): The unique ID of the satellite that owns the rows.
+        segment_id (int): The unique ID of the segment that the rows fall within.
+        ephemeris (array): An (N, 7) array of ephemeris rows in UNIX time.
+    """
+    connection.execute(OrbitRecord.__table__.insert(),
+                       [dict(zip(ORBIT_RECORD_COLUMNS,
+                                 (platform_id, segment_id, row[0], row[1:4], row[4:7])))
+                        for row in ephemeris.tolist()])
+
+
+def insert_orbit_records(platform_id, segment_id, ephemeris, use_copy=None, copy_rows=None):
+    """Insert a block of ephemeris rows into the OrbitRecord table.
+
+    The rows are written in the transaction of the current session, nothing is committed.
+
+    Args:
+        platform_id (int): The unique ID of the satellite that owns the rows.
+        segment_id (int): The unique ID of the segment that the rows fall within.
+        ephemeris (array): An (N, 7) array of ephemeris rows formatted as:
+
+            time posx posy posz velx vely velz
+
+        use_copy (bool, optional): Whether to use COPY FROM STDIN. Defaults to using COPY only when
+                                   the DB is PostgreSQL.
+        copy_rows (str, optional): The rows already formatted by format_copy_rows, used by COPY.
+                                   Defaults to None.
+
+    Returns:
+        The number of inserted rows.
+    """
+    if not ephemeris.size:
+        return 0
+
+    connection = DB.session.connection()
+    if use_copy is None:
+        use_copy = connection.dialect.name == 'postgresql'
+
+    if use_copy:
+        _copy_orbit_records(connection, platform_id, segment_id, ephemeris, copy_rows)
+    else:
+        _executemany_orbit_records(connection, platform_id, segment_id, ephemeris)
+
+    return len(ephemeris)
+
+
+def segment_ephemeris(segment_id, start_time=None, limit=None):
+    """Load the stored rows of a segment.
+
+    Args:
+        segment_id (int): The unique ID of the stored segment.
+        start_time (float, optional): Only load the rows at and after this time. Defaults to
+                                      loading all the rows.
+        limit (int, optional): The maximum number of rows to load. Defaults to no limit.
+
+    Returns:
+        An (N, 7) array of the rows sorted by time.
+    """
+    query = (DB.session.query(OrbitRecord.time, OrbitRecord.position, OrbitRecord.velocity)
+                       .filter(OrbitRecord.segment_id == segment_id))
+    if start_time is not None:
+        query = query.filter(OrbitRecord.time >= start_time)
+    query = query.order_by(OrbitRecord.time).limit(limit)
+
+    return np.array([[record_time] + position + velocity
+                     for record_time, position, velocity in query],
+                    dtype=np.float64).reshape(-1, 7)
+
+
+@contextmanager
+def deferred_index_maintenance(enabled=True):
+    """Drop the secondary OrbitRecord indexes for the duration of a bulk load of many files and
+    rebuild them once the load is done.
+
+    The indexes are dropped and rebuilt in transactions of their own, so that the files loaded in
+    between can each be committed on their own and no lock is held on the OrbitRecord table for the
+    duration of the load. Queries made during the load run without the indexes. The indexes are
+    rebuilt even if the load fails.
+
+    Rebuilding the indexes scans the whole table, hence this is only worth it when the load adds a
+    large part of the table.
+
+    Args:
+        enabled (bool, optional): Whether to defer index maintenance. Defaults to True.
+    """
+    if not enabled:
+        yield
+        return
+
+    indexes = OrbitRecord.__table__.indexes
+    connection = DB.session.connection()
+    for index in indexes:
+        index.drop(bind=connection)
+    DB.session.commit()
+
+    try:
+        yield
+    finally:
+        # Discard whatever a failed load left in the session before rebuilding
+        DB.session.rollback()
+        connection = DB.session.connection()
+        for index in indexes:
+            index.create(bind=connection)
+        DB.session.commit()
@@ -1,5 +1,10 @@
 """Database models for KAOS."""
 
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
 from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 from flask_validator import ValidateInteger
@@ -11,6 +16,10 @@ DB = SQLAlchemy()
 
 CACHE = Cache(config={'CACHE_TYPE': 'simple'})
 
+# Timestamps looked up with OrbitSegment.get_by_platform_and_time by this process, per platform, so
+# that the cached lookups of a time range can be invalidated without clearing the whole cache
+_SEGMENT_LOOKUPS = defaultdict(set)
+
 
 class SavableModel:
     """SQL Alchemy model mixin used to enable quick saving."""
@@ -115,6 +124,14 @@ class OrbitSegment(SavableModel, DB.Model):
         platform_id:    Unique ID for the satellite that owns this segment
         start_time:     Time in seconds since the Linux epoch that records in this segment start on
         end_time:       Time in seconds since the Linux epoch that records in this segment end on
+        content_hash:   SHA-256 of the ephemeris rows of the segment, see kaos.models.hashing
+        min_radius:     The minimum distance from the earth center to the satellite position
+        max_radius:     The maximum distance from the earth center to the satellite position
+        period:         The orbital period in seconds, estimated from the mean semi-major axis
+        decimation_tolerance:   The position error bound in metres the rows were decimated with,
+                                None if every row of the ephemeris file was stored. Decimated
+                                segments are interpolated with Hermite interpolation, see
+                                kaos.models.decimation
         orbit_records:  Satellite ephemeris records that fall within the time segment and are owned
                         by the platform_id
     """
@@ -124,6 +141,11 @@ class OrbitSegment(SavableModel, DB.Model):
     platform_id = DB.Column(DB.Integer, DB.ForeignKey('Satellite.platform_id'), nullable=False)
     start_time = DB.Column(DB.Float, nullable=False)
     end_time = DB.Column(DB.Float, nullable=False)
+    content_hash = DB.Column(DB.String(64))
+    min_radius = DB.Column(DB.Float)
+    max_radius = DB.Column(DB.Float)
+    period = DB.Column(DB.Float)
+    decimation_tolerance = DB.Column(DB.Float)
     orbit_records = DB.relationship("OrbitRecord", backref='orbit_segment', lazy=True)
 
     # Add an index to improve query time for get_by_platform_and_time
@@ -148,6 +170,7 @@ class OrbitSegment(SavableModel, DB.Model):
             If more than one segment matches, which occurs only if the timestamp is the boundary
             of two segments, return the later segment. If no segment matches, return None.
         """
+        _SEGMENT_LOOKUPS[platform_id].add(timestamp)
         # pylint: disable=undefined-variable
         return (OrbitSegment.query.filter(OrbitSegment.platform_id == platform_id,
                                           OrbitSegment.start_time <= timestamp,
@@ -156,6 +179,143 @@ class OrbitSegment(SavableModel, DB.Model):
                                   .first())
         # pylint: enable=undefined-variable
 
+    @staticmethod
+    def invalidate_cached_lookups(platform_id, start_time, end_time):
+        """Forget the cached results of get_by_platform_and_time for a time range of a satellite,
+        after its segments in that range were changed.
+
+        Args:
+            platform_id: The unique ID of the satellite.
+            start_time: The start of the changed range in seconds since the Unix epoch.
+            end_time: The end of the changed range in seconds since the Unix epoch.
+
+        Returns:
+            The number of invalidated lookups.
+        """
+        lookups = _SEGMENT_LOOKUPS[platform_id]
+        invalidated = [timestamp for timestamp in lookups if start_time <= timestamp <= end_time]
+        for timestamp in invalidated:
+            CACHE.delete_memoized(OrbitSegment.get_by_platform_and_time, platform_id, timestamp)
+            lookups.discard(timestamp)
+        return len(invalidated)
+
+
+class OrbitSummary(SavableModel, DB.Model):
+    """This table summarizes the orbit of a satellite over the part of a segment that falls within a
+    UTC day, so that queries can bound the orbit locally without interpolating it.
+
+    The table holds the following information:
+        uid:            Unique ID for a particular summary
+        platform_id:    Unique ID for the satellite that owns this summary
+        segment_id:     Unique ID for the time segment that the summary falls within
+        start_time:     Time in seconds since the Linux epoch of the first record of the day
+        end_time:       Time in seconds since the Linux epoch of the last record of the day
+        min_radius:     The minimum distance from the earth center to the satellite position
+        max_radius:     The maximum distance from the earth center to the satellite position
+        start_normal:   Unit vector of the orbital angular momentum in the GCRS frame at start_time
+        end_normal:     Unit vector of the orbital angular momentum in the GCRS frame at end_time
+    """
+    __tablename__ = "OrbitSummary"
+
+    uid = DB.Column(DB.Integer, primary_key=True)
+    platform_id = DB.Column(DB.Integer, DB.ForeignKey('Satellite.platform_id'), nullable=False)
+    segment_id = DB.Column(DB.Integer, DB.ForeignKey('OrbitSegment.segment_id'), nullable=False,
+                           index=True)
+    start_time = DB.Column(DB.Float, nullable=False)
+    end_time = DB.Column(DB.Float, nullable=False)
+    min_radius = DB.Column(DB.Float, nullable=False)
+    max_radius = DB.Column(DB.Float, nullable=False)
+    start_normal = DB.Column(DB.ARRAY(DB.Float), nullable=False)
+    end_normal = DB.Column(DB.ARRAY(DB.Float), nullable=False)
+
+    __table_args__ = (Index('OrbitSummary__platform_id__start_time', 'platform_id', 'start_time'), )
+
+    @classmethod
+    def __declare_last__(cls):
+        ValidateInteger(OrbitSummary.uid)
+        ValidateInteger(OrbitSummary.platform_id)
+        ValidateInteger(OrbitSummary.segment_id)
+
+    @staticmethod
+    def get_by_platform_and_time(platform_id, start_time, end_time):
+        """Find the summaries of a satellite that overlap a time range.
+
+        Args:
+            platform_id: The unique ID of the satellite.
+            start_time: The start of the range in seconds since the Unix epoch.
+            end_time: The end of the range in seconds since the Unix epoch.
+
+        Returns:
+            The overlapping summaries, sorted by start_time.
+        """
+        # pylint: disable=undefined-variable
+        return (OrbitSummary.query.filter(OrbitSummary.platform_id == platform_id,
+                                          OrbitSummary.start_time <= end_time,
+                                          OrbitSummary.end_time >= start_time)
+                                  .order_by(OrbitSummary.start_time)
+                                  .all())
+        # pylint: enable=undefined-variable
+
+    @staticmethod
+    def maximum_radii(platform_id, intervals):
+        """Find the maximum distance from the earth center to a satellite within time intervals.
+
+        Args:
+            platform_id: The unique ID of the satellite.
+            intervals (list): TimeIntervals in seconds since the Unix epoch.
+
+        Returns:
+            A list with the maximum radius of the summaries overlapping every interval, None for an
+            interval that no summary overlaps.
+        """
+        if not intervals:
+            return []
+
+        summaries = OrbitSummary.get_by_platform_and_time(
+            platform_id, min(interval.start for interval in intervals),
+            max(interval.end for interval in intervals))
+        return [max([summary.max_radius for summary in summaries
+                     if summary.start_time <= interval.end and summary.end_time >= interval.start]
+                    or [None])
+                for interval in intervals]
+
+
+class IngestedFile(SavableModel, DB.Model):
+    """This table records the ephemeris files that were ingested, so that a file with the same
+    contents is not parsed again.
+
+    The table holds the following information:
+        uid:            Unique ID for the ingested file
+        content_hash:   SHA-256 of the raw bytes of the file, see kaos.models.hashing
+        filename:       The name of the file when it was ingested
+        platform_id:    Unique ID for the satellite that the file was ingested into
+        ingest_time:    Time in seconds since the Linux epoch that the file was ingested at
+    """
+    __tablename__ = "IngestedFile"
+
+    uid = DB.Column(DB.Integer, primary_key=True)
+    content_hash = DB.Column(DB.String(64), nullable=False, unique=True)
+    filename = DB.Column(DB.String, nullable=False)
+    platform_id = DB.Column(DB.Integer, DB.ForeignKey('Satellite.platform_id'), nullable=False)
+    ingest_time = DB.Column(DB.Float, nullable=False)
+
+    @classmethod
+    def __declare_last__(cls):
+        ValidateInteger(IngestedFile.uid)
+        ValidateInteger(IngestedFile.platform_id)
+
+    @staticmethod
+    def get_by_hash(content_hash):
+        """Find an ingested file by the hash of its contents.
+
+        Args:
+            content_hash (str): The hexadecimal SHA-256 digest of the file.
+
+        Returns:
+            The IngestedFile, or None if no file with these contents was ingested.
+        """
+        return IngestedFile.query.filter_by(content_hash=content_hash).first()
+
 
 class OrbitRecord(SavableModel, DB.Model):
     """This table stores satellite ephemeris records at specific points in time.
@@ -217,6 +377,12 @@ class OrbitRecord(SavableModel, DB.Model):
             segments[seg] = (OrbitRecord.query.filter_by(segment_id=seg)
                                               .order_by(OrbitRecord.time)
                                               .all())
+
+        # The records of archived segments are no longer in the table, unpack them on demand
+        archived_ids = [seg for seg, records in segments.items() if not records]
+        if archived_ids:
+            for archive in OrbitArchive.query.filter(OrbitArchive.segment_id.in_(archived_ids)):
+                segments[archive.segment_id] = archive.records()
         return segments
 
     @staticmethod
@@ -232,8 +398,78 @@ class OrbitRecord(SavableModel, DB.Model):
             A list of all the OrbitRecords that fit the supplied parameters, or None if there are
             no matching OrbitRecords.
         """
-        return (OrbitRecord.query.filter(OrbitRecord.platform_id == platform_id,
-                                         OrbitRecord.time >= start_time,
-                                         OrbitRecord.time <= end_time)
-                                 .order_by(OrbitRecord.time)
-                                 .all())
+        records = (OrbitRecord.query.filter(OrbitRecord.platform_id == platform_id,
+                                            OrbitRecord.time >= start_time,
+                                            OrbitRecord.time <= end_time)
+                                    .order_by(OrbitRecord.time)
+                                    .all())
+
+        archives = (OrbitArchive.query
+                    .join(OrbitSegment, OrbitSegment.segment_id == OrbitArchive.segment_id)
+                    .filter(OrbitArchive.platform_id == platform_id,
+                            OrbitSegment.start_time <= end_time,
+                            OrbitSegment.end_time >= start_time)
+                    .all())
+        if archives:
+            records.extend(record for archive in archives for record in archive.records()
+                           if start_time <= record.time <= end_time)
+            records.sort(key=lambda record: record.time)
+        return records
+
+
+class OrbitArchive(SavableModel, DB.Model):
+    """This table stores the records of archived segments, which were moved out of the OrbitRecord
+    table by the retention policy, see kaos.models.archive. The segments themselves stay in the
+    OrbitSegment table and their records are unpacked on demand by the OrbitRecord queries.
+
+    The records of a segment are stored as a single compressed array: the bytes of the float64
+    columns are regrouped by significance before zlib compression, which takes about a sixth of the
+    space of the table rows and their indexes.
+
+    The table holds the following information:
+        segment_id:     Unique ID for the archived segment
+        platform_id:    Unique ID for the satellite that owns the segment
+        rows:           The number of archived records
+        ephemeris:      The compressed (rows, 7) array of the records, see pack
+    """
+    __tablename__ = "OrbitArchive"
+
+    segment_id = DB.Column(DB.Integer, DB.ForeignKey('OrbitSegment.segment_id'),
+                           primary_key=True)
+    platform_id = DB.Column(DB.Integer, DB.ForeignKey('Satellite.platform_id'),
+                            nullable=False, index=True)
+    rows = DB.Column(DB.Integer, nullable=False)
+    ephemeris = DB.Column(DB.LargeBinary, nullable=False)
+
+    @staticmethod
+    def pack(ephemeris):
+        """Compress ephemeris rows.
+
+        Args:
+            ephemeris (array): An (N, 7) array of ephemeris rows.
+
+        Returns:
+            The compressed rows, as bytes.
+        """
+        columns = np.ascontiguousarray(np.transpose(ephemeris), dtype='<f8')
+        return zlib.compress(columns.view(np.uint8).reshape(-1, 8).T.tobytes())
+
+    def unpack(self):
+        """Decompress the archived rows.
+
+        Returns:
+            The (rows, 7) array of the archived ephemeris rows, sorted by time.
+        """
+        shuffled = np.frombuffer(zlib.decompress(self.ephemeris), dtype=np.uint8)
+        columns = np.ascontiguousarray(shuffled.reshape(8, -1).T).view('<f8').reshape(7, -1)
+        return np.transpose(columns).astype(np.float64)
+
+    def records(self):
+        """Unpack the archived rows as OrbitRecords, which are not added to the session.
+
+        Returns:
+            A list of the OrbitRecords of the segment in ascending order by time.
+        """
+        return [OrbitRecord(platform_id=self.platform_id, segment_id=self.segment_id,
+                            time=row[0], position=row[1:4], velocity=row[4:7])
+                for row in self.unpack().tolist()]
@@ -1,13 +1,40 @@
 """"Handles the reading and parsing of ephemeris files. Parsed files are stored in the DB."""
 
+from __future__ import division
+
+import logging
 import os
+import time
 
 import numpy as np
-from sqlalchemy import or_, and_
-
 from kaos.utils.time_conversion import jdate_to_unix
-from kaos.tuples import OrbitPoint
-from kaos.models import DB, Satellite, OrbitSegment, OrbitRecord
+from kaos.tuples import IngestSummary
+from kaos.models import DB, Satellite, OrbitSegment, IngestedFile
+from kaos.models.compression import open_ephemeris_file, decompressing_stream
+from kaos.models.hashing import HASH_READ_SIZE, HashingStream, file_content_hash
+from kaos.models.writer import SegmentWriter
+
+# Number of characters of the orbital data block decoded at once by the streaming reader
+EPHEMERIS_CHUNK_SIZE = 1 << 20
+
+
+def add_segment_rows_to_db(ephemeris, satellite_id):
+    """Add a segment given as a block of ephemeris rows to the database, without committing it.
+
+    Args:
+        ephemeris (array): An (N, 7) array of ephemeris rows in UNIX time.
+        satellite_id (int): The unique ID of the satellite that owns the segment.
+
+    Returns:
+        -1              on error.
+        satellite_id    on success.
+    """
+    if satellite_id < 0:
+        return -1
+
+    writer = SegmentWriter(satellite_id)
+    writer.write(ephemeris)
+    return satellite_id if writer.segments else -1
 
 
 def add_segment_to_db(orbit_data, satellite_id):
@@ -25,40 +52,426 @@ def add_segment_to_db(orbit_data, satellite_id):
         -1              on error.
         satellite_id    on success.
     """
+    ephemeris = np.array([[orbit_point.time] + list(orbit_point.pos) + list(orbit_point.vel)
+                          for orbit_point in orbit_data], dtype=np.float64)
+    satellite_id = add_segment_rows_to_db(ephemeris, satellite_id)
+    DB.session.commit()
+    return satellite_id
 
-    if satellite_id < 0:
-        return -1
 
-    segment_start = orbit_data[0].time
-    segment_end = orbit_data[-1].time
-
-    # Abort if this segment overlaps with anything currently in the DB, because we cannot
-    # interpolate across segments.
-    if (OrbitSegment.query.filter(OrbitSegment.platform_id == satellite_id)
-                          .filter(or_(and_((segment_start < OrbitSegment.start_time),
-                                           (segment_end > OrbitSegment.start_time)),
-                                      and_((segment_start < OrbitSegment.end_time),
-                                           (segment_end > OrbitSegment.end_time)),
-                                      and_((segment_start == OrbitSegment.start_time),
-                                           (segment_end == OrbitSegment.end_time))))
-                          .all()):
-        return -1
+def read_ephemeris_header(stream):
+    """Read the header of an ephemeris file up to the start of the EphemerisTimePosVel block.
 
-    # Create segment entry. Retrieve segment ID and insert it along with data into Orbit db
-    segment = OrbitSegment(platform_id=satellite_id, start_time=segment_start,
-                           end_time=segment_end)
-    segment.save()
-    DB.session.commit()
+    Args:
+        stream (file): A file like object positioned at the start of the ephemeris file. It is left
+                       positioned on the first row of orbital data.
 
-    orbit_recods = [OrbitRecord(platform_id=satellite_id, segment_id=segment.segment_id,
-                               time=orbit_point.time, position=orbit_point.pos,
-                               velocity=orbit_point.vel) for orbit_point in orbit_data]
-    DB.session.bulk_save_objects(orbit_recods)
-    DB.session.commit()
-    return satellite_id
+    Returns:
+        A tuple (start_time, segment_boundaries) where start_time is the file epoch in UNIX time and
+        segment_boundaries is an array of the segment boundary times in UNIX time.
+
+    Raises:
+        ValueError: If the stream ends before the EphemerisTimePosVel block, e.g. if it is empty.
+    """
+    start_time = float(0)
+    segment_boundaries = []
+    read_segment_boundaries = False
+
+    # Iterating with readline keeps the stream position usable by the reads of the orbital data
+    for line in iter(stream.readline, ''):
+        if "Epoch in JDate format:" in line:
+            start_time = jdate_to_unix(float(line.split(':')[1]))
+
+        # For now, we assume that the coord system will always be J2000
+        # if "CoordinateSystem" in line:
+        #     coord_system = str(line.split()[1])
+
+        if "END SegmentBoundaryTimes" in line:
+            read_segment_boundaries = False
+
+        if read_segment_boundaries:
+            line = line.strip()
+            if line:
+                segment_boundaries.append(float(line))
+
+        if "BEGIN SegmentBoundaryTimes" in line:
+            read_segment_boundaries = True
+
+        if "EphemerisTimePosVel" in line:
+            return start_time, start_time + np.array(segment_boundaries)
+
+    raise ValueError("Missing EphemerisTimePosVel block")
+
+
+def _decode_ephemeris_rows(block, start_time):
+    """Decode complete rows of orbital data.
+
+    Args:
+        block (str): Whitespace separated rows of orbital data.
+        start_time (float): The file epoch in UNIX time.
+
+    Returns:
+        An (N, 7) float64 array of the rows in UNIX time.
+
+    Raises:
+        ValueError: If the block contains malformed rows.
+    """
+    ephemeris = np.array(block.split(), dtype=np.float64)
+    if ephemeris.size % 7:
+        raise ValueError("Malformed ephemeris rows")
+    ephemeris = ephemeris.reshape(-1, 7)
+    ephemeris[:, 0] += start_time
+    return ephemeris
+
+
+def iter_ephemeris_chunks(stream, start_time, chunk_size=EPHEMERIS_CHUNK_SIZE):
+    """Read the orbital data block of an ephemeris file in chunks of bounded size.
+
+    Only complete lines are decoded, a row cut by the end of a read is carried over to the next
+    chunk. Reading stops at the end of the ephemeris section, the rest of the stream is not
+    consumed.
+
+    Args:
+        stream (file): A file like object positioned on the first row of orbital data, see
+                       read_ephemeris_header.
+        start_time (float): The file epoch in UNIX time.
+        chunk_size (int, optional): The number of characters read at once. Defaults to
+                                    EPHEMERIS_CHUNK_SIZE.
+
+    Yields:
+        (N, 7) float64 arrays of consecutive ephemeris rows in UNIX time.
+
+    Raises:
+        ValueError: If the orbital data block contains malformed rows or the stream ends before the
+                    end of the ephemeris section, e.g. because the file was truncated.
+    """
+    remainder = ''
+    while True:
+        data = stream.read(chunk_size)
+        block = remainder + data
+
+        end = block.find("END Ephemeris")
+        if end < 0 and not data:
+            # A cut inside the last row may still leave a multiple of 7 values
+            raise ValueError("Ephemeris data ends before END Ephemeris")
+
+        if end >= 0:
+            block = block[:end]
+            remainder = ''
+        else:
+            block, newline, remainder = block.rpartition('\n')
+            block += newline
+
+        if block.strip():
+            yield _decode_ephemeris_rows(block, start_time)
+
+        if end >= 0:
+            return
+
+
+def read_ephemeris_file(filename):
+    """Read the epoch, segment boundaries and orbital data block of an ephemeris file.
+
+    The header is scanned line by line until the start of the EphemerisTimePosVel block. The
+    orbital data block is then decoded in bulk, a chunk at a time.
+
+    Args:
+        filename (str): The path of the ephemeris file, which may be compressed, see
+                        kaos.models.compression.
+
+    Returns:
+        A tuple (start_time, segment_boundaries, ephemeris) where start_time is the file epoch in
+        UNIX time, segment_boundaries is an array of the segment boundary times in UNIX time and
+        ephemeris is an (N, 7) float64 array where each row is formatted as:
+
+        time posx posy posz velx vely velz
+
+        The times of the ephemeris rows are converted to UNIX time.
+
+    Raises:
+        ValueError: If the file has no orbital data block, or if the block is malformed or
+                    truncated.
+    """
+    with open_ephemeris_file(filename) as f:
+        try:
+            start_time, segment_boundaries = read_ephemeris_header(f)
+            chunks = list(iter_ephemeris_chunks(f, start_time))
+        except ValueError as error:
+            raise ValueError("{} in {}".format(error, filename))
+
+    ephemeris = np.concatenate(chunks) if chunks else np.empty((0, 7))
+    return start_time, segment_boundaries, ephemeris
+
+
+def _find_closing_rows(times, boundaries, previous_boundary_time):
+    """Find the rows that close a segment.
+
+    Args:
+        times (array): The times of consecutive ephemeris rows.
+        boundaries (array): The sorted segment boundary times.
+        previous_boundary_time (float): The time of the last boundary row before these rows.
+
+    Returns:
+        A tuple (closing_rows, previous_boundary_time) where closing_rows are the indices of the
+        rows that close a segment and previous_boundary_time is the time of the last boundary row,
+        to be carried over to the following rows.
+    """
+    if boundaries.size == 0 or times.size == 0:
+        return np.empty(0, dtype=np.intp), previous_boundary_time
+
+    # Find the rows that fall on a segment boundary
+    boundary_idx = np.minimum(np.searchsorted(boundaries, times), len(boundaries) - 1)
+    boundary_rows = np.flatnonzero(boundaries[boundary_idx] == times)
+    if boundary_rows.size == 0:
+        return boundary_rows, previous_boundary_time
+
+    # Only the first of consecutive boundary rows with the same time closes a segment
+    boundary_times = times[boundary_rows]
+    previous_times = np.concatenate(([previous_boundary_time], boundary_times[:-1]))
+    return boundary_rows[boundary_times != previous_times], boundary_times[-1]
 
 
-def parse_ephemeris_file(filename):
+def split_ephemeris_segments(ephemeris, segment_boundaries, start_time):
+    """Split an ephemeris block into its segments.
+
+    A segment ends on a row whose time is one of the segment boundaries. A boundary row that
+    repeats the time of the previous boundary row starts the next segment instead, and rows on the
+    file epoch never end a segment.
+
+    Args:
+        ephemeris (array): An (N, 7) array of ephemeris rows in file order.
+        segment_boundaries (array): The segment boundary times in UNIX time.
+        start_time (float): The file epoch in UNIX time.
+
+    Returns:
+        A list of (M, 7) arrays, one for every non empty segment, in file order.
+    """
+    closing_rows, _ = _find_closing_rows(ephemeris[:, 0], np.sort(segment_boundaries), start_time)
+    return [segment for segment in np.split(ephemeris, closing_rows + 1) if segment.size]
+
+
+def split_ephemeris_chunks(chunks, segment_boundaries, start_time):
+    """Split consecutive chunks of an ephemeris block along its segments, see
+    split_ephemeris_segments.
+
+    Args:
+        chunks (iterable): (N, 7) arrays of consecutive ephemeris rows in file order.
+        segment_boundaries (array): The segment boundary times in UNIX time.
+        start_time (float): The file epoch in UNIX time.
+
+    Yields:
+        Tuples (rows, closes_segment) where rows is a non empty (M, 7) array of rows of a single
+        segment and closes_segment is whether these are the last rows of the segment. The last
+        segment of the block is left open.
+    """
+    boundaries = np.sort(segment_boundaries)
+    previous_boundary_time = start_time
+    for chunk in chunks:
+        closing_rows, previous_boundary_time = _find_closing_rows(chunk[:, 0], boundaries,
+                                                                  previous_boundary_time)
+        for index, rows in enumerate(np.split(chunk, closing_rows + 1)):
+            if rows.size:
+                yield rows, index < len(closing_rows)
+
+
+def maximum_radius(ephemeris):
+    """Find the maximum distance from the earth center to the satellite in an ephemeris block.
+
+    Args:
+        ephemeris (array): An (N, 7) array of ephemeris rows.
+
+    Returns:
+        The largest magnitude of the position vectors, 0 if there are no rows.
+    """
+    if not ephemeris.size:
+        return 0.0
+
+    return float(np.linalg.norm(ephemeris[:, 1:4], axis=1).max())
+
+
+def unchanged_file_summary(filename, content_hash):
+    """Check whether a file with the same contents was already ingested.
+
+    Args:
+        filename (str): The path or name of the ephemeris file.
+        content_hash (str): The hexadecimal SHA-256 digest of the file, see file_content_hash.
+
+    Returns:
+        An IngestSummary of the skipped file if it was already ingested, None otherwise.
+    """
+    ingested_file = IngestedFile.get_by_hash(content_hash)
+    if ingested_file is None:
+        return None
+
+    logging.info('Skipped %s, it has the same contents as %s', filename, ingested_file.filename)
+    return IngestSummary(filename, ingested_file.platform_id, 0, 0, 0, [], 0, True, [])
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def _store_segments(filename, blocks, progress=None, content_hash=None, incremental=False,
+                    decimation_tolerance=None):
+    """Store blocks of ephemeris rows of a file in the DB, in a single transaction.
+
+    Args:
+        filename (str): The path or name of the ephemeris file, the satellite is named after it.
+        blocks (iterable): Tuples (rows, closes_segment) or (rows, closes_segment, copy_rows), see
+                           split_ephemeris_chunks and SegmentWriter.write. They are consumed inside
+                           the transaction.
+        progress (fn, optional): See store_ephemeris.
+        content_hash (str or fn, optional): The hexadecimal SHA-256 digest of the file, recorded
+                                            so that the file is skipped if it is ingested again.
+                                            A function returning the digest is called once all
+                                            the blocks have been consumed. Defaults to None.
+        incremental (bool, optional): See store_ephemeris.
+        decimation_tolerance (float, optional): See store_ephemeris.
+
+    Returns:
+        An IngestSummary of the stored data.
+    """
+    load_start = time.time()
+    sat_name = os.path.splitext(os.path.basename(filename))[0].split('.')[0]
+    try:
+        # The file may have been ingested since the caller checked, e.g. as a copy in the same batch
+        if content_hash is not None and not callable(content_hash):
+            summary = unchanged_file_summary(filename, content_hash)
+            if summary is not None:
+                return summary
+
+        existing_sat = Satellite.get_by_name(sat_name)
+        if not existing_sat:
+            sat = Satellite(platform_name=sat_name)
+            sat.save()
+            DB.session.flush()
+        else:
+            sat = existing_sat[0]
+
+        writer = SegmentWriter(sat.platform_id, progress, incremental, decimation_tolerance)
+        max_distance = 0.0
+        for block in blocks:
+            max_distance = max(max_distance, maximum_radius(block[0]))
+            writer.write(*block)
+        writer.close()
+
+        # Keep track of the largest magnitude of the position vectors and insert it into Satellite
+        if writer.rows:
+            sat.maximum_altitude = max(sat.maximum_altitude or 0.0, max_distance)
+            sat.save()
+
+        if content_hash is not None:
+            content_hash = content_hash() if callable(content_hash) else content_hash
+            if IngestedFile.get_by_hash(content_hash) is None:
+                IngestedFile(content_hash=content_hash, filename=os.path.basename(filename),
+                             platform_id=sat.platform_id, ingest_time=time.time()).save()
+        DB.session.commit()
+    except Exception:
+        DB.session.rollback()
+        raise
+
+    # Only the lookups of the updated time ranges can have changed
+    for changed_range in writer.changed_ranges:
+        OrbitSegment.invalidate_cached_lookups(sat.platform_id, *changed_range)
+
+    load_time = time.time() - load_start
+    logging.info('Loaded %d orbit records from %s in %.3fs (%.0f rows/s), skipped %d unchanged '
+                 'segments', writer.rows, filename, load_time, writer.rows / max(load_time, 1e-9),
+                 writer.skipped)
+
+    return IngestSummary(filename, sat.platform_id, writer.segments, writer.rows, load_time,
+                         writer.errors, writer.skipped, False, writer.compression)
+
+
+def store_ephemeris(filename, start_time, segment_boundaries, ephemeris, progress=None,
+                    content_hash=None, copy_rows=None, incremental=False,
+                    decimation_tolerance=None):
+    """Store the data read from an ephemeris file in the DB.
+
+    The satellite is named after the file. The whole file is stored in a single transaction,
+    either all of its data is added to the DB or none of it is.
+
+    Args:
+        filename (str): The path of the ephemeris file the data was read from.
+        start_time (float): The file epoch in UNIX time.
+        segment_boundaries (array): The segment boundary times in UNIX time.
+        ephemeris (array): An (N, 7) array of ephemeris rows in UNIX time.
+        progress (fn, optional): Called with the number of stored segments and rows after every
+                                 segment.
+        content_hash (str, optional): The hexadecimal SHA-256 digest of the file, see
+                                      file_content_hash. If given, nothing is stored when a file
+                                      with the same contents was already ingested, otherwise the
+                                      hash is recorded. Defaults to None.
+        copy_rows (list, optional): The rows of every segment, in the order of
+                                    split_ephemeris_segments, already formatted by
+                                    format_copy_rows. Defaults to formatting them while storing.
+        incremental (bool, optional): Whether a segment that overlaps the end of a stored segment
+                                      updates it: only its rows past the stored prefix are written
+                                      and the stored rows it supersedes are replaced, see
+                                      SegmentWriter.update_segment. Defaults to False.
+        decimation_tolerance (float, optional): The position error bound in metres of the rows
+                                                dropped from every segment, see
+                                                kaos.models.decimation. Defaults to storing every
+                                                row.
+
+    Returns:
+        An IngestSummary of the stored data. Segments that are already stored are skipped and
+        counted in the summary, segments that overlap existing data are not stored and are
+        reported in the summary errors.
+    """
+    segments = split_ephemeris_segments(ephemeris, segment_boundaries, start_time)
+    if copy_rows is None:
+        copy_rows = [None] * len(segments)
+    return _store_segments(filename, ((segment, True, segment_copy_rows)
+                                      for segment, segment_copy_rows in zip(segments, copy_rows)),
+                           progress, content_hash, incremental, decimation_tolerance)
+
+
+def store_ephemeris_stream(filename, stream, chunk_size=EPHEMERIS_CHUNK_SIZE, progress=None,
+                           incremental=False, decimation_tolerance=None):
+    """Read an ephemeris file from a stream and store it in the DB as it is read.
+
+    The orbital data is decoded in chunks of bounded size and every segment is written as soon as
+    its last row has been read, so the memory used does not depend on the size of the file. The
+    whole file is stored in a single transaction, see store_ephemeris.
+
+    The stream is hashed as it is read and the hash is recorded like the hash of a file, see
+    store_ephemeris. Since the hash is only known once the whole stream has been read, a stream
+    that was already ingested is still parsed but all of its segments are skipped.
+
+    Args:
+        filename (str): The name of the ephemeris file, the satellite is named after it and the
+                        compression of the stream is given by its extension.
+        stream (file): A binary file like object positioned at the start of the ephemeris file.
+        chunk_size (int, optional): The number of characters of orbital data decoded at once.
+                                    Defaults to EPHEMERIS_CHUNK_SIZE.
+        progress (fn, optional): See store_ephemeris.
+        incremental (bool, optional): See store_ephemeris. The blocks of a segment are then held
+                                      in memory until the segment is complete.
+        decimation_tolerance (float, optional): See store_ephemeris. The blocks of a segment are
+                                                decimated separately.
+
+    Returns:
+        An IngestSummary of the stored data.
+
+    Raises:
+        ValueError: If the stream is corrupt or truncated, has no orbital data block or the block
+                    contains malformed rows, nothing is stored.
+    """
+    hashing_stream = HashingStream(stream)
+    decompressed_stream = decompressing_stream(filename, hashing_stream)
+
+    def stream_content_hash():
+        """Hash whatever follows the ephemeris section and return the digest of the stream."""
+        for _ in iter(lambda: hashing_stream.read(HASH_READ_SIZE), b''):
+            pass
+        return hashing_stream.hexdigest()
+
+    start_time, segment_boundaries = read_ephemeris_header(decompressed_stream)
+    chunks = iter_ephemeris_chunks(decompressed_stream, start_time, chunk_size)
+    return _store_segments(filename, split_ephemeris_chunks(chunks, segment_boundaries, start_time),
+                           progress, stream_content_hash, incremental, decimation_tolerance)
+# pylint: enable=too-many-arguments,too-many-locals
+
+
+def parse_ephemeris_file(filename, incremental=False, decimation_tolerance=None):
     """Parse the given ephemeris file and store the orbital data in OrbitRecords. We assume that
     each row in the ephemeris file is a 7-tuple containing an orbital point, formatted as:
 
@@ -66,84 +479,22 @@ def parse_ephemeris_file(filename):
 
     Calculate the maximum distance from earth center to the position if the satellite. Insert it
     in Satellite.
+
+    The whole file is stored in a single transaction, either all of its data is added to the DB or
+    none of it is. A file whose contents were already ingested is skipped without being parsed.
+
+    Args:
+        filename (str): The path of the ephemeris file.
+        incremental (bool, optional): See store_ephemeris. Defaults to False.
+        decimation_tolerance (float, optional): See store_ephemeris.
+
+    Returns:
+        The platform ID of the satellite if any segment of the file was stored, -1 otherwise.
     """
-    sat_name = os.path.splitext(os.path.basename(filename))[0].split('.')[0]
-    existing_sat = Satellite.get_by_name(sat_name)
-    if not existing_sat:
-        sat = Satellite(platform_name=sat_name)
-        sat.save()
-        DB.session.commit()
-        sat_id = -1
-    else:
-        sat = existing_sat[0]
-
-    max_distance = 0
-
-    with open(filename, "rU") as f:
-        segment_boundaries = []
-        segment_tuples = []
-        start_time = float(0)
-
-        read_segment_boundaries = False
-        read_orbital_data = False
-
-        # Remember the last seen segment boundary while reading the ephemeris rows. Needed to
-        # differentiate between the beginning of a new segment and the end of en existing segment of
-        # data
-        last_seen_segment_boundary = 0
-
-        for line in f:
-            line = line.rstrip('\n')
-            if "Epoch in JDate format:" in line:
-                start_time = float(line.split(':')[1])
-                start_time = jdate_to_unix(start_time)
-                last_seen_segment_boundary = start_time
-
-            # For now, we assume that the coord system will always be J2000
-            # if "CoordinateSystem" in line:
-            #     coord_system = str(line.split()[1])
-
-            if "END SegmentBoundaryTimes" in line:
-                read_segment_boundaries = False
-
-            if read_segment_boundaries:
-                line = line.strip()
-                if line:
-                    segment_boundaries.append(start_time + float(line))
-
-            if "BEGIN SegmentBoundaryTimes" in line:
-                read_segment_boundaries = True
-
-            if "END Ephemeris" in line:
-                add_segment_to_db(segment_tuples, sat.platform_id)
-                read_orbital_data = False
-
-            if read_orbital_data:
-                line = line.strip()
-                if line:
-                    ephemeris_row = [float(num) for num in line.split()]
-                    orbit_tuple = OrbitPoint(start_time + ephemeris_row[0], ephemeris_row[1:4],
-                                             ephemeris_row[4:7])
-                    segment_tuples.append(orbit_tuple)
-
-                    # Keep track of the magnitude of the position vector and update with a bigger
-                    # value
-                    max_distance = max(max_distance, np.linalg.norm(ephemeris_row[1:4]))
-
-                    # The line we just read is a segment boundary, So first check that this is the
-                    # *end* of a segment, not the beginning of a new one, and then add this segment
-                    # to the db.
-                    if (orbit_tuple.time in segment_boundaries and
-                            last_seen_segment_boundary != orbit_tuple.time):
-                        last_seen_segment_boundary = orbit_tuple.time
-                        sat_id = add_segment_to_db(segment_tuples, sat.platform_id)
-                        segment_tuples = []
-
-            if "EphemerisTimePosVel" in line:
-                read_orbital_data = True
-
-            # After getting the q_max, insert it into Satellite"""
-            sat.maximum_altitude = max_distance
-            sat.save()
-        DB.session.commit()
-        return sat_id
+    content_hash = file_content_hash(filename)
+    summary = unchanged_file_summary(filename, content_hash)
+    if summary is None:
+        summary = store_ephemeris(filename, *read_ephemeris_file(filename),
+                                  content_hash=content_hash, incremental=incremental,
+                                  decimation_tolerance=decimation_tolerance)
+    return summary.platform_id if summary.segments else -1
@@ -0,0 +1,47 @@
+"""Upgrades of the schema of existing databases.
+
+DB.create_all creates the tables that are missing but never alters the tables that already exist.
+The columns added to existing tables since the first release are listed here and added to the DB
+when the application starts.
+"""
+
+import logging
+
+from sqlalchemy import inspect
+
+# Columns added to existing tables, as (table, column, SQL type)
+ADDED_COLUMNS = [
+    ('OrbitSegment', 'content_hash', 'VARCHAR(64)'),
+    ('OrbitSegment', 'min_radius', 'FLOAT'),
+    ('OrbitSegment', 'max_radius', 'FLOAT'),
+    ('OrbitSegment', 'period', 'FLOAT'),
+    ('OrbitSegment', 'decimation_tolerance', 'FLOAT'),
+]
+
+
+def upgrade_schema(engine):
+    """Add the missing columns of ADDED_COLUMNS to an existing DB.
+
+    Args:
+        engine (obj:Engine): The SQLAlchemy engine of the DB.
+
+    Returns:
+        The list of (table, column) that were added.
+    """
+    inspector = inspect(engine)
+    table_names = inspector.get_table_names()
+
+    added_columns = []
+    with engine.begin() as connection:
+        for table, column, column_type in ADDED_COLUMNS:
+            if table not in table_names:
+                continue
+            if column in [existing['name'] for existing in inspector.get_columns(table)]:
+                continue
+
+            statement = 'ALTER TABLE "{}" ADD COLUMN {} {}'.format(table, column, column_type)
+            connection.execute(statement)
+            logging.info('Added column %s to table %s', column, table)
+            added_columns.append((table, column))
+
+    return added_columns
@@ -0,0 +1,111 @@
+"""Summaries of the orbit of a satellite, computed from the ephemeris rows as they are ingested.
+
+Every segment records the range of distances from the earth center to the satellite and an estimate
+of its orbital period. The part of a segment within every UTC day is summarized in an OrbitSummary
+with its own range of distances and the direction of the orbital plane at its first and last rows,
+so that queries can use bounds local to their time range instead of the bounds of the whole
+satellite.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from kaos.algorithm.coord_conversion import ecef_to_eci
+from kaos.constants import ANGULAR_VELOCITY_EARTH, EARTH_MU
+from kaos.models.models import OrbitSummary
+from kaos.utils.time_conversion import SECONDS_PER_UTC_DAY
+
+
+def orbit_normals(positions, velocities):
+    """Find the unit vectors of the orbital angular momentum of satellite states.
+
+    Args:
+        positions (array): An (N, 3) array of positions.
+        velocities (array): An (N, 3) array of velocities, in the same frame as the positions.
+
+    Returns:
+        An (N, 3) array of unit vectors.
+    """
+    momentum = np.cross(positions, velocities)
+    return momentum / np.linalg.norm(momentum, axis=1)[:, np.newaxis]
+
+
+class OrbitSummaryBuilder(object):
+    """Accumulates the summaries of a segment as its rows are written, see OrbitSummary."""
+
+    def __init__(self):
+        self.min_radius = np.inf
+        self.max_radius = 0.0
+        self.semi_major_axis_sum = 0.0
+        self.rows = 0
+        # UTC day: [first row, last row, min radius, max radius]
+        self.days = OrderedDict()
+
+    def add(self, ephemeris):
+        """Add consecutive rows of the segment.
+
+        Args:
+            ephemeris (array): A non empty (N, 7) array of ephemeris rows in the ECEF frame.
+        """
+        positions, velocities = ephemeris[:, 1:4], ephemeris[:, 4:7]
+        radii = np.linalg.norm(positions, axis=1)
+        self.min_radius = min(self.min_radius, float(radii.min()))
+        self.max_radius = max(self.max_radius, float(radii.max()))
+
+        # The inertial speed adds the rotation of the ECEF frame, w x r with w along z. The
+        # semi-major axis follows from the vis-viva equation.
+        inertial_speeds_squared = (
+            (velocities[:, 0] - ANGULAR_VELOCITY_EARTH * positions[:, 1]) ** 2 +
+            (velocities[:, 1] + ANGULAR_VELOCITY_EARTH * positions[:, 0]) ** 2 +
+            velocities[:, 2] ** 2)
+        self.semi_major_axis_sum += float(np.sum(1.0 / (2.0 / radii -
+                                                        inertial_speeds_squared / EARTH_MU)))
+        self.rows += len(ephemeris)
+
+        days = np.floor(ephemeris[:, 0] / SECONDS_PER_UTC_DAY)
+        day_starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+        day_ends = np.concatenate((day_starts[1:], [len(ephemeris)])) - 1
+        for first, last in zip(day_starts, day_ends):
+            day_radii = radii[first:last + 1]
+            summary = self.days.get(days[first])
+            if summary is None:
+                self.days[days[first]] = [ephemeris[first], ephemeris[last], day_radii.min(),
+                                          day_radii.max()]
+            else:
+                summary[1] = ephemeris[last]
+                summary[2] = min(summary[2], day_radii.min())
+                summary[3] = max(summary[3], day_radii.max())
+
+    @property
+    def period(self):
+        """The orbital period in seconds, from the mean semi-major axis of the rows."""
+        semi_major_axis = self.semi_major_axis_sum / self.rows
+        return float(2 * np.pi * np.sqrt(semi_major_axis ** 3 / EARTH_MU))
+
+    def store(self, segment):
+        """Record the summaries of the segment, replacing any summaries it already has.
+
+        Args:
+            segment (obj:OrbitSegment): The segment the rows were written to, it must have been
+                                        flushed to the DB.
+        """
+        segment.min_radius = self.min_radius
+        segment.max_radius = self.max_radius
+        segment.period = self.period
+        OrbitSummary.query.filter(OrbitSummary.segment_id == segment.segment_id) \
+                          .delete(synchronize_session=False)
+
+        # Convert the first and last row of every day to the inertial frame in a single call
+        boundary_rows = np.array([row for summary in self.days.values() for row in summary[:2]])
+        states = ecef_to_eci(np.transpose(boundary_rows[:, 1:4]),
+                             np.transpose(boundary_rows[:, 4:7]), boundary_rows[:, 0])
+        normals = orbit_normals(np.array([position for position, _ in states]),
+                                np.array([velocity for _, velocity in states])).tolist()
+
+        for index, (first, last, min_radius, max_radius) in enumerate(self.days.values()):
+            OrbitSummary(platform_id=segment.platform_id, segment_id=segment.segment_id,
+                         start_time=float(first[0]), end_time=float(last[0]),
+                         min_radius=float(min_radius), max_radius=float(max_radius),
+                         start_normal=normals[2 * index],
+                         end_normal=normals[2 * index + 1]).save()
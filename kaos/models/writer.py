@@ -0,0 +1,405 @@
+"""Writing the segments of ephemeris files into the DB.
+
+Segments are written as soon as their rows are available, so that files can be stored while they
+are being read. They are checked against the segments already stored for the satellite in memory,
+and their rows are bulk loaded with kaos.models.loader.
+"""
+
+import bisect
+import logging
+
+import numpy as np
+
+from .archive import restore_segment
+from .decimation import decimate_ephemeris
+from .hashing import new_content_hash, update_segment_hash
+from .loader import insert_orbit_records, segment_ephemeris
+from .models import DB, OrbitArchive, OrbitRecord, OrbitSegment, OrbitSummary
+from .summaries import OrbitSummaryBuilder
+
+
+class SegmentExtents(object):
+    """The time extents of the stored segments of a satellite, sorted by start time, so that new
+    segments are checked for overlaps in memory instead of with a query per segment.
+
+    Two segments overlap if they share more than a boundary time, or if they have the same start
+    and end times.
+    """
+
+    def __init__(self, platform_id):
+        """Args:
+            platform_id (int): The unique ID of the satellite, its extents are loaded once.
+        """
+        extents = (DB.session.query(OrbitSegment.start_time, OrbitSegment.end_time,
+                                    OrbitSegment.segment_id)
+                             .filter(OrbitSegment.platform_id == platform_id)
+                             .order_by(OrbitSegment.start_time)
+                             .all())
+        self.starts = [extent[0] for extent in extents]
+        self.ends = [extent[1] for extent in extents]
+        self.segment_ids = [extent[2] for extent in extents]
+
+    def overlapping(self, segment_start, segment_end):
+        """Find the stored segments that overlap a time range.
+
+        Args:
+            segment_start (float): The start of the range in UNIX time.
+            segment_end (float): The end of the range in UNIX time.
+
+        Returns:
+            A list of (start_time, end_time, segment_id) tuples of the overlapping segments, sorted
+            by start time.
+        """
+        # Only the segments that start before the end of the range, or on it, can overlap it
+        candidates = bisect.bisect_right(self.starts, segment_end)
+        starts = np.array(self.starts[:candidates], dtype=np.float64)
+        ends = np.array(self.ends[:candidates], dtype=np.float64)
+        overlaps = (((starts < segment_end) & (ends > segment_start)) |
+                    ((starts == segment_start) & (ends == segment_end)))
+        return [(self.starts[index], self.ends[index], self.segment_ids[index])
+                for index in np.flatnonzero(overlaps)]
+
+    def add(self, segment_start, segment_end, segment_id):
+        """Add the extent of a newly stored segment."""
+        index = bisect.bisect_right(self.starts, segment_start)
+        self.starts.insert(index, segment_start)
+        self.ends.insert(index, segment_end)
+        self.segment_ids.insert(index, segment_id)
+
+    def remove(self, segment_id):
+        """Remove the extent of a deleted or updated segment."""
+        index = self.segment_ids.index(segment_id)
+        del self.starts[index], self.ends[index], self.segment_ids[index]
+
+
+def stored_prefix_length(segment_id, ephemeris):
+    """Count the leading ephemeris rows that are already stored in a segment.
+
+    Args:
+        segment_id (int): The unique ID of the stored segment.
+        ephemeris (array): An (N, 7) array of consecutive ephemeris rows in UNIX time.
+
+    Returns:
+        The number of leading rows that are identical to the rows of the segment stored at and
+        after the time of the first row.
+    """
+    stored = segment_ephemeris(segment_id, float(ephemeris[0, 0]), len(ephemeris))
+    matches = (stored == ephemeris[:len(stored)]).all(axis=1)
+    return len(stored) if matches.all() else int(np.argmin(matches))
+
+
+class SegmentWriter(object):  # pylint: disable=too-many-instance-attributes
+    """Stores the segments of an ephemeris file as their rows arrive, in the transaction of the
+    current session.
+
+    A segment received in a single block is checked before any of its rows are written. A segment
+    received in several blocks is written block by block inside a savepoint, which is rolled back
+    if the complete segment turns out to be already stored or to overlap existing data.
+
+    The orbit of every stored segment is summarized, see kaos.models.summaries.
+
+    Segments whose content hash matches a segment already stored for the satellite are skipped.
+    The hashes and the extents of the stored segments of the satellite are loaded once, so that
+    each segment is checked in memory. The segments that overlap existing data are reported
+    together in a single error.
+
+    In incremental mode a segment that overlaps the end of a stored segment updates it instead of
+    being rejected, see update_segment. The blocks of such a segment are then buffered until the
+    segment is complete.
+
+    With a decimation tolerance, only the rows needed to reproduce the segment within the tolerance
+    are stored, see kaos.models.decimation. Content hashes and orbit summaries are still computed
+    from all the rows. The blocks of a segment are decimated separately, so that the rows at block
+    boundaries are always kept.
+    """
+
+    def __init__(self, platform_id, progress=None, incremental=False, decimation_tolerance=None):
+        """Args:
+            platform_id (int): The unique ID of the satellite that owns the segments.
+            progress (fn, optional): Called with the number of stored segments and rows after
+                                     every segment.
+            incremental (bool, optional): Whether segments overlapping stored data update it.
+                                          Defaults to False.
+            decimation_tolerance (float, optional): The position error bound in metres of the
+                                                    rows dropped from every segment. Defaults to
+                                                    storing every row.
+        """
+        self.platform_id = platform_id
+        self.progress = progress
+        self.incremental = incremental
+        self.decimation_tolerance = decimation_tolerance
+        self.compression = []
+        self.source_rows = 0
+        self.pending_blocks = []
+        self.changed_ranges = []
+        self.segments = 0
+        self.rows = 0
+        self.skipped = 0
+        self.conflicts = []
+        self.segment = None
+        self.segment_rows = 0
+        self.segment_hash = None
+        self.segment_summary = None
+        self.savepoint = None
+        self.stored_hashes = set(
+            content_hash for (content_hash,)
+            in DB.session.query(OrbitSegment.content_hash)
+                         .filter(OrbitSegment.platform_id == platform_id,
+                                 OrbitSegment.content_hash.isnot(None)))
+        self.extents = SegmentExtents(platform_id)
+
+    @property
+    def errors(self):
+        """The errors of the segments written so far: a single error listing the segments that
+        were not stored because they overlap existing data, if any."""
+        if not self.conflicts:
+            return []
+
+        return ['Segments overlapping existing data were not stored: {}'.format(
+            '; '.join('{} to {} overlaps {}'.format(
+                segment_start, segment_end,
+                ', '.join('{} to {}'.format(stored_start, stored_end)
+                          for stored_start, stored_end, _ in overlapping))
+                      for segment_start, segment_end, overlapping in self.conflicts))]
+
+    def write(self, ephemeris, closes_segment=True, copy_rows=None):
+        """Store rows of the current segment.
+
+        Args:
+            ephemeris (array): A non empty (N, 7) array of consecutive rows of a single segment.
+            closes_segment (bool, optional): Whether these are the last rows of the segment.
+                                             Defaults to True.
+            copy_rows (str, optional): The rows already formatted by format_copy_rows. Defaults to
+                                       None.
+        """
+        if self.incremental:
+            self.pending_blocks.append(ephemeris)
+            if closes_segment:
+                self.close()
+            return
+
+        if self.segment is None and closes_segment:
+            segment_start, segment_end = ephemeris[[0, -1], 0].tolist()
+            content_hash = update_segment_hash(new_content_hash(), ephemeris).hexdigest()
+
+            # Abort if this segment is already stored, or if it overlaps with anything currently
+            # in the DB because we cannot interpolate across segments.
+            if content_hash in self.stored_hashes:
+                self._segment_done(segment_start, segment_end, 0, skipped=True)
+                return
+            overlapping = self.extents.overlapping(segment_start, segment_end)
+            if overlapping:
+                self._segment_done(segment_start, segment_end, 0, overlapping=overlapping)
+                return
+
+            segment = OrbitSegment(platform_id=self.platform_id, start_time=segment_start,
+                                   end_time=segment_end, content_hash=content_hash,
+                                   decimation_tolerance=self.decimation_tolerance)
+            segment.save()
+            DB.session.flush()
+            self.stored_hashes.add(content_hash)
+            self.extents.add(segment_start, segment_end, segment.segment_id)
+            self._store_summary(segment, ephemeris)
+            self._segment_done(segment_start, segment_end,
+                               self._insert_rows(segment.segment_id, ephemeris, copy_rows))
+            return
+
+        if self.segment is None:
+            self.savepoint = DB.session.begin_nested()
+            self.segment = OrbitSegment(platform_id=self.platform_id,
+                                        start_time=float(ephemeris[0, 0]),
+                                        end_time=float(ephemeris[-1, 0]),
+                                        decimation_tolerance=self.decimation_tolerance)
+            self.segment.save()
+            DB.session.flush()
+            self.segment_rows = 0
+            self.segment_hash = new_content_hash()
+            self.segment_summary = OrbitSummaryBuilder()
+
+        self.segment_rows += self._insert_rows(self.segment.segment_id, ephemeris, copy_rows)
+        update_segment_hash(self.segment_hash, ephemeris)
+        self.segment_summary.add(ephemeris)
+        self.segment.end_time = float(ephemeris[-1, 0])
+        if closes_segment:
+            self.close()
+
+    def close(self):
+        """Finish the segment that is being written, if any."""
+        if self.pending_blocks:
+            ephemeris = np.concatenate(self.pending_blocks)
+            self.pending_blocks = []
+            self.update_segment(ephemeris)
+            return
+
+        if self.segment is None:
+            return
+
+        segment, savepoint = self.segment, self.savepoint
+        self.segment = self.savepoint = None
+        segment_start, segment_end = segment.start_time, segment.end_time
+        content_hash = self.segment_hash.hexdigest()
+
+        overlapping = self.extents.overlapping(segment_start, segment_end)
+        if content_hash in self.stored_hashes:
+            savepoint.rollback()
+            self._segment_done(segment_start, segment_end, 0, skipped=True)
+        elif overlapping:
+            savepoint.rollback()
+            self._segment_done(segment_start, segment_end, 0, overlapping=overlapping)
+        else:
+            segment.content_hash = content_hash
+            savepoint.commit()
+            self.stored_hashes.add(content_hash)
+            self.extents.add(segment_start, segment_end, segment.segment_id)
+            self.segment_summary.store(segment)
+            self._segment_done(segment_start, segment_end, self.segment_rows)
+
+    def update_segment(self, ephemeris):
+        """Store a complete segment, extending or replacing the end of the stored data it overlaps.
+
+        Rows of the segment that are identical to the stored rows at the same times form the
+        stored prefix and are not written again. From the first row that differs from, or comes
+        after, the stored rows onwards, the stored data is treated as a superseded prediction: the
+        later rows of the stored segment are replaced by the rows of the new segment and stored
+        segments that start within the new segment are deleted. A segment that overlaps nothing,
+        including one that only shares its first time with the end of a stored segment, is stored as
+        a new segment. A segment that starts before the stored segment it overlaps is rejected.
+
+        Args:
+            ephemeris (array): A non empty (N, 7) array of the rows of a single segment.
+        """
+        segment_start, segment_end = ephemeris[[0, -1], 0].tolist()
+        content_hash = update_segment_hash(new_content_hash(), ephemeris).hexdigest()
+        if content_hash in self.stored_hashes:
+            self._segment_done(segment_start, segment_end, 0, skipped=True)
+            return
+
+        overlapping = self.extents.overlapping(segment_start, segment_end)
+        if not overlapping:
+            segment = OrbitSegment(platform_id=self.platform_id, start_time=segment_start,
+                                   end_time=segment_end, content_hash=content_hash,
+                                   decimation_tolerance=self.decimation_tolerance)
+            segment.save()
+            DB.session.flush()
+            self.stored_hashes.add(content_hash)
+            self.extents.add(segment_start, segment_end, segment.segment_id)
+            self._store_summary(segment, ephemeris)
+            self._segment_done(segment_start, segment_end,
+                               self._insert_rows(segment.segment_id, ephemeris))
+            return
+
+        if overlapping[0][0] > segment_start:
+            self._segment_done(segment_start, segment_end, 0, overlapping=overlapping)
+            return
+
+        stored_segments = (OrbitSegment.query
+                           .filter(OrbitSegment.segment_id.in_(zip(*overlapping)[2]))
+                           .order_by(OrbitSegment.start_time)
+                           .all())
+        base = stored_segments[0]
+
+        # An archived segment is updated like any other, its rows move back to the OrbitRecord table
+        restore_segment(base.segment_id)
+        prefix = stored_prefix_length(base.segment_id, ephemeris)
+        if prefix == len(ephemeris):
+            self._segment_done(segment_start, segment_end, 0, skipped=True)
+            return
+
+        # Replace the superseded tail
+        cut_time = float(ephemeris[prefix, 0])
+        changed_end = max((segment_end,) + zip(*overlapping)[1])
+        OrbitRecord.query.filter(OrbitRecord.segment_id == base.segment_id,
+                                 OrbitRecord.time >= cut_time).delete(synchronize_session=False)
+        for superseded in stored_segments[1:]:
+            OrbitRecord.query.filter(OrbitRecord.segment_id == superseded.segment_id) \
+                             .delete(synchronize_session=False)
+            OrbitSummary.query.filter(OrbitSummary.segment_id == superseded.segment_id) \
+                              .delete(synchronize_session=False)
+            OrbitArchive.query.filter(OrbitArchive.segment_id == superseded.segment_id) \
+                              .delete(synchronize_session=False)
+            self.stored_hashes.discard(superseded.content_hash)
+            self.extents.remove(superseded.segment_id)
+            DB.session.delete(superseded)
+
+        # The updated segment only has the rows of the new segment if it starts with them
+        self.stored_hashes.discard(base.content_hash)
+        base.content_hash = content_hash if base.start_time == segment_start else None
+        if base.content_hash is not None:
+            self.stored_hashes.add(base.content_hash)
+        base.end_time = segment_end
+        if self.decimation_tolerance is not None:
+            base.decimation_tolerance = max(base.decimation_tolerance or 0.0,
+                                            self.decimation_tolerance)
+        DB.session.flush()
+        self.extents.remove(base.segment_id)
+        self.extents.add(base.start_time, base.end_time, base.segment_id)
+
+        self.changed_ranges.append((base.start_time, changed_end))
+        stored_rows = self._insert_rows(base.segment_id, ephemeris[prefix:])
+        self._store_summary(base, segment_ephemeris(base.segment_id))
+        self._segment_done(segment_start, segment_end, stored_rows)
+
+    def _insert_rows(self, segment_id, ephemeris, copy_rows=None):
+        """Insert rows of the current segment, decimated if the writer has a decimation tolerance.
+
+        Args:
+            segment_id (int): The unique ID of the segment.
+            ephemeris (array): A non empty (N, 7) array of consecutive rows of the segment.
+            copy_rows (str, optional): The rows already formatted by format_copy_rows, only used
+                                       if every row is stored. Defaults to None.
+
+        Returns:
+            The number of inserted rows.
+        """
+        self.source_rows += len(ephemeris)
+        if self.decimation_tolerance is not None:
+            ephemeris, copy_rows = decimate_ephemeris(ephemeris, self.decimation_tolerance), None
+        return insert_orbit_records(self.platform_id, segment_id, ephemeris, copy_rows=copy_rows)
+
+    @staticmethod
+    def _store_summary(segment, ephemeris):
+        """Summarize the orbit of a stored segment from all of its rows, see OrbitSummaryBuilder.
+
+        Args:
+            segment (obj:OrbitSegment): The segment, flushed to the DB.
+            ephemeris (array): A non empty (N, 7) array of all the rows of the segment.
+        """
+        summary = OrbitSummaryBuilder()
+        summary.add(ephemeris)
+        summary.store(segment)
+
+    # pylint: disable=too-many-arguments
+    def _segment_done(self, segment_start, segment_end, stored_rows, skipped=False,
+                      overlapping=None):
+        """Account for a finished segment.
+
+        Args:
+            segment_start (float): The start of the segment in UNIX time.
+            segment_end (float): The end of the segment in UNIX time.
+            stored_rows (int): The number of stored rows, 0 if the segment was not stored.
+            skipped (bool, optional): Whether the segment was not stored because it is already in
+                                      the DB. Otherwise a segment that was not stored overlaps
+                                      existing data. Defaults to False.
+            overlapping (list, optional): The extents of the stored segments that a segment that
+                                          was not stored overlaps, see SegmentExtents.overlapping.
+                                          Defaults to None.
+        """
+        if stored_rows:
+            self.segments += 1
+            self.rows += stored_rows
+            if self.decimation_tolerance is not None:
+                self.compression.append((segment_start, segment_end, self.source_rows,
+                                         stored_rows))
+                logging.info('Decimated segment %s to %s of platform %d: stored %d of %d rows, '
+                             'compression ratio %.2f', segment_start, segment_end,
+                             self.platform_id, stored_rows, self.source_rows,
+                             float(self.source_rows) / stored_rows)
+        elif skipped:
+            self.skipped += 1
+        else:
+            self.conflicts.append((segment_start, segment_end, overlapping or []))
+        self.source_rows = 0
+
+        if self.progress is not None:
+            self.progress(self.segments, self.rows)
+    # pylint: enable=too-many-arguments
@@ -34,3 +34,18 @@ class OrbitPoint(namedtuple('OrbitPoint', 'time, pos, vel')):
 
     def __str__(self):
         return 'OrbitPoint: time={}, pos={}, vel={}'.format(self.time, self.pos, self.vel)
+
+
+class IngestSummary(namedtuple('IngestSummary', 'filename, platform_id, segments, rows, seconds, '
+                                                'errors, skipped, unchanged, compression')):
+    """Summary of the ingestion of an ephemeris file.
+
+    skipped is the number of segments that were already stored and unchanged is whether the whole
+    file had already been ingested. compression lists the decimated segments as (start_time,
+    end_time, file rows, stored rows) tuples, see kaos.models.decimation.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return ('IngestSummary: filename={}, platform_id={}, segments={}, rows={}, seconds={}, '
+                'errors={}, skipped={}, unchanged={}, compression={}'.format(*self))
@@ -1,3 +1,3 @@
 """KAOS utilities module."""
 
-from .time_conversion import utc_to_unix, jdate_to_utc, jdate_to_unix
+from .time_conversion import utc_to_unix, jdate_to_utc, jdate_to_unix, unix_to_jdate
@@ -3,8 +3,28 @@
 import datetime
 import calendar
 
+import numpy as np
 from astropy.time import Time
 
+# Julian date of the UNIX epoch, 1970-01-01T00:00:00 UTC
+UNIX_EPOCH_JDATE = 2440587.5
+SECONDS_PER_UTC_DAY = 86400
+
+# UTC days that end with a leap second (23:59:60), from IERS Bulletin C. No leap second has been
+# inserted since the end of 2016, days announced by later bulletins must be appended here.
+LEAP_SECOND_DAYS = [
+    (1972, 6, 30), (1972, 12, 31), (1973, 12, 31), (1974, 12, 31), (1975, 12, 31),
+    (1976, 12, 31), (1977, 12, 31), (1978, 12, 31), (1979, 12, 31), (1981, 6, 30),
+    (1982, 6, 30), (1983, 6, 30), (1985, 6, 30), (1987, 12, 31), (1989, 12, 31),
+    (1990, 12, 31), (1992, 6, 30), (1993, 6, 30), (1994, 6, 30), (1995, 12, 31),
+    (1997, 6, 30), (1998, 12, 31), (2005, 12, 31), (2008, 12, 31), (2012, 6, 30),
+    (2015, 6, 30), (2016, 12, 31),
+]
+
+# The same days, counted in days since the UNIX epoch
+_LEAP_SECOND_UNIX_DAYS = np.array([(datetime.date(*day) - datetime.date(1970, 1, 1)).days
+                                   for day in LEAP_SECOND_DAYS], dtype=np.float64)
+
 
 def utc_to_unix(time_string, string_format='%Y%m%dT%H:%M:%S.%f'):
     """Takes a string input of a specified date time format and converts it to a UNIX time stamp.
@@ -53,15 +73,54 @@ def jdate_to_utc(jdate):
     return iso_date
 
 
+def _utc_day_lengths(unix_days):
+    """Find the length in seconds of UTC days, 86401 for the days that end with a leap second.
+
+    Args:
+        unix_days (array): Whole days since the UNIX epoch.
+
+    Returns:
+        An array of the lengths of the days.
+    """
+    leap_second_index = np.minimum(np.searchsorted(_LEAP_SECOND_UNIX_DAYS, unix_days),
+                                   len(_LEAP_SECOND_UNIX_DAYS) - 1)
+    return SECONDS_PER_UTC_DAY + (_LEAP_SECOND_UNIX_DAYS[leap_second_index] == unix_days)
+
+
 def jdate_to_unix(jdate):
-    """ Takes a date in Julian format and converts it to a UNIX
-    time stamp.
+    """Takes dates in Julian format (UTC) and converts them to UNIX time stamps.
 
-    Raises:
-        ValueError: If the string is malformed or the date represented by the string is invalid
-                    in the JDate format.
+    As in astropy, the fraction of a Julian date is a fraction of its UTC day, which lasts 86401
+    seconds on the days that end with a leap second, see LEAP_SECOND_DAYS. The leap second itself
+    has no UNIX time and maps to the start of the next day. Leap seconds before 1972 are ignored.
+
+    Args:
+        jdate (float or array): The Julian date(s).
+
+    Returns:
+        The UNIX time stamp(s), to sub-second precision, as a float for a scalar input and as a
+        float64 array otherwise.
     """
-    utc_date = jdate_to_utc(jdate)
+    days = np.asarray(jdate, dtype=np.float64) - UNIX_EPOCH_JDATE
+    unix_days = np.floor(days)
+    day_seconds = np.minimum((days - unix_days) * _utc_day_lengths(unix_days),
+                             SECONDS_PER_UTC_DAY)
+    unix_time = unix_days * SECONDS_PER_UTC_DAY + day_seconds
+    return float(unix_time) if unix_time.ndim == 0 else unix_time
+
 
-    # remove the millisecond precision
-    return utc_to_unix(utc_date[:-1])
+def unix_to_jdate(unix_time):
+    """Takes UNIX time stamps and converts them to dates in Julian format (UTC), the inverse of
+    jdate_to_unix.
+
+    Args:
+        unix_time (float or array): The UNIX time stamp(s).
+
+    Returns:
+        The Julian date(s), as a float for a scalar input and as a float64 array otherwise.
+    """
+    unix_time = np.asarray(unix_time, dtype=np.float64)
+    unix_days = np.floor(unix_time / SECONDS_PER_UTC_DAY)
+    day_seconds = unix_time - unix_days * SECONDS_PER_UTC_DAY
+    jdate = UNIX_EPOCH_JDATE + unix_days + day_seconds / _utc_day_lengths(unix_days)
+    return float(jdate) if jdate.ndim == 0 else jdate
@@ -1,6 +1,9 @@
 """Helper functions for dealing with TimeInterval objects."""
 
-from itertools import tee
+import heapq
+from itertools import izip_longest, tee
+
+import numpy as np
 
 from ..tuples import TimeInterval
 
@@ -35,23 +38,63 @@ def calculate_common_intervals(intervals_list):
         intervals_list (list):  A list of TimeInterval lists.
 
     Return:
-        A list of TimeIntervals that are common to each supplied TimeInterval list.
+        A list of TimeIntervals that are common to each supplied TimeInterval list, see
+        calculate_coverage_intervals.
+    """
+    return calculate_coverage_intervals(intervals_list, len(intervals_list))
+
+
+def _interval_events(interval_list):
+    """The sorted (time, change) events of the start and end of every interval of a list, once the
+    overlapping intervals of the list are merged.
+    """
+    for interval in union_intervals(interval_list):
+        yield (interval.start, 1)
+        yield (interval.end, -1)
+
+
+def calculate_coverage_intervals(intervals_list, min_count=1):
+    """Calculates the intervals covered by at least a number of interval lists.
+
+    The start and end events of the k lists are swept in a single merged pass, which takes
+    O(N log k) time for N intervals. At equal times the ends are swept before the starts, so lists
+    that only touch do not cover the touching time.
+
+    Args:
+        intervals_list (list): A list of TimeInterval lists, the intervals of every list are in any
+                               order and may overlap.
+        min_count (int, optional): The number of lists that must cover a time. Defaults to 1, the
+                                   union of the lists, while len(intervals_list) is their
+                                   intersection.
+
+    Returns:
+        A sorted list of disjoint TimeIntervals, neighboring intervals are fused.
     """
-    if len(intervals_list) == 1:
-        return intervals_list[0]
+    output_list = []
+    count = 0
+    covered_start = None
+    for time, change in heapq.merge(*[_interval_events(interval_list)
+                                      for interval_list in intervals_list]):
+        count += change
+        if covered_start is None and count >= min_count:
+            covered_start = time
+        elif covered_start is not None and count < min_count:
+            if output_list and output_list[-1].end == covered_start:
+                output_list[-1] = TimeInterval(output_list[-1].start, time)
+            elif time > covered_start:
+                output_list.append(TimeInterval(covered_start, time))
+            covered_start = None
 
-    other_intervals = calculate_common_intervals(intervals_list[1:])
-    return calculate_common_intervals_helper(intervals_list[0], other_intervals)
+    return output_list
 
 
 def pairwise(iterable):
     """s -> (s0,s1), (s1,s2), (s2, s3), ... , (sn, None)
     from: https://docs.python.org/2/library/itertools.html
     """
-    iterable.append(None)
     a, b = tee(iterable)
     next(b, None)
-    return zip(a, b)
+    return izip_longest(a, b)
 
 
 def fuse_neighbor_intervals(input_list, assume_sorted=False):
@@ -68,7 +111,7 @@ def fuse_neighbor_intervals(input_list, assume_sorted=False):
                                  values. defaults to False.
     """
     if not assume_sorted:
-        input_list.sort(key=lambda x: x.start)
+        input_list = sorted(input_list, key=lambda x: x.start)
 
     output_list = []
     fused_interval_start = None
@@ -93,6 +136,27 @@ def fuse_neighbor_intervals(input_list, assume_sorted=False):
     return output_list
 
 
+def union_intervals(interval_list):
+    """Merges overlapping and neighboring TimeIntervals.
+    example: [(0,150),(100,200),(300,400)] -> [(0,200),(300,400)]
+
+    Args:
+        interval_list (list of TimeInterval): list of time intervals in any order.
+
+    Returns:
+        A sorted list of disjoint TimeIntervals that cover the same times as the input list.
+    """
+    output_list = []
+    for interval in sorted(interval_list, key=lambda x: x.start):
+        if output_list and interval.start <= output_list[-1].end:
+            if interval.end > output_list[-1].end:
+                output_list[-1] = TimeInterval(output_list[-1].start, interval.end)
+        else:
+            output_list.append(TimeInterval(interval.start, interval.end))
+
+    return output_list
+
+
 def trim_poi_segments(interval_list, poi):
     """Adjusts list of intervals so that all intervals fit inside the poi
 
@@ -116,3 +180,267 @@ def trim_poi_segments(interval_list, poi):
             ret_list.append(TimeInterval(interval.start, interval.end))
 
     return ret_list
+
+
+def _fuse_bounds(starts, ends):
+    """Fuses the neighboring intervals of sorted disjoint bounds, see fuse_neighbor_intervals.
+
+    Returns:
+        A tuple (starts, ends) of the bounds of the fused intervals.
+    """
+    if not starts.size:
+        return starts, ends
+
+    first = np.concatenate([[True], starts[1:] != ends[:-1]])
+    last = np.append(np.flatnonzero(first)[1:] - 1, starts.size - 1)
+    return starts[first], ends[last]
+
+
+def _sweep_bounds(starts, ends, weights, threshold):
+    """Finds the times at which the weighted count of the intervals covering them reaches a
+    threshold.
+
+    Args:
+        starts (array): (N,) starts of the intervals
+        ends (array): (N,) ends of the intervals
+        weights (array): (N,) integer weights the intervals add to the count while they cover a time
+        threshold (int): the count the covered times reach
+
+    Returns:
+        A tuple (starts, ends) of the bounds of the sorted, disjoint and fused covered intervals.
+    """
+    times = np.concatenate([starts, ends])
+    order = np.argsort(times, kind='mergesort')
+    times = times[order]
+    counts = np.cumsum(np.concatenate([weights, -weights])[order])
+
+    # Every piece between two consecutive times has the count after the last event of its start
+    # time, the pieces between events at the same time are empty and dropped
+    covered = (counts[:-1] >= threshold) & (times[1:] > times[:-1])
+    return _fuse_bounds(times[:-1][covered], times[1:][covered])
+
+
+class IntervalSet(object):
+    """An immutable sorted set of time intervals, stored as float64 arrays of their starts and ends.
+
+    A set holds the intervals it was created with, sorted by their start, and they may overlap or
+    touch. The set operations (union, intersection, difference and coverage) return sorted,
+    disjoint and fused intervals, without the empty ones.
+    """
+    __slots__ = ('_starts', '_ends')
+
+    def __init__(self, starts=(), ends=()):
+        """Creates a set from the bounds of its intervals.
+
+        Args:
+            starts (array like): The starts of the intervals, in UNIX time.
+            ends (array like): The ends of the intervals, in UNIX time.
+
+        Raises:
+            ValueError: If the bounds have different lengths or an interval ends before it starts.
+        """
+        starts = np.array(starts, dtype=np.float64).reshape(-1)
+        ends = np.array(ends, dtype=np.float64).reshape(-1)
+        if starts.shape != ends.shape:
+            raise ValueError("{} starts for {} ends".format(starts.size, ends.size))
+        if np.any(ends < starts):
+            raise ValueError("Intervals end before they start")
+
+        order = np.argsort(starts, kind='mergesort')
+        self._starts, self._ends = starts[order], ends[order]
+        self._starts.flags.writeable = False
+        self._ends.flags.writeable = False
+
+    @classmethod
+    def from_intervals(cls, interval_list):
+        """Creates a set from TimeIntervals, or any (start, end) pairs.
+
+        Args:
+            interval_list (list of TimeInterval): The intervals of the set.
+
+        Returns:
+            The IntervalSet of the intervals.
+        """
+        bounds = np.array([(interval[0], interval[1]) for interval in interval_list],
+                          dtype=np.float64).reshape((-1, 2))
+        return cls(bounds[:, 0], bounds[:, 1])
+
+    @classmethod
+    def coverage(cls, interval_sets, min_count=1):
+        """Finds the times covered by at least a number of sets, see calculate_coverage_intervals.
+
+        Args:
+            interval_sets (list of IntervalSet): The sets, their own intervals may overlap.
+            min_count (int, optional): The number of sets that must cover a time. Defaults to 1,
+                                       the union of the sets.
+
+        Returns:
+            The IntervalSet of the covered times.
+        """
+        merged = [_sweep_bounds(interval_set.starts, interval_set.ends,
+                                np.ones(len(interval_set), dtype=np.int64), 1)
+                  for interval_set in interval_sets]
+        if not merged:
+            return cls()
+
+        starts = np.concatenate([merged_starts for merged_starts, _ in merged])
+        ends = np.concatenate([merged_ends for _, merged_ends in merged])
+        return cls(*_sweep_bounds(starts, ends, np.ones(starts.size, dtype=np.int64), min_count))
+
+    @property
+    def starts(self):
+        """The read-only array of the starts of the intervals."""
+        return self._starts
+
+    @property
+    def ends(self):
+        """The read-only array of the ends of the intervals."""
+        return self._ends
+
+    @property
+    def durations(self):
+        """The array of the durations of the intervals."""
+        return self._ends - self._starts
+
+    def __len__(self):
+        return self._starts.size
+
+    def __iter__(self):
+        for start, end in zip(self._starts.tolist(), self._ends.tolist()):
+            yield TimeInterval(start, end)
+
+    def __eq__(self, other):
+        return (isinstance(other, IntervalSet) and np.array_equal(self._starts, other.starts) and
+                np.array_equal(self._ends, other.ends))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'IntervalSet({})'.format(zip(self._starts.tolist(), self._ends.tolist()))
+
+    def to_intervals(self):
+        """The intervals of the set as a list of TimeIntervals."""
+        return list(self)
+
+    def duration(self):
+        """The total duration of the intervals, times covered by several intervals count once."""
+        union = self.union()
+        return float(np.sum(union.durations))
+
+    def gap_stats(self):
+        """Statistics of the gaps between the disjoint intervals of the set.
+
+        Returns:
+            A dict of the number of gaps and their total, minimum, maximum and mean durations in
+            seconds. The durations are 0 without gaps.
+        """
+        union = self.union()
+        gaps = union.starts[1:] - union.ends[:-1]
+        if not gaps.size:
+            return {'count': 0, 'total': 0.0, 'min': 0.0, 'max': 0.0, 'mean': 0.0}
+
+        return {'count': int(gaps.size), 'total': float(gaps.sum()), 'min': float(gaps.min()),
+                'max': float(gaps.max()), 'mean': float(gaps.mean())}
+
+    def union(self, *others):
+        """The times covered by this set or any of the other sets."""
+        return IntervalSet.coverage((self,) + others, 1)
+
+    def intersection(self, *others):
+        """The times covered by this set and all the other sets."""
+        return IntervalSet.coverage((self,) + others, len(others) + 1)
+
+    def difference(self, other):
+        """The times covered by this set but not by the other set."""
+        # The intervals of the other set weigh more than all the intervals of this set together, so
+        # only the times covered by this set alone have a positive count
+        starts = np.concatenate([self._starts, other.starts])
+        ends = np.concatenate([self._ends, other.ends])
+        weights = np.concatenate([np.ones(len(self), dtype=np.int64),
+                                  np.full(len(other), -2 * len(self), dtype=np.int64)])
+        return IntervalSet(*_sweep_bounds(starts, ends, weights, 1))
+
+    def trim(self, poi):
+        """Trims the intervals to a period of interest, see trim_poi_segments.
+
+        Args:
+            poi (TimeInterval): The period of interest.
+
+        Returns:
+            The IntervalSet of the parts of the intervals in the period of interest, the intervals
+            outside of it are dropped.
+        """
+        starts = np.maximum(self._starts, float(poi[0]))
+        ends = np.minimum(self._ends, float(poi[1]))
+        inside = ends > starts
+        return IntervalSet(starts[inside], ends[inside])
+
+    def fuse(self):
+        """Fuses the neighboring intervals of the set, see fuse_neighbor_intervals.
+
+        Returns:
+            The IntervalSet of the fused intervals.
+        """
+        return IntervalSet(*_fuse_bounds(self._starts, self._ends))
+
+
+def coverage_timeline(interval_sets, poi):
+    """Counts how many sets cover every time of a period of interest, e.g. how many satellites see a
+    site, with a single sorted sweep of the bounds of their intervals.
+
+    Args:
+        interval_sets (list of IntervalSet): The sets, e.g. the access times of every satellite.
+        poi (TimeInterval): The period of interest.
+
+    Returns:
+        A tuple (times, counts) of the step function of the count. counts[i] sets cover the times
+        from times[i] to times[i + 1]. The first time is the start of the POI, the last time is its
+        end with a count of 0, and consecutive counts differ.
+    """
+    poi_start, poi_end = float(poi[0]), float(poi[1])
+    merged = [interval_set.trim(poi).union() for interval_set in interval_sets]
+    starts = np.concatenate([[poi_start]] + [interval_set.starts for interval_set in merged])
+    ends = np.concatenate([[poi_end]] + [interval_set.ends for interval_set in merged])
+
+    # The POI bounds only add the first and last times to the sweep, they do not change the count
+    changes = np.ones(starts.size, dtype=np.int64)
+    changes[0] = 0
+    times = np.concatenate([starts, ends])
+    order = np.argsort(times, kind='mergesort')
+    times = times[order]
+    counts = np.cumsum(np.concatenate([changes, -changes])[order])
+
+    # The count of a time is the count after its last event, and only its changes are kept
+    last = np.append(times[1:] != times[:-1], True)
+    times, counts = times[last], counts[last]
+    changed = np.concatenate([[True], counts[1:] != counts[:-1]])
+    changed[-1] = True
+    return times[changed], counts[changed]
+
+
+def coverage_statistics(interval_sets, poi):
+    """Summarizes the coverage of a period of interest by several sets, see coverage_timeline.
+
+    Args:
+        interval_sets (list of IntervalSet): The sets, e.g. the access times of every satellite.
+        poi (TimeInterval): The period of interest.
+
+    Returns:
+        A dict of the percentage of the POI covered by any set, the maximum and mean number of sets
+        covering a time, and the statistics of the gaps between covered times, see
+        IntervalSet.gap_stats.
+    """
+    times, counts = coverage_timeline(interval_sets, poi)
+    poi_duration = float(poi[1]) - float(poi[0])
+    covered = IntervalSet.coverage([interval_set.trim(poi) for interval_set in interval_sets])
+
+    return {
+        'coverage_percent': 100.0 * covered.duration() / poi_duration if poi_duration else 0.0,
+        'max_count': int(counts.max()),
+        'mean_count': (float(np.sum(counts[:-1] * np.diff(times))) / poi_duration
+                       if poi_duration else 0.0),
+        'gaps': covered.gap_stats(),
+    }
@@ -1,5 +1,8 @@
 import pytest, unittest
 
+import numpy as np
+from astropy.utils import iers
+
 from ddt import ddt,data
 
 from kaos.algorithm import coord_conversion
@@ -91,3 +94,108 @@ class Test_eccf_to_eci(unittest.TestCase):
         pos_vel_pair = coord_conversion.ecef_to_eci(test_pos, test_vel, time)
         self.assertEqual(real_pos, pytest.approx(pos_vel_pair[0][0], 1))
         self.assertEqual(real_vel, pytest.approx(pos_vel_pair[0][1], 1))
+
+
+@ddt
+class TestEciTransforms(unittest.TestCase):
+    """Tests the analytic Earth rotation model against the astropy reference transforms."""
+
+    def tearDown(self):
+        coord_conversion.set_eci_transform('numpy')
+
+    def sample_states(self, count=200):
+        """Random low earth orbit states in the ECEF frame between 2000 and 2030."""
+        random_state = np.random.RandomState(0)
+        times = random_state.uniform(946684800, 1893456000, count)
+        directions = random_state.normal(size=(count, 3))
+        directions /= np.linalg.norm(directions, axis=1)[:, np.newaxis]
+        velocities = np.cross(directions, random_state.normal(size=(count, 3)))
+        velocities *= 7.5e3 / np.linalg.norm(velocities, axis=1)[:, np.newaxis]
+        return np.transpose(directions * 7.0e6), np.transpose(velocities), times
+
+    def test_agreement_with_astropy(self):
+        """Test that the converted positions agree with astropy within 25m and 0.05m/s."""
+        positions, velocities, times = self.sample_states()
+
+        coord_conversion.set_eci_transform('astropy')
+        expected = coord_conversion.ecef_to_eci(positions, velocities, times)
+        coord_conversion.set_eci_transform('numpy')
+        result = coord_conversion.ecef_to_eci(positions, velocities, times)
+
+        for (expected_pos, expected_vel), (pos, vel) in zip(expected, result):
+            self.assertLess(np.linalg.norm(np.subtract(pos, expected_pos)), 25)
+            self.assertLess(np.linalg.norm(np.subtract(vel, expected_vel)), 0.05)
+
+    @data('numpy', 'astropy')
+    def test_round_trip(self, transform):
+        """Test that eci_to_ecef inverts ecef_to_eci."""
+        coord_conversion.set_eci_transform(transform)
+        positions, velocities, times = self.sample_states(20)
+
+        eci_positions, eci_velocities = [np.transpose(states) for states in
+                                         zip(*coord_conversion.ecef_to_eci(positions, velocities,
+                                                                           times))]
+        ecef = coord_conversion.eci_to_ecef(eci_positions, eci_velocities, times)
+
+        np.testing.assert_allclose([pos for pos, _ in ecef], np.transpose(positions), atol=1e-2)
+        np.testing.assert_allclose([vel for _, vel in ecef], np.transpose(velocities), atol=1e-3)
+
+    @data('numpy', 'astropy')
+    def test_offline_warmup(self, transform):
+        """Test that the transforms warm up from the local IERS tables, without downloads."""
+        coord_conversion.set_eci_transform(transform)
+        coord_conversion.configure_iers()
+
+        self.assertFalse(iers.conf.auto_download)
+        self.assertIsInstance(iers.IERS_Auto.open(), iers.IERS_B)
+        self.assertGreater(coord_conversion.warm_up_transforms(), 0)
+
+    def test_unknown_transform(self):
+        """Test that only the known implementations can be selected."""
+        with self.assertRaises(ValueError):
+            coord_conversion.set_eci_transform('spice')
+        self.assertEqual(coord_conversion.get_eci_transform(), 'numpy')
+
+
+class TestArrayConversions(unittest.TestCase):
+    """Tests the array conversions against their scalar versions."""
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.lats = random_state.uniform(-90, 90, 500)
+        self.lons = random_state.uniform(-180, 180, 500)
+        self.alts = random_state.uniform(0, 9000, 500)
+        self.times = random_state.randint(946684800, 1893456000, 500)
+
+    def test_lla_to_ecef_array(self):
+        """Test that the array conversion gives the same coordinates as lla_to_ecef."""
+        expected = [coord_conversion.lla_to_ecef(lat, lon, alt)
+                    for lat, lon, alt in zip(self.lats, self.lons, self.alts)]
+        result = coord_conversion.lla_to_ecef_array(self.lats, self.lons, self.alts)
+
+        self.assertEqual(result.shape, (500, 3))
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(coord_conversion.lla_to_ecef_array(self.lats, self.lons),
+                                      [coord_conversion.lla_to_ecef(lat, lon, 0)
+                                       for lat, lon in zip(self.lats, self.lons)])
+
+    def test_geod_to_geoc_lat_array(self):
+        """Test that the array conversion gives the same latitudes as geod_to_geoc_lat."""
+        np.testing.assert_array_equal(coord_conversion.geod_to_geoc_lat_array(self.lats),
+                                      [coord_conversion.geod_to_geoc_lat(lat)
+                                       for lat in self.lats])
+
+    def test_geod_to_eci_geoc_lon_array(self):
+        """Test that the array conversion agrees with geod_to_eci_geoc_lon within 1e-8 degree."""
+        expected = np.array([float(coord_conversion.geod_to_eci_geoc_lon(lon, int(time)))
+                             for lon, time in zip(self.lons, self.times)])
+        result = coord_conversion.geod_to_eci_geoc_lon_array(self.lons, self.times)
+
+        difference = np.abs(result - expected)
+        self.assertLess(np.minimum(difference, 360 - difference).max(), 1e-8)
+        self.assertTrue(np.all((result >= 0) & (result < 360)))
+
+        # Longitudes and times are broadcast against each other
+        self.assertEqual(coord_conversion.geod_to_eci_geoc_lon_array(self.lons[:, np.newaxis],
+                                                                     self.times[:3]).shape,
+                         (500, 3))
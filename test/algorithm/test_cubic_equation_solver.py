@@ -1,10 +1,12 @@
 """Test for cubic equation solver."""
 
 from unittest import TestCase
+
+import numpy as np
 from numpy.testing import assert_array_almost_equal
 from ddt import ddt, data
 
-from kaos.algorithm.cubic_equation_solver import solve
+from kaos.algorithm.cubic_equation_solver import solve, solve_in_interval
 
 
 @ddt
@@ -19,3 +21,40 @@ class KaosTestCase(TestCase):
         """Test data format: Tuple of coefficients, list of answers"""
         coefficients, expected_result = data
         assert_array_almost_equal(solve(*coefficients), expected_result)
+
+    def test_solve_in_interval(self):
+        """Test that every row is solved in its own interval, with NaN padding."""
+        coefficients = [(0, 0, 1, 1),           # linear
+                        (0, 1, 0, -1),          # quadratic
+                        (1, 0, 0, 0),           # cubic repeated roots
+                        (2, -4, -22, 24),       # cubic 3 roots
+                        (-4, -41, -221, 1),     # cubic 1 real 2 imaginary roots
+                        (1, -2, 1, 0),          # cubic double root
+                        (0, 1, 0, 1),           # quadratic 2 imaginary roots
+                        (1e-20, 1, 0, -1),      # negligible cubic term
+                        (0, 0, 0, 0)]           # no polynomial
+        expected = [(-1, np.nan, np.nan),
+                    (-1, 1, np.nan),
+                    (0, 0, 0),
+                    (1, 4, np.nan),
+                    (0.004521, np.nan, np.nan),
+                    (0, 1, 1),
+                    (np.nan, np.nan, np.nan),
+                    (-1, 1, np.nan),
+                    (np.nan, np.nan, np.nan)]
+        lower = [-10, -10, -10, 0, -10, -10, -10, -10, -10]
+
+        assert_array_almost_equal(solve_in_interval(coefficients, lower, 10), expected)
+
+    def test_solve_in_interval_random(self):
+        """Test the roots of random cubic polynomials with three real roots in the interval."""
+        random_state = np.random.RandomState(0)
+        roots = np.sort(random_state.uniform(0, 100, (1000, 3)), axis=1)
+        scale = random_state.uniform(-3, 3, 1000)
+        coefficients = np.transpose([scale, -scale * roots.sum(axis=1),
+                                     scale * (roots[:, 0] * roots[:, 1] + roots[:, 0] * roots[:, 2] +
+                                              roots[:, 1] * roots[:, 2]),
+                                     -scale * roots.prod(axis=1)])
+
+        assert_array_almost_equal(solve_in_interval(coefficients, 0, 100), roots, decimal=5)
+        self.assertTrue(np.isnan(solve_in_interval(coefficients, -10, -1)).all())
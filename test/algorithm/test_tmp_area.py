@@ -0,0 +1,39 @@
+from __future__ import print_function
+import time
+from kaos.algorithm.visibility_finder import AreaVisibilityFinder
+from kaos.models import Satellite
+from kaos.models.parser import parse_ephemeris_file
+from kaos.tuples import TimeInterval
+from .. import KaosTestCase
+
+
+class T(KaosTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(T, cls).setUpClass()
+        parse_ephemeris_file("ephemeris/Radarsat2.e")
+
+    def test_area(self):
+        info = self.parse_access_file('test/test_data/vancouver_area.test')
+        sat = Satellite.get_by_name(info.sat_name)[0]
+        poi = TimeInterval(1514764800, 1514764800 + 86400)
+        for skip, mi in ((1e12, 100), (1.0, 100), (10.0, 100), (30.0, 100), (60.0, 100), (120.0, 100), (60.0, 10)):
+            AreaVisibilityFinder.MIN_SKIP = skip
+            t0 = time.time()
+            f = AreaVisibilityFinder(sat.platform_id, info.target, poi)
+            calls = [0]
+            orig = f.sat_irp.interpolate
+            times = []
+            def counted(t, *a):
+                calls[0] += 1
+                times.append(float(t) - poi.start)
+                return orig(t, *a)
+            f.sat_irp.interpolate = counted
+            ons = f.next_search_time
+            log = []
+            def nst(t):
+                n = ons(t); log.append((float(t) - poi.start, float(n - t))); return n
+            f.next_search_time = nst
+            r = f.determine_visibility(max_iter=mi)
+            print('\nmin skip', skip, mi, time.time() - t0, len(r), calls[0], [(round(float(a.start) - poi.start, 1), round(float(a.end) - poi.start, 1)) for a in r])
+        AreaVisibilityFinder.MIN_SKIP = 1.0
@@ -84,26 +84,51 @@ class TestViewCone(KaosTestCase):
             raise Exception("Some accesses are not covered")
 
     @data(
-        # Test case with only 2 roots
+        # Test case with only 2 roots (one interval a day)
         ((40, 80), [((6.8779541256529745e+06, 4.5999490750985817e+04, 1.9992074250214235e+04),
          (-5.1646755701370530e+01, 5.3829730836383123e+03, 5.3826328640238344e+03))],
-         6878140 * (1 + 1.8e-16), TimeInterval(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200)),
+         6878140 * (1 + 1.8e-16), TimeInterval(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200),
+         [(J2000 + 88013, J2000 + 127281)]),
         # Test case with no roots (always inside the viewing cone)
         ((0, 0), [((7.3779408317663465e+06, 4.9343382472754820e+04, 2.1445380156320374e+04),
          (-5.0830385351827260e+01, 7.3220252051302523e+03, 6.4023511402880990e+02))],
-         7378140 * (1 + 1.8e-16), TimeInterval(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200))
+         7378140 * (1 + 1.8e-16), TimeInterval(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200),
+         [(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200)]),
+        # Test case with no roots (never inside the viewing cone, the site is above the orbit)
+        ((85, 80), [((6.8779541256529745e+06, 4.5999490750985817e+04, 1.9992074250214235e+04),
+         (-5.1646755701370530e+01, 5.3829730836383123e+03, 5.3826328640238344e+03))],
+         6878140 * (1 + 1.8e-16), TimeInterval(J2000 + 43200, J2000 + SECONDS_PER_DAY + 43200),
+         [])
     )
-    def test_reduce_poi_unsupported_case(self, test_data):
-        """Tests the viewing cone algorithm with unsupported configurations of orbit and location
+    def test_reduce_poi_two_or_no_roots(self, test_data):
+        """Tests the viewing cone algorithm with orbits that intersect the viewing cone twice or
+        not at all
 
         test_data format:
-            site_lat_lon, sat_pos, sat_vel, q_magnitude, poi
+            site_lat_lon, sat_pos, sat_vel, q_magnitude, poi, expected
 
-        Values generated using: A Matlab implementation of viewing cone (using aerospace toolbox)
+        Orbit values generated using: A Matlab implementation of viewing cone (using aerospace toolbox)
             which in turn was tested with STK
         """
+        site_lat_lon, sat_position_velocity_pairs, q_magnitude, poi, expected = test_data
+        fallbacks = view_cone.VIEW_CONE_STATS.fallbacks
+
+        reduced_poi_list = view_cone.reduce_poi(site_lat_lon, sat_position_velocity_pairs,
+                                                q_magnitude, poi)
+
+        self.assertEqual(len(reduced_poi_list), len(expected))
+        for reduced_poi, expected_poi in zip(reduced_poi_list, expected):
+            self.assertAlmostEqual(reduced_poi.start, expected_poi[0], delta=1)
+            self.assertAlmostEqual(reduced_poi.end, expected_poi[1], delta=1)
+        self.assertEqual(view_cone.VIEW_CONE_STATS.fallbacks, fallbacks)
+
+    def test_reduce_poi_undefined_view_cone(self):
+        """Tests that an orbit below the surface raises a ViewConeError and counts a fallback"""
+        fallbacks = view_cone.VIEW_CONE_STATS.fallbacks
         with self.assertRaises(ViewConeError):
-            view_cone.reduce_poi(*test_data)
+            view_cone.reduce_poi((0, 0), [((7e6, 0, 0), (0, 7e3, 0))], 6e6,
+                                 TimeInterval(J2000, J2000 + 3600))
+        self.assertEqual(view_cone.VIEW_CONE_STATS.fallbacks, fallbacks + 1)
 
     def test_reduce_poi_input_error(self):
         """Tests whether reduce_poi can detect improper POI"""
@@ -119,6 +144,40 @@ class TestViewCone(KaosTestCase):
         with self.assertRaises(ValueError):
             view_cone.reduce_poi((0, 0), [((0, 0, 0), (0, 0, 0))], 0, improper_time)
 
+    def test_reduce_poi_list(self):
+        """Tests that the POIs of a list are reduced as if they were reduced one by one"""
+        access_info = self.parse_access_file('test/test_data/vancouver.test')
+        satellite = Satellite.get_by_name(access_info.sat_name)[0]
+        sat_irp = Interpolator(satellite.platform_id)
+
+        poi_list = [TimeInterval(start, start + 24 * 60 * 60) for start
+                    in range(1514764800, 1514764800 + 3 * 24 * 60 * 60, 24 * 60 * 60)]
+        sampling_time_list = [poi.start for poi in poi_list] + [poi_list[-1].end]
+        sat_pos_ecef_list, sat_vel_ecef_list = map(list, zip(*[sat_irp.interpolate(t) for t in
+                                                               sampling_time_list]))
+        sat_position_velocity_pairs = ecef_to_eci(np.transpose(np.asarray(sat_pos_ecef_list)),
+                                                 np.transpose(np.asarray(sat_vel_ecef_list)),
+                                                 sampling_time_list)
+        q_max_list = [satellite.maximum_altitude] * len(poi_list)
+
+        expected = [reduced_poi for idx, poi in enumerate(poi_list) for reduced_poi in
+                    view_cone.reduce_poi(access_info.target,
+                                         sat_position_velocity_pairs[idx:idx+2],
+                                         q_max_list[idx], poi)]
+        self.assertEqual(view_cone.reduce_poi_list(access_info.target, sat_position_velocity_pairs,
+                                                   q_max_list, poi_list), expected)
+
+        with self.assertRaises(ValueError):
+            view_cone.reduce_poi_list(access_info.target, sat_position_velocity_pairs[:-1],
+                                      q_max_list, poi_list)
+
+        # Several sites are reduced at once as if they were reduced one by one
+        sites = [access_info.target, (0, 0), (80, 10), (-45, 170)]
+        self.assertEqual(view_cone.reduce_poi_sites(sites, sat_position_velocity_pairs,
+                                                    q_max_list, poi_list),
+                         [view_cone.reduce_poi_list(site, sat_position_velocity_pairs, q_max_list,
+                                                    poi_list) for site in sites])
+
     @unpack
     @data((0, 6378137),
           (mp.pi / 2, 6356752.3),
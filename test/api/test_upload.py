@@ -0,0 +1,168 @@
+"""Upload API test for KAOS."""
+
+import gzip
+import io
+import json
+import os
+import time
+import zipfile
+
+from kaos.models import OrbitRecord, Satellite
+
+from .. import KaosTestCaseNonPersistent
+
+
+class TestUploadApi(KaosTestCaseNonPersistent):
+    """Test class for the upload API."""
+
+    def test_upload_archive(self):
+        """Test that every file of an uploaded archive is ingested and summarized."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as archive_file:
+            archive_file.write("ephemeris/Radarsat2.e", "Radarsat2.e")
+            archive_file.write("ephemeris/TanSuo1_28220.e", "TanSuo1_28220.e")
+        archive.seek(0)
+
+        with self.app.test_client() as client:
+            response = client.post('/upload/bulk', content_type='multipart/form-data',
+                                   data={'file': (archive, 'feed.zip')})
+
+        self.assertEqual(response.status_code, 200)
+        summaries = json.loads(response.data)['files']
+        self.assertEqual([summary['filename'] for summary in summaries],
+                         ['Radarsat2.e', 'TanSuo1_28220.e'])
+        self.assertEqual([summary['rows'] for summary in summaries], [17307, 17303])
+        self.assertEqual(len(OrbitRecord.query.all()), 17307 + 17303)
+
+    def test_upload_archive_unsupported(self):
+        """Test that only archives are accepted by the bulk upload."""
+        with self.app.test_client() as client:
+            response = client.post('/upload/bulk', content_type='multipart/form-data',
+                                   data={'file': (io.BytesIO(b'data'), 'Radarsat2.e')})
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_upload_stream(self):
+        """Test that a file uploaded as a raw request body is ingested while it is received."""
+        with open("ephemeris/Radarsat2.e", "rb") as ephemeris_file:
+            with self.app.test_client() as client:
+                response = client.put('/upload/stream/Radarsat2.e', data=ephemeris_file.read(),
+                                      content_type='application/octet-stream')
+
+        self.assertEqual(response.status_code, 200)
+        summary = json.loads(response.data)
+        self.assertEqual((summary['segments'], summary['rows']), (14, 17307))
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+        maximum_altitude = Satellite.get_by_name("Radarsat2")[0].maximum_altitude
+
+        with self.app.test_client() as client:
+            response = client.put('/upload/stream/Radarsat2.txt', data='')
+        self.assertEqual(response.status_code, 422)
+
+        # Empty, headerless and truncated bodies are rejected without touching the satellite
+        with open("ephemeris/Radarsat2.e", "rb") as ephemeris_file:
+            truncated = ephemeris_file.read()[:-1000]
+        for body in ('', 'not an ephemeris file\n', truncated):
+            with self.app.test_client() as client:
+                response = client.put('/upload/stream/Radarsat2.e', data=body,
+                                      content_type='application/octet-stream')
+            self.assertEqual(response.status_code, 422)
+
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+        self.assertAlmostEqual(Satellite.get_by_name("Radarsat2")[0].maximum_altitude,
+                               maximum_altitude)
+
+    def test_upload_stream_compressed(self):
+        """Test that a compressed file is decompressed while it is ingested."""
+        compressed = io.BytesIO()
+        with open("ephemeris/Radarsat2.e", "rb") as ephemeris_file:
+            with gzip.GzipFile(fileobj=compressed, mode="wb") as gzip_file:
+                gzip_file.write(ephemeris_file.read())
+
+        with self.app.test_client() as client:
+            response = client.put('/upload/stream/Radarsat2.e.gz', data=compressed.getvalue(),
+                                  content_type='application/octet-stream')
+
+        self.assertEqual(response.status_code, 200)
+        summary = json.loads(response.data)
+        self.assertEqual((summary['segments'], summary['rows']), (14, 17307))
+
+        with self.app.test_client() as client:
+            response = client.put('/upload/stream/Radarsat2.e.gz', data='not gzip data',
+                                  content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 422)
+
+    def test_upload_stream_decimated(self):
+        """Test that a streamed file is decimated with the requested tolerance."""
+        with open("ephemeris/Radarsat2.e", "rb") as ephemeris_file:
+            body = ephemeris_file.read()
+
+        with self.app.test_client() as client:
+            response = client.put('/upload/stream/Radarsat2.e?decimate=abc', data=body,
+                                  content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 422)
+
+        with self.app.test_client() as client:
+            response = client.put('/upload/stream/Radarsat2.e?decimate=100', data=body,
+                                  content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        summary = json.loads(response.data)
+        self.assertEqual(len(summary['compression']), 14)
+        self.assertEqual(summary['rows'], len(OrbitRecord.query.all()))
+        self.assertLess(summary['rows'], 17307 / 3)
+
+    def wait_for_job(self, client, job_id, timeout=60):
+        """Poll an ingestion job until it is finished and return its final status."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = json.loads(client.get('/upload/jobs/{}'.format(job_id)).data)
+            if status['state'] in ('done', 'failed'):
+                return status
+            time.sleep(0.1)
+
+        self.fail('Ingestion job {} did not finish'.format(job_id))
+
+    def test_upload_file_background_job(self):
+        """Test that an upload returns a job that reports the ingestion progress."""
+        with open("ephemeris/Radarsat2.e", 'rb') as ephemeris:
+            ephemeris_data = ephemeris.read()
+
+        try:
+            with self.app.test_client() as client:
+                response = client.post('/upload/uploader', content_type='multipart/form-data',
+                                       data={'file': (io.BytesIO(ephemeris_data), 'UploadSat.e')})
+                self.assertEqual(response.status_code, 202)
+
+                status = self.wait_for_job(client, json.loads(response.data)['job_id'])
+        finally:
+            os.remove("ephemeris/UploadSat.e")
+
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual(status['parsed_rows'], 17307)
+        self.assertEqual(status['written_segments'], 14)
+        self.assertEqual(status['written_rows'], 17307)
+        self.assertEqual(status['errors'], [])
+        self.assertGreater(status['rows_per_second'], 0)
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+
+    def test_upload_file_failed_job(self):
+        """Test that a malformed upload is reported by its job."""
+        try:
+            with self.app.test_client() as client:
+                response = client.post('/upload/uploader', content_type='multipart/form-data',
+                                       data={'file': (io.BytesIO(b'EphemerisTimePosVel\n1 2\n'),
+                                                      'UploadSat.e')})
+                status = self.wait_for_job(client, json.loads(response.data)['job_id'])
+        finally:
+            os.remove("ephemeris/UploadSat.e")
+
+        self.assertEqual(status['state'], 'failed')
+        self.assertEqual(len(status['errors']), 1)
+        self.assertEqual(status['written_rows'], 0)
+
+    def test_upload_job_not_found(self):
+        """Test that polling an unknown job fails."""
+        with self.app.test_client() as client:
+            response = client.get('/upload/jobs/123456')
+
+        self.assertEqual(response.status_code, 404)
@@ -106,6 +106,54 @@ class TestVisibilityApi(KaosTestCase):
             if reason not in response.json["reasons"]:
                 self.assertTrue(False, msg="Missing reason in response: {}".format(reason))
 
+    def test_view_cone_stats(self):
+        """Tests that the viewing cone reductions and fallbacks of the searches are counted."""
+        satellite_id = Satellite.get_by_name("Radarsat2")[0].platform_id
+        request = {'Target': [80, 0],
+                   'POI': {'startTime': '20180101T00:00:00.0',
+                           'endTime': '20180101T01:00:00.0'},
+                   'PlatformID': [satellite_id]}
+
+        with self.app.test_client() as client:
+            stats = client.get('/visibility/stats').json
+            response = client.post('/visibility/search', json=request)
+            self.assertEqual(response.status_code, 200)
+
+            self.assertEqual(client.get('/visibility/stats').json,
+                             {'reductions': stats['reductions'] + 1,
+                              'fallbacks': stats['fallbacks']})
+
+    def test_coverage(self):
+        """Tests that the coverage timeline counts the accesses of the visibility search."""
+        satellite_id = Satellite.get_by_name("Radarsat2")[0].platform_id
+        request = {'Target': [49.2827, -123.1207],
+                   'POI': {'startTime': '20180101T00:00:00.0',
+                           'endTime': '20180102T00:00:00.0'},
+                   'PlatformID': [satellite_id]}
+
+        with self.app.test_client() as client:
+            accesses = client.post('/visibility/search', json=request).json['Opportunities']
+            response = client.post('/visibility/coverage', json=request)
+
+        self.assertEqual(response.status_code, 200)
+        timeline = response.json['Timeline']
+        expected_times = [utc_to_unix('20180101T00:00:00.0')]
+        for access in sorted(accesses, key=lambda access: access['start_time']):
+            expected_times.extend([access['start_time'], access['end_time']])
+        expected_times.append(utc_to_unix('20180102T00:00:00.0'))
+
+        self.assertEqual(response.json['PlatformID'], [satellite_id])
+        self.assertEqual(timeline['times'], expected_times)
+        self.assertEqual(timeline['counts'], [0] + [1, 0] * len(accesses) + [0])
+
+        statistics = response.json['Statistics']
+        self.assertEqual(statistics['max_count'], 1)
+        self.assertEqual(statistics['gaps']['count'], len(accesses) - 1)
+        self.assertAlmostEqual(statistics['coverage_percent'],
+                               100.0 * sum(access['end_time'] - access['start_time']
+                                           for access in accesses) / 86400)
+
+
 @ddt
 class TestOpertunityApi(KaosTestCase):
     """Test class for the opportunity API."""
@@ -0,0 +1,112 @@
+"""Testing the archival of old segments out of the OrbitRecord table."""
+
+import numpy as np
+
+from kaos.algorithm.interpolator import Interpolator
+from kaos.cli import archive_command
+from kaos.models import OrbitArchive, OrbitRecord, OrbitSegment
+from kaos.models.archive import apply_retention, archive_segments, restore_segment
+from kaos.models.parser import parse_ephemeris_file, read_ephemeris_file, store_ephemeris
+
+from .. import KaosTestCaseNonPersistent
+
+EPHEMERIS_FILE = "ephemeris/Radarsat2.e"
+
+
+def record_rows(records):
+    """The time, position and velocity of OrbitRecords as an (N, 7) array."""
+    return np.array([[record.time] + list(record.position) + list(record.velocity)
+                     for record in records])
+
+
+def sorted_rows(records):
+    """The rows of OrbitRecords sorted by all their columns, see record_rows."""
+    rows = record_rows(records)
+    return rows[np.lexsort(np.transpose(rows)[::-1])]
+
+
+class TestArchive(KaosTestCaseNonPersistent):
+    """Ensures that archived segments leave the OrbitRecord table and stay queryable."""
+
+    def setUp(self):
+        super(TestArchive, self).setUp()
+        self.platform_id = parse_ephemeris_file(EPHEMERIS_FILE)
+        self.segments = OrbitSegment.query.order_by(OrbitSegment.start_time).all()
+        self.cutoff = self.segments[5].end_time + 1
+
+    def test_pack_ephemeris(self):
+        """Test that packed rows are restored exactly and take less space than raw floats."""
+        _, _, ephemeris = read_ephemeris_file(EPHEMERIS_FILE)
+        archive = OrbitArchive(ephemeris=OrbitArchive.pack(ephemeris))
+
+        np.testing.assert_array_equal(archive.unpack(), ephemeris)
+        self.assertLess(len(archive.ephemeris), 0.75 * ephemeris.nbytes)
+
+    def test_archive_segments(self):
+        """Test that the records of old segments are archived and still found by queries."""
+        total_rows = len(OrbitRecord.query.all())
+        archived = self.segments[:6]
+        expected = {segment.segment_id: record_rows(OrbitRecord.get_by_segment(segment.segment_id))
+                    for segment in archived}
+        start, end = self.segments[5].end_time - 600, self.segments[6].start_time + 600
+        expected_range = sorted_rows(OrbitRecord.get_by_platform_and_time(self.platform_id,
+                                                                          start, end))
+        interpolation_time = self.segments[2].start_time + 100.5
+        expected_state = Interpolator(self.platform_id).interpolate(interpolation_time)
+
+        segments, rows = archive_segments(self.cutoff)
+        self.assertEqual(segments, 6)
+        self.assertEqual(rows, sum(len(records) for records in expected.values()))
+        self.assertEqual(len(OrbitRecord.query.all()), total_rows - rows)
+        self.assertEqual(archive_segments(self.cutoff), (0, 0))
+
+        for segment in archived:
+            np.testing.assert_array_equal(
+                record_rows(OrbitRecord.get_by_segment(segment.segment_id)),
+                expected[segment.segment_id])
+        # The boundary time of the two segments has a record in each, in no particular order
+        np.testing.assert_array_equal(
+            sorted_rows(OrbitRecord.get_by_platform_and_time(self.platform_id, start, end)),
+            expected_range)
+        self.assertEqual(Interpolator(self.platform_id).interpolate(interpolation_time),
+                         expected_state)
+
+        # Restoring the segment puts its records back into the table
+        segment_id = archived[0].segment_id
+        self.assertEqual(restore_segment(segment_id), len(expected[segment_id]))
+        self.assertIsNone(OrbitArchive.query.get(segment_id))
+        np.testing.assert_array_equal(
+            record_rows(OrbitRecord.query.filter_by(segment_id=segment_id)
+                        .order_by(OrbitRecord.time).all()),
+            expected[segment_id])
+        self.assertEqual(restore_segment(segment_id), 0)
+
+    def test_apply_retention(self):
+        """Test that the retention is counted in days before the current time."""
+        self.assertEqual(apply_retention(1, now=self.cutoff + 86400, platform_id=-1), (0, 0))
+        self.assertEqual(apply_retention(1, now=self.cutoff + 86400)[0], 6)
+        self.assertEqual(len(OrbitArchive.query.all()), 6)
+
+    def test_update_archived_segment(self):
+        """Test that an incremental update of an archived segment restores and extends it."""
+        last = self.segments[-1]
+        ephemeris = record_rows(OrbitRecord.get_by_segment(last.segment_id))
+        archive_segments(last.end_time + 1)
+
+        update = np.concatenate([ephemeris[-10:], ephemeris[-1:] + [60.0, 0, 0, 0, 0, 0, 0]])
+        summary = store_ephemeris(EPHEMERIS_FILE, 0.0, np.empty(0), update, incremental=True)
+
+        self.assertEqual((summary.segments, summary.rows), (1, 1))
+        self.assertIsNone(OrbitArchive.query.get(last.segment_id))
+        np.testing.assert_array_equal(record_rows(OrbitRecord.get_by_segment(last.segment_id)),
+                                      np.concatenate([ephemeris, update[-1:]]))
+
+    def test_archive_command(self):
+        """Test that the archive command needs a retention and reports the archived rows."""
+        runner = self.app.test_cli_runner()
+        self.assertNotEqual(runner.invoke(archive_command, []).exit_code, 0)
+
+        result = runner.invoke(archive_command, ['--retention-days', '0'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Archived 17307 rows of 14 segments', result.output)
+        self.assertEqual(len(OrbitRecord.query.all()), 0)
@@ -1,10 +1,15 @@
 """Testing the database in a general sense and the models specifically."""
 
+import mock
+import numpy as np
+from sqlalchemy import inspect
 from sqlalchemy.exc import IntegrityError, ProgrammingError
 
 from kaos.tuples import OrbitPoint
 from kaos.models import DB, Satellite, ResponseHistory, OrbitSegment, OrbitRecord
+from kaos.models.models import CACHE
 from kaos.models.parser import *
+from kaos.models.loader import insert_orbit_records, deferred_index_maintenance
 
 from .. import KaosTestCaseNonPersistent
 
@@ -300,3 +305,174 @@ class TestResponseHistory(KaosTestCaseNonPersistent):
 
         add_segment_to_db(orbit_data, sat.platform_id)
         self.assertTrue(len(OrbitSegment.query.all()) == 1)
+
+    def test_segment_inside_segment(self):
+        """Test that a segment that lies within another segment does not get added to the DB."""
+        sat = Satellite(platform_name="TEST")
+        sat.save()
+        DB.session.commit()
+
+        for segment_start, segment_end in [(0.0, 1.0), (0.3, 0.7)]:
+            orbit_data = [OrbitPoint(segment_start, [0.5] * 3, [0.5] * 3),
+                          OrbitPoint(segment_end, [0.5] * 3, [0.5] * 3)]
+            add_segment_to_db(orbit_data, sat.platform_id)
+
+        self.assertEqual([(segment.start_time, segment.end_time)
+                          for segment in OrbitSegment.query.all()], [(0.0, 1.0)])
+
+    def test_overlapping_segments_report(self):
+        """Test that the segments of a file that overlap existing data are reported together."""
+        ephemeris = np.array([[float(i)] + [0.5] * 6 for i in range(10)])
+        store_ephemeris("TEST.e", 0.0, np.array([3.0, 6.0]), ephemeris[2:6])
+
+        summary = store_ephemeris("TEST.e", 0.0, np.array([3.0, 6.0]), ephemeris)
+
+        self.assertEqual((summary.segments, summary.rows), (1, 3))
+        self.assertEqual(summary.errors, ['Segments overlapping existing data were not stored: '
+                                          '0.0 to 3.0 overlaps 2.0 to 3.0; '
+                                          '4.0 to 6.0 overlaps 4.0 to 5.0'])
+
+    def test_insert_orbit_records_copy_executemany(self):
+        """Test that the COPY and executemany load paths store the same rows."""
+        sat = Satellite(platform_name="TEST")
+        sat.save()
+        DB.session.commit()
+
+        segment = OrbitSegment(platform_id=sat.platform_id, start_time=0.0, end_time=19.0)
+        segment.save()
+        DB.session.commit()
+
+        ephemeris = np.array([[i + 0.1 * j for j in range(7)] for i in range(20)])
+        for use_copy in [True, False]:
+            inserted = insert_orbit_records(sat.platform_id, segment.segment_id, ephemeris,
+                                            use_copy=use_copy)
+            self.assertEqual(inserted, 20)
+        DB.session.commit()
+
+        records = OrbitRecord.query.order_by(OrbitRecord.uid).all()
+        self.assertEqual(len(records), 40)
+        for row, record in zip(np.vstack([ephemeris, ephemeris]), records):
+            self.assertEqual(record.time, row[0])
+            self.assertEqual(record.position, list(row[1:4]))
+            self.assertEqual(record.velocity, list(row[4:7]))
+
+    def test_deferred_index_maintenance(self):
+        """Test that the indexes are dropped during a deferred load and rebuilt after it, even if
+        the load fails."""
+        def index_names():
+            return [index['name'] for index in
+                    inspect(DB.engine).get_indexes(OrbitRecord.__tablename__)]
+
+        with deferred_index_maintenance():
+            for index in OrbitRecord.__table__.indexes:
+                self.assertNotIn(index.name, index_names())
+            sat_id = parse_ephemeris_file("ephemeris/Radarsat2.e")
+
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+        self.assertEqual(len(OrbitSegment.query.all()), 14)
+        self.assertEqual(sat_id, Satellite.get_by_name("Radarsat2")[0].platform_id)
+        for index in OrbitRecord.__table__.indexes:
+            self.assertIn(index.name, index_names())
+
+        with self.assertRaises(ValueError):
+            with deferred_index_maintenance():
+                raise ValueError
+        for index in OrbitRecord.__table__.indexes:
+            self.assertIn(index.name, index_names())
+
+    def test_parse_ephemeris_file_single_transaction(self):
+        """Test that a file that fails to load leaves nothing behind in the DB."""
+        with self.assertRaises(IOError):
+            parse_ephemeris_file("ephemeris/does_not_exist.e")
+
+        with mock.patch('kaos.models.writer.insert_orbit_records', side_effect=[1, ValueError]):
+            with self.assertRaises(ValueError):
+                parse_ephemeris_file("ephemeris/Radarsat2.e")
+
+        self.assertFalse(Satellite.query.all())
+        self.assertFalse(OrbitRecord.query.all())
+
+
+class TestIncrementalUpdates(KaosTestCaseNonPersistent):
+
+    @staticmethod
+    def ephemeris(first, last, offset=0.0):
+        """Rows every 60s from row first to row last, with positions shifted by offset."""
+        return np.array([[60.0 * i, 7e6 + i + offset, i, i, 1.0, 2.0, 3.0]
+                         for i in range(first, last + 1)])
+
+    def store(self, ephemeris, incremental=True):
+        return store_ephemeris("TEST.e", 0.0, np.empty(0), ephemeris, incremental=incremental)
+
+    def stored_rows(self):
+        return np.array([[record.time] + record.position + record.velocity for record in
+                         OrbitRecord.query.order_by(OrbitRecord.time).all()])
+
+    def test_append_past_stored_prefix(self):
+        """Test that only the samples after the stored ones are added to the stored segment."""
+        self.store(self.ephemeris(0, 9))
+        summary = self.store(self.ephemeris(5, 19))
+
+        self.assertEqual((summary.segments, summary.rows, summary.errors), (1, 10, []))
+        segments = OrbitSegment.query.all()
+        self.assertEqual([(segment.start_time, segment.end_time) for segment in segments],
+                         [(0.0, 1140.0)])
+        np.testing.assert_array_equal(self.stored_rows(), self.ephemeris(0, 19))
+
+        # The same update again is already stored
+        summary = self.store(self.ephemeris(5, 19))
+        self.assertEqual((summary.rows, summary.skipped), (0, 1))
+
+    def test_replace_superseded_tail(self):
+        """Test that the stored samples from the first one that differs onwards are replaced, along
+        with the stored segments that start within the update."""
+        self.store(self.ephemeris(0, 19))
+        self.store(self.ephemeris(25, 30))
+        update = np.concatenate([self.ephemeris(10, 14), self.ephemeris(15, 27, offset=100.0)])
+        summary = self.store(update)
+
+        self.assertEqual((summary.segments, summary.rows, summary.errors), (1, 13, []))
+        segments = OrbitSegment.query.all()
+        self.assertEqual([(segment.start_time, segment.end_time) for segment in segments],
+                         [(0.0, 1620.0)])
+        np.testing.assert_array_equal(self.stored_rows(),
+                                      np.concatenate([self.ephemeris(0, 14), update[5:]]))
+
+    def test_update_file_segments(self):
+        """Test that segments sharing a boundary time stay separate segments."""
+        filename = "ephemeris/Radarsat2.e"
+        summary = store_ephemeris(filename, *read_ephemeris_file(filename), incremental=True)
+        self.assertEqual((summary.segments, summary.rows), (14, 17307))
+        self.assertEqual(len(OrbitSegment.query.all()), 14)
+
+        summary = store_ephemeris(filename, *read_ephemeris_file(filename), incremental=True)
+        self.assertEqual((summary.segments, summary.skipped), (0, 14))
+
+    def test_update_rejected(self):
+        """Test that updates starting before the stored segment, or without incremental mode, are
+        rejected."""
+        self.store(self.ephemeris(10, 19))
+
+        for ephemeris, incremental in [(self.ephemeris(5, 15), True),
+                                       (self.ephemeris(15, 25), False)]:
+            summary = self.store(ephemeris, incremental)
+            self.assertEqual(summary.rows, 0)
+            self.assertEqual(len(summary.errors), 1)
+        np.testing.assert_array_equal(self.stored_rows(), self.ephemeris(10, 19))
+
+    def test_invalidate_updated_range(self):
+        """Test that only the cached segment lookups of the updated range are invalidated."""
+        platform_id = self.store(self.ephemeris(0, 9)).platform_id
+        self.store(self.ephemeris(20, 29))
+
+        self.assertEqual(OrbitSegment.get_by_platform_and_time(platform_id, 1500.0).end_time,
+                         1740.0)
+        OrbitSegment.get_by_platform_and_time(platform_id, 300.0)
+        with mock.patch.object(CACHE, 'delete_memoized',
+                               wraps=CACHE.delete_memoized) as delete_memoized:
+            self.store(self.ephemeris(25, 35))
+
+        delete_memoized.assert_called_once_with(OrbitSegment.get_by_platform_and_time,
+                                                platform_id, 1500.0)
+        self.assertEqual(OrbitSegment.get_by_platform_and_time(platform_id, 1500.0).end_time,
+                         2100.0)
@@ -0,0 +1,96 @@
+"""Testing the decimation of ephemeris rows at ingest."""
+
+from ddt import ddt, data
+import numpy as np
+
+from kaos.algorithm.hermite import hermite_interp
+from kaos.algorithm.interpolator import Interpolator
+from kaos.models import OrbitSegment, OrbitRecord
+from kaos.models.decimation import decimate_ephemeris
+from kaos.models.parser import (read_ephemeris_file, split_ephemeris_segments, store_ephemeris,
+                                store_ephemeris_stream)
+
+from .. import KaosTestCaseNonPersistent
+
+EPHEMERIS_FILE = "ephemeris/Radarsat2.e"
+
+
+def position_errors(ephemeris, kept):
+    """The distances between the rows and their Hermite interpolation from the kept rows."""
+    positions, _ = hermite_interp(kept[:, 0], kept[:, 1:4], kept[:, 4:7], ephemeris[:, 0])
+    return np.linalg.norm(positions - ephemeris[:, 1:4], axis=1)
+
+
+@ddt
+class TestDecimation(KaosTestCaseNonPersistent):
+    """Ensures that decimated segments reproduce the dropped rows within the tolerance."""
+
+    def test_hermite_interp(self):
+        """Test that Hermite interpolation reproduces cubic positions and their velocities."""
+        times = np.array([0.0, 2.0, 5.0])
+        cubic = np.poly1d([0.5, -1.0, 2.0, 3.0])
+        positions = np.column_stack([cubic(times), -cubic(times), 2 * cubic(times)])
+        velocities = np.column_stack([cubic.deriv()(times), -cubic.deriv()(times),
+                                      2 * cubic.deriv()(times)])
+
+        new_times = np.array([0.0, 0.5, 2.0, 3.7, 5.0])
+        new_positions, new_velocities = hermite_interp(times, positions, velocities, new_times)
+        np.testing.assert_allclose(new_positions[:, 0], cubic(new_times))
+        np.testing.assert_allclose(new_positions[:, 2], 2 * cubic(new_times))
+        np.testing.assert_allclose(new_velocities[:, 1], -cubic.deriv()(new_times))
+
+    @data(1.0, 10.0, 100.0)
+    def test_decimation_bound(self, tolerance):
+        """Test that the dropped rows of every segment are within the tolerance."""
+        start_time, segment_boundaries, ephemeris = read_ephemeris_file(EPHEMERIS_FILE)
+        for segment in split_ephemeris_segments(ephemeris, segment_boundaries, start_time):
+            kept = decimate_ephemeris(segment, tolerance)
+            np.testing.assert_array_equal(kept[[0, -1]], segment[[0, -1]])
+            self.assertLessEqual(position_errors(segment, kept).max(), tolerance)
+            if tolerance >= 10.0 and len(segment) > 10:
+                self.assertLess(len(kept), 0.6 * len(segment))
+
+    def test_store_decimated(self):
+        """Test that decimated segments record their tolerance and compression and are
+        interpolated within the tolerance."""
+        start_time, segment_boundaries, ephemeris = read_ephemeris_file(EPHEMERIS_FILE)
+        summary = store_ephemeris(EPHEMERIS_FILE, start_time, segment_boundaries, ephemeris,
+                                  decimation_tolerance=100.0)
+
+        self.assertEqual(len(summary.compression), 14)
+        self.assertEqual(sum(source_rows for _, _, source_rows, _ in summary.compression),
+                         len(ephemeris))
+        self.assertEqual(sum(stored_rows for _, _, _, stored_rows in summary.compression),
+                         summary.rows)
+        self.assertEqual(summary.rows, len(OrbitRecord.query.all()))
+        self.assertLess(summary.rows, len(ephemeris) / 3)
+        self.assertEqual(set(segment.decimation_tolerance for segment in OrbitSegment.query.all()),
+                         {100.0})
+
+        interpolator = Interpolator(summary.platform_id)
+        for row in ephemeris[10:2000:37]:
+            position, _ = interpolator.interpolate(row[0])
+            self.assertLessEqual(np.linalg.norm(np.array(position) - row[1:4]), 100.0)
+
+        # The same file is recognized as already stored
+        summary = store_ephemeris(EPHEMERIS_FILE, start_time, segment_boundaries, ephemeris,
+                                  decimation_tolerance=100.0)
+        self.assertEqual((summary.rows, summary.skipped, summary.compression), (0, 14, []))
+
+    def test_stream_decimated(self):
+        """Test that the blocks of streamed segments are decimated separately within the
+        tolerance."""
+        with open(EPHEMERIS_FILE, "rU") as stream:
+            summary = store_ephemeris_stream(EPHEMERIS_FILE, stream, chunk_size=4096,
+                                             decimation_tolerance=10.0)
+
+        start_time, segment_boundaries, ephemeris = read_ephemeris_file(EPHEMERIS_FILE)
+        segments = split_ephemeris_segments(ephemeris, segment_boundaries, start_time)
+        self.assertEqual([source_rows for _, _, source_rows, _ in summary.compression],
+                         [len(segment) for segment in segments])
+
+        stored = OrbitSegment.query.order_by(OrbitSegment.start_time).all()
+        for segment, stored_segment in zip(segments, stored):
+            kept = np.array([[record.time] + record.position + record.velocity
+                             for record in OrbitRecord.get_by_segment(stored_segment.segment_id)])
+            self.assertLessEqual(position_errors(segment, kept).max(), 10.0)
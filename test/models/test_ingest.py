@@ -0,0 +1,106 @@
+"""Testing the bulk ingestion of ephemeris files."""
+
+import os
+import shutil
+import tarfile
+import tempfile
+
+from kaos.cli import ingest_command
+from kaos.models import Satellite, OrbitSegment, OrbitRecord
+from kaos.models.ingest import ingest_ephemeris_files, ingest_ephemeris_path
+
+from .. import KaosTestCaseNonPersistent
+
+EPHEMERIS_FILES = ["ephemeris/Radarsat2.e", "ephemeris/TanSuo1_28220.e",
+                   "ephemeris/Terra_25994.e"]
+
+
+class TestEphemerisIngest(KaosTestCaseNonPersistent):
+    """Ensures that many ephemeris files can be ingested at once."""
+
+    def setUp(self):
+        super(TestEphemerisIngest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestEphemerisIngest, self).tearDown()
+
+    def test_ingest_ephemeris_files(self):
+        """Test that every file is stored and summarized in order."""
+        summaries = ingest_ephemeris_files(EPHEMERIS_FILES, processes=2, defer_indexes=True)
+
+        self.assertEqual([summary.filename for summary in summaries], EPHEMERIS_FILES)
+        self.assertEqual([summary.segments for summary in summaries], [14, 12, 14])
+        self.assertEqual([summary.rows for summary in summaries], [17307, 17303, 17307])
+        self.assertEqual([summary.errors for summary in summaries], [[], [], []])
+        self.assertEqual(len(OrbitSegment.query.all()), 40)
+        self.assertEqual(len(OrbitRecord.query.all()), 17307 + 17303 + 17307)
+
+        for summary in summaries:
+            satellite = Satellite.get_by_id(summary.platform_id)
+            self.assertEqual(satellite.platform_name,
+                             os.path.basename(summary.filename).split('.')[0])
+
+    def test_ingest_ephemeris_files_errors(self):
+        """Test that a file that can't be ingested does not prevent the others from being stored."""
+        malformed_file = os.path.join(self.directory, "Malformed.e")
+        with open(malformed_file, 'w') as ephemeris:
+            ephemeris.write("EphemerisTimePosVel\n0.0 1.0 2.0\nEND Ephemeris\n")
+
+        summaries = ingest_ephemeris_files([malformed_file, "ephemeris/Radarsat2.e",
+                                            "ephemeris/Radarsat2.e"])
+
+        self.assertEqual(summaries[0].rows, 0)
+        self.assertEqual(len(summaries[0].errors), 1)
+        self.assertEqual(summaries[1].rows, 17307)
+        self.assertEqual(summaries[2].rows, 0)
+        self.assertTrue(summaries[2].unchanged)
+        self.assertFalse(Satellite.get_by_name("Malformed"))
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+
+    def test_ingest_unchanged_ephemeris(self):
+        """Test that files and segments that were already ingested are skipped."""
+        ingest_ephemeris_files(EPHEMERIS_FILES[:1])
+
+        # The same data in a file with a different header only has unchanged segments
+        changed_file = os.path.join(self.directory, "Radarsat2.e")
+        with open(EPHEMERIS_FILES[0]) as ephemeris, open(changed_file, 'w') as changed:
+            changed.write("# Re-issued\n" + ephemeris.read())
+
+        summaries = ingest_ephemeris_files(EPHEMERIS_FILES[:1] + [changed_file])
+
+        # The unchanged file is not read
+        self.assertEqual([summary.unchanged for summary in summaries], [True, False])
+        self.assertEqual(summaries[0].seconds, 0)
+        self.assertEqual([(summary.segments, summary.skipped, summary.errors)
+                          for summary in summaries], [(0, 0, []), (0, 14, [])])
+        self.assertEqual(len(OrbitRecord.query.all()), 17307)
+
+        # The changed file is now known as well
+        summaries = ingest_ephemeris_files([changed_file])
+        self.assertTrue(summaries[0].unchanged)
+
+    def test_ingest_ephemeris_archive(self):
+        """Test that the ephemeris files of an archive are ingested."""
+        archive_filename = os.path.join(self.directory, "ephemeris.tar.gz")
+        with tarfile.open(archive_filename, 'w:gz') as archive:
+            for filename in EPHEMERIS_FILES[:2]:
+                archive.add(filename, os.path.join('feed', os.path.basename(filename)))
+
+        summaries = ingest_ephemeris_path(archive_filename)
+
+        self.assertEqual([summary.filename for summary in summaries],
+                         ['feed/Radarsat2.e', 'feed/TanSuo1_28220.e'])
+        self.assertEqual(len(OrbitRecord.query.all()), 17307 + 17303)
+
+    def test_ingest_command(self):
+        """Test that the ingest command ingests a directory and reports every file."""
+        for filename in EPHEMERIS_FILES:
+            shutil.copy(filename, self.directory)
+
+        result = self.app.test_cli_runner().invoke(ingest_command, [self.directory])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Ingested 51917 rows from 3 files, skipped 0 unchanged files', result.output)
+        self.assertEqual(len(Satellite.query.all()), 3)
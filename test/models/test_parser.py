@@ -1,8 +1,14 @@
 """Testing the database in a general sense and the parser specifically."""
 
+import bz2
+import gzip
+import os
+import shutil
+import tempfile
+
 import numpy as np
 
-from kaos.models import DB, Satellite, ResponseHistory, OrbitSegment, OrbitRecord
+from kaos.models import DB, Satellite, ResponseHistory, OrbitSegment, OrbitRecord, OrbitSummary
 from kaos.models.parser import *
 
 from .. import KaosTestCaseNonPersistent
@@ -10,6 +16,16 @@ from .. import KaosTestCaseNonPersistent
 class TestEphemerisParser(KaosTestCaseNonPersistent):
     """Ensures that the ephemeris parser behaves as expected."""
 
+    @staticmethod
+    def orbit_summaries():
+        """The summaries of the stored segments and their days, in time order."""
+        segments = [[segment.start_time, segment.min_radius, segment.max_radius, segment.period]
+                    for segment in OrbitSegment.query.order_by(OrbitSegment.start_time).all()]
+        days = [[summary.start_time, summary.end_time, summary.min_radius, summary.max_radius] +
+                summary.start_normal + summary.end_normal
+                for summary in OrbitSummary.query.order_by(OrbitSummary.start_time).all()]
+        return np.array(segments), np.array(days)
+
     def test_ephemeris_parser_single_file(self):
         """Light test to ensure that the parser can correctly parse an ephemeris file."""
         sat_id = parse_ephemeris_file("ephemeris/Radarsat2.e")
@@ -97,5 +113,110 @@ class TestEphemerisParser(KaosTestCaseNonPersistent):
         temp = Satellite.query.filter_by(platform_id=1).first().maximum_altitude
         self.assertAlmostEqual(temp, largest_q)
 
-
-
+    def test_split_ephemeris_segments(self):
+        """Test that the ephemeris block is split on the first row of every segment boundary."""
+        times = [0.0, 60.0, 120.0, 120.0, 180.0, 240.0, 300.0, 360.0]
+        ephemeris = np.array([[time] * 7 for time in times])
+
+        segments = split_ephemeris_segments(ephemeris, np.array([0.0, 120.0, 240.0]), 0.0)
+
+        self.assertEqual([list(segment[:, 0]) for segment in segments],
+                         [[0.0, 60.0, 120.0], [120.0, 180.0, 240.0], [300.0, 360.0]])
+
+    def test_read_ephemeris_file(self):
+        """Test that the ephemeris block is decoded into an array of UNIX time rows."""
+        start_time, segment_boundaries, ephemeris = read_ephemeris_file("ephemeris/Radarsat2.e")
+
+        self.assertEqual(start_time, jdate_to_unix(2458119.5))
+        self.assertEqual(len(segment_boundaries), 14)
+        self.assertEqual(ephemeris.shape, (17307, 7))
+        self.assertEqual(ephemeris[1, 0], start_time + 60.0)
+        self.assertEqual(list(ephemeris[0, 1:4]), [-1.1923013839603376e+05, 7.1372890010702536e+06,
+                                                   6.9552517228703119e+05])
+
+    def test_split_ephemeris_chunks(self):
+        """Test that chunks are split along segments that may span several chunks."""
+        chunks = [np.array([[time] * 7 for time in times])
+                  for times in ([0.0, 60.0, 120.0], [120.0, 180.0], [240.0, 300.0, 360.0])]
+
+        blocks = split_ephemeris_chunks(chunks, np.array([0.0, 120.0, 240.0]), 0.0)
+
+        self.assertEqual([(list(rows[:, 0]), closes_segment) for rows, closes_segment in blocks],
+                         [([0.0, 60.0, 120.0], True), ([120.0, 180.0], False),
+                          ([240.0], True), ([300.0, 360.0], False)])
+
+    def test_store_ephemeris_stream(self):
+        """Test that a file stored from a stream in small chunks matches the file read at once."""
+        filename = "ephemeris/Radarsat2.additional_data.e"
+        with open(filename, "rU") as stream:
+            streamed = store_ephemeris_stream(filename, stream, chunk_size=4096)
+        streamed_segments = sorted((segment.start_time, segment.end_time)
+                                   for segment in OrbitSegment.query.all())
+        streamed_altitude = Satellite.query.one().maximum_altitude
+        self.assertEqual(streamed.rows, len(OrbitRecord.query.all()))
+
+        # Streaming the same file again only finds stored or overlapping segments
+        with open(filename, "rU") as stream:
+            summary = store_ephemeris_stream(filename, stream, chunk_size=4096)
+        self.assertEqual((summary.segments, summary.rows), (0, 0))
+        self.assertEqual(summary.skipped, len(streamed_segments))
+        self.assertEqual(summary.errors, streamed.errors)
+
+        # Segments written in blocks are summarized like segments written at once
+        streamed_summaries = self.orbit_summaries()
+        DB.session.query(OrbitSummary).delete()
+        DB.session.query(OrbitRecord).delete()
+        DB.session.query(OrbitSegment).delete()
+        DB.session.commit()
+
+        summary = store_ephemeris(filename, *read_ephemeris_file(filename))
+        self.assertEqual(streamed._replace(seconds=0), summary._replace(seconds=0))
+        self.assertEqual(streamed_segments, sorted((segment.start_time, segment.end_time)
+                                                   for segment in OrbitSegment.query.all()))
+        self.assertEqual(streamed_altitude, Satellite.query.one().maximum_altitude)
+        for streamed_rows, rows in zip(streamed_summaries, self.orbit_summaries()):
+            np.testing.assert_allclose(streamed_rows, rows)
+
+    def test_read_compressed_ephemeris_file(self):
+        """Test that gzip and bzip2 compressed files are read like the plain file."""
+        with open("ephemeris/Radarsat2.e", "rb") as ephemeris_file:
+            contents = ephemeris_file.read()
+
+        directory = tempfile.mkdtemp()
+        try:
+            # Appending to a gzip file produces a second compressed stream
+            gzip_filename = os.path.join(directory, "Radarsat2.e.gz")
+            with gzip.open(gzip_filename, "wb") as gzip_file:
+                gzip_file.write(contents[:100000])
+            with gzip.open(gzip_filename, "ab") as gzip_file:
+                gzip_file.write(contents[100000:])
+
+            bz2_filename = os.path.join(directory, "Radarsat2.e.bz2")
+            with open(bz2_filename, "wb") as bz2_file:
+                bz2_file.write(bz2.compress(contents))
+
+            corrupt_filename = os.path.join(directory, "Corrupt.e.gz")
+            with open(corrupt_filename, "wb") as corrupt_file:
+                corrupt_file.write(contents)
+
+            start_time, segment_boundaries, ephemeris = read_ephemeris_file("ephemeris/Radarsat2.e")
+            for filename in (gzip_filename, bz2_filename):
+                compressed = read_ephemeris_file(filename)
+                self.assertEqual(compressed[0], start_time)
+                self.assertTrue(np.array_equal(compressed[1], segment_boundaries))
+                self.assertTrue(np.array_equal(compressed[2], ephemeris))
+
+            with self.assertRaises(ValueError):
+                read_ephemeris_file(corrupt_filename)
+
+            # Cutting the gzip trailer keeps every row but must still be detected
+            with open(gzip_filename, "rb") as gzip_file:
+                compressed = gzip_file.read()
+            truncated_filename = os.path.join(directory, "Truncated.e.gz")
+            for truncated in (compressed[:-8], compressed[:len(compressed) // 2]):
+                with open(truncated_filename, "wb") as truncated_file:
+                    truncated_file.write(truncated)
+                with self.assertRaises(ValueError):
+                    read_ephemeris_file(truncated_filename)
+        finally:
+            shutil.rmtree(directory)
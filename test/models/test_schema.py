@@ -0,0 +1,22 @@
+"""Testing the upgrade of the schema of existing databases."""
+
+from sqlalchemy import inspect
+
+from kaos.models import DB
+from kaos.models.schema import upgrade_schema
+
+from .. import KaosTestCaseNonPersistent
+
+
+class TestSchemaUpgrade(KaosTestCaseNonPersistent):
+    """Ensures that columns added since the first release are added to existing tables."""
+
+    def test_upgrade_schema(self):
+        """Test that a missing column is added once and the DB is left untouched afterwards."""
+        DB.session.commit()
+        DB.engine.execute('ALTER TABLE "OrbitSegment" DROP COLUMN content_hash')
+
+        self.assertEqual(upgrade_schema(DB.engine), [('OrbitSegment', 'content_hash')])
+        self.assertIn('content_hash',
+                      [column['name'] for column in inspect(DB.engine).get_columns('OrbitSegment')])
+        self.assertEqual(upgrade_schema(DB.engine), [])
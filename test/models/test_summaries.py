@@ -0,0 +1,57 @@
+"""Testing the orbit summaries recorded as ephemeris files are ingested."""
+
+import numpy as np
+
+from kaos.models import Satellite, OrbitSegment, OrbitSummary
+from kaos.models.parser import parse_ephemeris_file
+from kaos.tuples import TimeInterval
+
+from .. import KaosTestCaseNonPersistent
+
+
+class TestOrbitSummaries(KaosTestCaseNonPersistent):
+    """Ensures that segments and UTC days of an ingested file are summarized."""
+
+    def setUp(self):
+        super(TestOrbitSummaries, self).setUp()
+        self.platform_id = parse_ephemeris_file("ephemeris/Radarsat2.e")
+        self.satellite = Satellite.get_by_id(self.platform_id)
+
+    def test_segment_summaries(self):
+        """Test that every segment records its radius range and an orbital period of about 100
+        minutes."""
+        segments = OrbitSegment.query.filter_by(platform_id=self.platform_id).all()
+        for segment in segments:
+            self.assertLess(segment.min_radius, segment.max_radius)
+            self.assertLessEqual(segment.max_radius, self.satellite.maximum_altitude)
+            self.assertAlmostEqual(segment.period / 60.0, 100.7, delta=0.5)
+        self.assertEqual(max(segment.max_radius for segment in segments),
+                         self.satellite.maximum_altitude)
+
+    def test_day_summaries(self):
+        """Test that the UTC days of every segment are summarized with unit orbit normals."""
+        summaries = OrbitSummary.query.filter_by(platform_id=self.platform_id).all()
+        self.assertGreater(len(summaries), len(OrbitSegment.query.all()))
+        for summary in summaries:
+            self.assertLessEqual(summary.start_time, summary.end_time)
+            self.assertEqual(np.floor(summary.start_time / 86400),
+                             np.floor(summary.end_time / 86400))
+            self.assertLessEqual(summary.min_radius, summary.max_radius)
+            self.assertLessEqual(summary.max_radius, self.satellite.maximum_altitude)
+            for normal in (summary.start_normal, summary.end_normal):
+                self.assertAlmostEqual(np.linalg.norm(normal), 1.0)
+            # The orbit of Radarsat2 is nearly polar and its plane turns slowly
+            self.assertLess(abs(summary.start_normal[2]), 0.2)
+            self.assertGreater(np.dot(summary.start_normal, summary.end_normal), 0.99)
+
+    def test_maximum_radii(self):
+        """Test that the radius bound of a time interval comes from the days it overlaps."""
+        summaries = OrbitSummary.query.filter_by(platform_id=self.platform_id) \
+                                      .order_by(OrbitSummary.start_time).all()
+        first, second = summaries[:2]
+        intervals = [TimeInterval(first.start_time, first.start_time + 1),
+                     TimeInterval(first.end_time, second.start_time),
+                     TimeInterval(0, 1)]
+        self.assertEqual(OrbitSummary.maximum_radii(self.platform_id, intervals),
+                         [first.max_radius, max(first.max_radius, second.max_radius), None])
+        self.assertEqual(OrbitSummary.maximum_radii(self.platform_id, []), [])
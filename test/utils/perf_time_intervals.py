@@ -0,0 +1,59 @@
+"""Benchmark of the intersection of interval lists."""
+
+from __future__ import print_function
+
+import timeit
+import unittest
+
+import numpy as np
+
+from kaos.utils.time_intervals import (calculate_common_intervals,
+                                       calculate_common_intervals_helper, union_intervals)
+from kaos.tuples import TimeInterval
+
+
+def recursive_common_intervals(intervals_list):
+    """The pairwise recursive intersection that calculate_common_intervals used to do."""
+    if len(intervals_list) == 1:
+        return intervals_list[0]
+
+    return calculate_common_intervals_helper(intervals_list[0],
+                                             recursive_common_intervals(intervals_list[1:]))
+
+
+def random_interval_lists(lists, intervals, seed=0):
+    """Random lists of sorted disjoint intervals, about 10 minutes long, over 30 days."""
+    random_state = np.random.RandomState(seed)
+    interval_lists = []
+    for _ in range(lists):
+        starts = np.sort(random_state.uniform(0, 30 * 86400, intervals))
+        ends = np.minimum(starts + random_state.uniform(60, 1200, intervals),
+                          np.append(starts[1:], np.inf))
+        interval_lists.append([TimeInterval(start, end) for start, end in zip(starts, ends)])
+    return interval_lists
+
+
+class TestTimeIntervalsPerf(unittest.TestCase):
+    """Compares the sweep line intersection with the recursive pairwise intersection.
+
+    This test is meant to be run manually (not as part of the automated CI tests).
+
+    Use: pytest -s test/utils/perf_time_intervals.py
+    """
+
+    def test_common_intervals_perf(self):
+        """Prints the time both intersections take for areas with more and more vertices."""
+        print("\nlists, intervals per list, recursive (s), sweep line (s)")
+        for lists, intervals in ((2, 500), (8, 500), (32, 500), (8, 2000)):
+            interval_lists = random_interval_lists(lists, intervals)
+
+            # The sweep line fuses neighboring intervals and drops the empty ones
+            self.assertEqual(calculate_common_intervals(interval_lists),
+                             union_intervals([interval for interval
+                                              in recursive_common_intervals(interval_lists)
+                                              if interval.end > interval.start]))
+            recursive = min(timeit.repeat(lambda: recursive_common_intervals(interval_lists),
+                                          number=1, repeat=3))
+            sweep = min(timeit.repeat(lambda: calculate_common_intervals(interval_lists),
+                                      number=1, repeat=3))
+            print("{}, {}, {:.4f}, {:.4f}".format(lists, intervals, recursive, sweep))
@@ -2,10 +2,14 @@
 
 from ddt import ddt, unpack, data
 
+import numpy as np
 from numpy.testing import assert_array_equal
 from mpmath import mpf
 
-from kaos.utils.time_intervals import fuse_neighbor_intervals, trim_poi_segments
+from kaos.utils.time_intervals import (IntervalSet, calculate_common_intervals,
+                                       calculate_coverage_intervals, coverage_statistics,
+                                       coverage_timeline, fuse_neighbor_intervals, pairwise,
+                                       trim_poi_segments, union_intervals)
 from kaos.tuples import TimeInterval
 from .. import KaosTestCase
 
@@ -29,6 +33,8 @@ class TestIntervalUtilis(KaosTestCase):
         time_interval_list = [TimeInterval(*interval) for interval in input_interval_list]
         result = fuse_neighbor_intervals(time_interval_list)
         assert_array_equal(result, expected)
+        # The input list is left as it was
+        assert_array_equal(time_interval_list, input_interval_list)
 
     @unpack
     @data(
@@ -49,3 +55,165 @@ class TestIntervalUtilis(KaosTestCase):
         poi = TimeInterval(*poi)
         result = trim_poi_segments(time_interval_list, poi)
         assert_array_equal(result, expected)
+
+    @unpack
+    @data(
+        ([], []),
+        ([(1, 2), (2, 3)], [(1, 3)]),
+        ([(40, 50), (0, 150), (100, 200)], [(0, 200)]),
+        ([(0, 100), (10, 20), (150, 200), (300, 400)], [(0, 100), (150, 200), (300, 400)]),
+    )
+    def test_union_intervals(self, input_interval_list, expected):
+        """Tests that overlapping and neighboring intervals are merged in any order."""
+        time_interval_list = [TimeInterval(*interval) for interval in input_interval_list]
+        assert_array_equal(union_intervals(time_interval_list), expected)
+
+    @unpack
+    @data(
+        ([], []),
+        ([[(0, 10), (20, 30)]], [(0, 10), (20, 30)]),
+        ([[(0, 10), (20, 30)], [(5, 25)]], [(5, 10), (20, 25)]),
+        ([[(0, 10), (20, 30)], [(5, 25)], [(8, 22), (24, 40)]], [(8, 10), (20, 22), (24, 25)]),
+        ([[(0, 10)], [(10, 20)]], []),
+        ([[(0, 10), (5, 15)], [(12, 20)]], [(12, 15)]),
+        ([[(0, 10)], []], []),
+    )
+    def test_calculate_common_intervals(self, input_interval_lists, expected):
+        """Tests that only the times covered by every list are common."""
+        intervals_list = [[TimeInterval(*interval) for interval in interval_list]
+                          for interval_list in input_interval_lists]
+        assert_array_equal(calculate_common_intervals(intervals_list), expected)
+
+    @unpack
+    @data(
+        (1, [(0, 40)]),
+        (2, [(5, 30)]),
+        (3, [(8, 10), (20, 22), (24, 25)]),
+        (4, []),
+    )
+    def test_calculate_coverage_intervals(self, min_count, expected):
+        """Tests that the times covered by at least a number of lists are found."""
+        intervals_list = [[TimeInterval(0, 10), TimeInterval(20, 30)], [TimeInterval(5, 25)],
+                          [TimeInterval(8, 22), TimeInterval(24, 40)]]
+        assert_array_equal(calculate_coverage_intervals(intervals_list, min_count), expected)
+
+    def test_calculate_coverage_intervals_neighbors(self):
+        """Tests that the covered intervals of different lists that touch are fused."""
+        intervals_list = [[TimeInterval(mpf("1.01"), mpf("1.02"))],
+                          [TimeInterval(mpf("1.02"), mpf("1.03"))]]
+        assert_array_equal(calculate_coverage_intervals(intervals_list),
+                           [(mpf("1.01"), mpf("1.03"))])
+
+    def test_pairwise(self):
+        """Tests that pairwise pairs every element with the next one without changing the list."""
+        elements = [1, 2, 3]
+        self.assertEqual(list(pairwise(elements)), [(1, 2), (2, 3), (3, None)])
+        self.assertEqual(elements, [1, 2, 3])
+
+
+@ddt
+class TestIntervalSet(KaosTestCase):
+    """Tests the IntervalSet operations."""
+
+    def setUp(self):
+        self.sets = [IntervalSet([0, 20], [10, 30]), IntervalSet([5], [25]),
+                     IntervalSet([24, 8], [40, 22])]
+
+    def test_create(self):
+        """Tests that the intervals are sorted, read-only and validated."""
+        interval_set = IntervalSet.from_intervals([TimeInterval(mpf(20), mpf(30)),
+                                                   TimeInterval(0, 10)])
+        assert_array_equal(interval_set.starts, [0, 20])
+        assert_array_equal(interval_set.ends, [10, 30])
+        self.assertEqual(interval_set.to_intervals(), [(0, 10), (20, 30)])
+        self.assertEqual(len(interval_set), 2)
+        self.assertEqual(interval_set, self.sets[0])
+        self.assertNotEqual(interval_set, self.sets[1])
+
+        with self.assertRaises(ValueError):
+            interval_set.starts[0] = 5
+        with self.assertRaises(ValueError):
+            IntervalSet([0, 1], [2])
+        with self.assertRaises(ValueError):
+            IntervalSet([2], [1])
+
+    def test_set_operations(self):
+        """Tests the union, intersection and difference of sets."""
+        first, second, third = self.sets
+        self.assertEqual(first.union(second, third).to_intervals(), [(0, 40)])
+        self.assertEqual(first.intersection(second, third).to_intervals(),
+                         [(8, 10), (20, 22), (24, 25)])
+        self.assertEqual(first.difference(second).to_intervals(), [(0, 5), (25, 30)])
+        self.assertEqual(second.difference(first).to_intervals(), [(10, 20)])
+        self.assertEqual(first.difference(IntervalSet()), first)
+        self.assertEqual(len(IntervalSet().union()), 0)
+
+        # Sets that only touch have no intersection, and their union is fused
+        self.assertEqual(IntervalSet([0], [10]).union(IntervalSet([10], [20])).to_intervals(),
+                         [(0, 20)])
+        self.assertEqual(len(IntervalSet([0], [10]).intersection(IntervalSet([10], [20]))), 0)
+
+    @unpack
+    @data(
+        (1, [(0, 40)]),
+        (2, [(5, 30)]),
+        (3, [(8, 10), (20, 22), (24, 25)]),
+        (4, []),
+    )
+    def test_coverage(self, min_count, expected):
+        """Tests that the coverage agrees with calculate_coverage_intervals."""
+        self.assertEqual(IntervalSet.coverage(self.sets, min_count).to_intervals(), expected)
+        assert_array_equal(calculate_coverage_intervals([interval_set.to_intervals() for
+                                                         interval_set in self.sets], min_count),
+                           expected)
+
+    def test_coverage_random(self):
+        """Tests the coverage of random sets against calculate_coverage_intervals."""
+        random_state = np.random.RandomState(0)
+        interval_lists = []
+        for _ in range(6):
+            starts = np.round(random_state.uniform(0, 1000, 50))
+            interval_lists.append([TimeInterval(start, start + length) for start, length
+                                   in zip(starts, np.round(random_state.uniform(0, 40, 50)))])
+
+        for min_count in range(1, 7):
+            self.assertEqual(IntervalSet.coverage([IntervalSet.from_intervals(interval_list)
+                                                   for interval_list in interval_lists],
+                                                  min_count).to_intervals(),
+                             calculate_coverage_intervals(interval_lists, min_count))
+
+    def test_trim_and_fuse(self):
+        """Tests that trimming drops the intervals outside the POI and fusing joins neighbors."""
+        self.assertEqual(self.sets[0].trim(TimeInterval(5, 25)).to_intervals(),
+                         [(5, 10), (20, 25)])
+        self.assertEqual(len(self.sets[0].trim(TimeInterval(10, 20))), 0)
+        self.assertEqual(IntervalSet([0, 1, 5], [1, 2, 6]).fuse().to_intervals(),
+                         [(0, 2), (5, 6)])
+
+    def test_statistics(self):
+        """Tests the durations and gap statistics of a set."""
+        interval_set = IntervalSet([0, 5, 20, 50], [10, 12, 30, 51])
+        assert_array_equal(interval_set.durations, [10, 7, 10, 1])
+        self.assertEqual(interval_set.duration(), 23)
+        self.assertEqual(interval_set.gap_stats(),
+                         {'count': 2, 'total': 28.0, 'min': 8.0, 'max': 20.0, 'mean': 14.0})
+        self.assertEqual(IntervalSet().gap_stats()['count'], 0)
+
+    def test_coverage_timeline(self):
+        """Tests the step function of the number of sets covering the POI."""
+        self.sets.append(IntervalSet([90, -10], [120, -5]))
+        times, counts = coverage_timeline(self.sets, TimeInterval(0, 100))
+        assert_array_equal(times, [0, 5, 8, 10, 20, 22, 24, 25, 30, 40, 90, 100])
+        assert_array_equal(counts, [1, 2, 3, 2, 3, 2, 3, 2, 1, 0, 1, 0])
+
+        times, counts = coverage_timeline([], TimeInterval(0, 100))
+        assert_array_equal(times, [0, 100])
+        assert_array_equal(counts, [0, 0])
+
+    def test_coverage_statistics(self):
+        """Tests the coverage percentage, counts and revisit gaps of the POI."""
+        self.sets.append(IntervalSet([90], [120]))
+        self.assertEqual(coverage_statistics(self.sets, TimeInterval(0, 100)),
+                         {'coverage_percent': 50.0, 'max_count': 3, 'mean_count': 0.8,
+                          'gaps': {'count': 1, 'total': 50.0, 'min': 50.0, 'max': 50.0,
+                                   'mean': 50.0}})
@@ -1,8 +1,9 @@
 """Testing KAOS's utility functions."""
 
 from ddt import ddt, unpack, data
+import numpy as np
 
-from kaos.utils.time_conversion import utc_to_unix
+from kaos.utils.time_conversion import utc_to_unix, jdate_to_utc, jdate_to_unix, unix_to_jdate
 
 from .. import KaosTestCase
 
@@ -52,3 +53,28 @@ class TestTimeConversions(KaosTestCase):
         with self.assertRaises(ValueError):
             utc_to_unix(time_string)
 
+    @unpack
+    @data((2440587.5, 0.0),
+          (2458119.5, 1514764800.0),
+          (2458119.75, 1514786400.0),
+          (2451545.0, 946728000.0),
+          (2458119.5 + 1.5 / 86400, 1514764801.5),
+          # 2016-12-31 lasts 86401 seconds
+          (2457754.0, 1483185600.5),
+          (2457754.5 - 0.5 / 86401, 1483228800.0),
+          (2457754.5, 1483228800.0))
+    def test_jdate_unix(self, jdate, expected):
+        """Tests that Julian dates are converted to UNIX time to sub-second precision."""
+        self.assertAlmostEqual(jdate_to_unix(jdate), expected, places=4)
+        if jdate != 2457754.5 - 0.5 / 86401:
+            self.assertAlmostEqual(unix_to_jdate(expected), jdate, places=9)
+
+    def test_jdate_unix_arrays(self):
+        """Tests that arrays of Julian dates are converted like the ISO strings of astropy."""
+        jdates = np.linspace(2441317.5, 2462000.5, 1001)
+        unix_times = jdate_to_unix(jdates)
+
+        self.assertEqual(unix_times.shape, jdates.shape)
+        for jdate, unix_time in zip(jdates, unix_times):
+            self.assertEqual(np.floor(round(unix_time, 3)), utc_to_unix(jdate_to_utc(jdate)[:-1]))
+        np.testing.assert_allclose(unix_to_jdate(unix_times), jdates, rtol=0, atol=1e-9)